@@ -10,6 +10,22 @@ class Settings:
     JWT_EXPIRY: int = int(os.getenv("JWT_EXPIRY", "3600"))
     PORT: int = int(os.getenv("PORT", "8888"))
     CORS_ORIGINS: str = os.getenv("CORS_ORIGINS", "*")
+    DISPATCH_INTERVAL: float = float(os.getenv("DISPATCH_INTERVAL", "10"))  # Seconds, 0 disables
+    DISPATCH_MAX_PICKUP_KM: float = float(os.getenv("DISPATCH_MAX_PICKUP_KM", "10"))
+    RIDE_FEED_DRIVERS: int = int(os.getenv("RIDE_FEED_DRIVERS", "10"))  # Drivers each new request is pushed to
+    RIDE_FEED_RADIUS_KM: float = float(os.getenv("RIDE_FEED_RADIUS_KM", "10"))
+    PASSWORD_WORKERS: int = int(os.getenv("PASSWORD_WORKERS", "4"))  # bcrypt threads
+    PASSWORD_QUEUE_LIMIT: int = int(os.getenv("PASSWORD_QUEUE_LIMIT", "64"))  # Waiting hashes before 503
+    USER_CACHE_SIZE: int = int(os.getenv("USER_CACHE_SIZE", "10000"))
+    USER_CACHE_TTL: float = float(os.getenv("USER_CACHE_TTL", "60"))  # Seconds
+    TOKEN_CACHE_SIZE: int = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))  # Verified tokens, ~0.5 KB each
+    LOCATION_FLUSH_INTERVAL: float = float(os.getenv("LOCATION_FLUSH_INTERVAL", "1"))  # Seconds between location writes
+    LOCATION_BUFFER_MAX: int = int(os.getenv("LOCATION_BUFFER_MAX", "50000"))  # Drivers with an unwritten position
+    LOCATION_FANOUT_INTERVAL: float = float(os.getenv("LOCATION_FANOUT_INTERVAL", "1"))  # Min seconds between driver_location emits per ride
+    LOCATION_FANOUT_MIN_METERS: float = float(os.getenv("LOCATION_FANOUT_MIN_METERS", "5"))  # Smaller moves are not broadcast
+    SOCKET_MANAGER: str = os.getenv("SOCKET_MANAGER", "memory")  # memory, redis or local
+    SOCKET_MANAGER_URL: str = os.getenv("SOCKET_MANAGER_URL", "redis://localhost:6379/0")
+    WORKERS: int = int(os.getenv("WEB_CONCURRENCY", "1"))  # Server processes; gunicorn and uvicorn read it too
 
 
 settings = Settings()
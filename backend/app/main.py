@@ -4,18 +4,43 @@ from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 
 from app.config import settings
-from app.utils.database import get_database, close_database
+from app.utils.database import get_database, close_database, ensure_indexes
+from app.utils.geo import backfill_geo_fields
 from app.routes import auth, user, driver, ride, admin
+from app.services.driver_index import load_driver_index
+from app.services.dispatch import dispatch_engine
+from app.services.driver_ratings import backfill_driver_ratings
+from app.services.location_buffer import location_buffer
+from app.services.open_pools import rebuild_open_pools
+from app.services.password_pool import password_pool
+from app.services.platform_stats import ensure_platform_stats
+from app.services.pool_corridor import backfill_corridors
 from app.websocket.socket_handler import sio
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    get_database()
+    db = get_database()
     print("Connected to MongoDB")
+    await ensure_indexes(db)
+    await backfill_geo_fields(db)
+    await backfill_corridors(db)
+    await backfill_driver_ratings(db)
+    pools = await rebuild_open_pools(db)
+    print(f"Rebuilt {pools} open pool entries")
+    if await ensure_platform_stats(db):
+        print("Built platform stats counters")
+    indexed = await load_driver_index(db)
+    print(f"Loaded {indexed} available drivers into location index")
+    dispatch_engine.start()
+    location_buffer.start()
     yield
     # Shutdown
+    await dispatch_engine.stop()
+    # Write positions still in the buffer before the client goes away
+    await location_buffer.stop()
+    password_pool.shutdown()
     close_database()
     print("Disconnected from MongoDB")
 
@@ -1,14 +1,58 @@
+import asyncio
 from fastapi import APIRouter, HTTPException, Depends, Query
-from datetime import datetime
+from datetime import datetime, timedelta
 from bson import ObjectId
 from typing import Optional
+from pymongo import ASCENDING, DESCENDING
 from app.routes.auth import get_current_user
-from app.utils.database import get_database
-from app.services.payment_service import get_payment_summary
+from app.utils.database import EXAMPLE_ID, declare_index, declare_query, get_database
+from app.utils.pagination import NEWEST_FIRST, fetch_page
+from app.services.platform_stats import read_platform_stats, record_feedback
 from app.models.feedback import FeedbackCreate
+from app.services.payment_service import get_payment_summary, payment_summary_pipeline
+from app.services.driver_ratings import record_rating
+from app.services.driver_index import driver_index, sync_driver
+from app.services.dispatch import dispatch_engine
+from app.services.password_pool import password_pool
+from app.services.auth_service import invalidate_user, user_cache
+from app.utils.jwt_handler import token_cache
+from app.services.location_buffer import location_buffer
+from app.websocket.socket_handler import location_fanout, session_registry
+from app.services.reference_resolver import resolve_drivers, resolve_users
 
 router = APIRouter(prefix="/api/admin", tags=["Admin"])
 
+# List pages and their optional filters, and the dashboard's user count
+declare_index("rides", NEWEST_FIRST)
+declare_index("rides", [("status", ASCENDING)] + NEWEST_FIRST)
+declare_index("users", NEWEST_FIRST)
+declare_index("users", [("role", ASCENDING)] + NEWEST_FIRST)
+declare_index("drivers", NEWEST_FIRST)
+declare_index("drivers", [("isAvailable", ASCENDING)] + NEWEST_FIRST)
+declare_index("feedback", NEWEST_FIRST)
+declare_query("admin trips page", "rides", {}, NEWEST_FIRST)
+declare_query("admin trips by status", "rides", {"status": "completed"}, NEWEST_FIRST)
+declare_query("admin users page", "users", {}, NEWEST_FIRST)
+declare_query("admin users by role", "users", {"role": "user"}, NEWEST_FIRST)
+declare_query("admin drivers page", "drivers", {}, NEWEST_FIRST)
+declare_query("admin drivers by availability", "drivers", {"isAvailable": True}, NEWEST_FIRST)
+declare_query("admin feedback page", "feedback", {}, NEWEST_FIRST)
+# Payment reports and summaries, optionally by driver and completion time
+PAYMENTS_ORDER = [("endTime", DESCENDING), ("_id", DESCENDING)]
+declare_index("rides", [("status", ASCENDING)] + PAYMENTS_ORDER)
+declare_index("rides", [("driverId", ASCENDING), ("status", ASCENDING)] + PAYMENTS_ORDER)
+_example_range = {"$gte": datetime.utcnow() - timedelta(days=30), "$lt": datetime.utcnow()}
+declare_query("payments page", "rides", {"status": "completed"}, PAYMENTS_ORDER)
+declare_query("payments by driver", "rides", {"status": "completed", "driverId": EXAMPLE_ID}, PAYMENTS_ORDER)
+declare_query("payments by date", "rides", {"status": "completed", "endTime": _example_range}, PAYMENTS_ORDER)
+declare_query("payment summary by driver", "rides", pipeline=payment_summary_pipeline({"driverId": EXAMPLE_ID}))
+declare_query("payment summary by date", "rides", pipeline=payment_summary_pipeline(
+    {"status": "completed", "endTime": _example_range}
+))
+declare_query("payment summary by driver and date", "rides", pipeline=payment_summary_pipeline(
+    {"driverId": EXAMPLE_ID, "status": "completed", "endTime": _example_range}
+))
+
 
 def get_admin_user(current_user: dict = Depends(get_current_user)):
     if current_user["role"] != "admin":
@@ -20,50 +64,60 @@ def get_admin_user(current_user: dict = Depends(get_current_user)):
 async def get_dashboard(current_user: dict = Depends(get_admin_user)):
     db = get_database()
     
-    # Get counts
-    total_users = db.users.count_documents({"role": "user"})
-    total_drivers = db.drivers.count_documents({})
-    total_rides = db.rides.count_documents({})
-    active_rides = db.rides.count_documents({"status": {"$in": ["requested", "accepted", "in-progress"]}})
-    completed_rides = db.rides.count_documents({"status": "completed"})
-    
-    # Get revenue
-    completed = list(db.rides.find({"status": "completed"}))
-    total_revenue = sum(ride.get("totalFare", 0) for ride in completed)
+    # Independent indexed queries, awaited together
+    total_users, total_drivers, totals, recent_rides = await asyncio.gather(
+        db.users.count_documents({"role": "user"}),
+        db.drivers.estimated_document_count(),
+        read_platform_stats(db),
+        db.rides.find().sort([("createdAt", -1), ("_id", -1)]).limit(5).to_list(None)
+    )
     
-    # Get recent activity
-    recent_rides = list(db.rides.find().sort("createdAt", -1).limit(5))
     for ride in recent_rides:
         ride["id"] = str(ride.pop("_id"))
         if ride.get("createdAt"):
             ride["createdAt"] = ride["createdAt"].isoformat()
     
-    # Get average rating
-    feedbacks = list(db.feedback.find())
-    avg_rating = sum(f.get("rating", 0) for f in feedbacks) / len(feedbacks) if feedbacks else 0
-    
     return {
         "success": True,
         "data": {
             "metrics": {
                 "totalUsers": total_users,
                 "totalDrivers": total_drivers,
-                "totalRides": total_rides,
-                "activeRides": active_rides,
-                "completedRides": completed_rides,
-                "totalRevenue": round(total_revenue, 2),
-                "averageRating": round(avg_rating, 2)
+                "totalRides": totals["totalRides"],
+                "activeRides": totals["activeRides"],
+                "completedRides": totals["completedRides"],
+                "totalRevenue": totals["totalRevenue"],
+                "averageRating": totals["averageRating"]
             },
             "recentRides": recent_rides
         }
     }
 
 
+@router.get("/metrics")
+async def get_metrics(current_user: dict = Depends(get_admin_user)):
+    """In-process runtime statistics of this API instance."""
+    return {
+        "success": True,
+        "data": {
+            "dispatch": dispatch_engine.stats(),
+            "driverIndex": {"drivers": len(driver_index)},
+            "passwordPool": password_pool.stats(),
+            "userCache": user_cache.stats(),
+            "tokenCache": token_cache.stats(),
+            "locationBuffer": location_buffer.stats(),
+            "locationFanout": location_fanout.stats(),
+            "socketSessions": session_registry.stats()
+        }
+    }
+
+
 @router.get("/trips")
 async def get_all_trips(
     current_user: dict = Depends(get_admin_user),
     status: Optional[str] = Query(None),
     page: int = Query(1, ge=1),
+    cursor: Optional[str] = Query(None),
     limit: int = Query(10, ge=1, le=100)
 ):
     db = get_database()
@@ -72,10 +126,10 @@ async def get_all_trips(
     if status:
         query["status"] = status
     
-    skip = (page - 1) * limit
+    rides, pagination = await fetch_page(db.rides, query, "createdAt", page, limit, cursor)
     
-    rides = list(db.rides.find(query).sort("createdAt", -1).skip(skip).limit(limit))
-    total = db.rides.count_documents(query)
+    # Driver info for the whole page
+    drivers = await resolve_drivers(db, (ride.get("driverId") for ride in rides))
     
     for ride in rides:
         ride["id"] = str(ride.pop("_id"))
@@ -88,23 +142,15 @@ async def get_all_trips(
         if ride.get("endTime"):
             ride["endTime"] = ride["endTime"].isoformat()
         
-        # Get driver info
-        if ride.get("driverId"):
-            driver = db.drivers.find_one({"_id": ObjectId(ride["driverId"])})
-            if driver:
-                user = db.users.find_one({"_id": ObjectId(driver["userId"])})
-                ride["driverName"] = user["name"] if user else "Unknown"
+        driver = drivers.get(ride.get("driverId"))
+        if driver:
+            ride["driverName"] = driver["name"]
     
     return {
         "success": True,
         "data": {
             "trips": rides,
-            "pagination": {
-                "page": page,
-                "limit": limit,
-                "total": total,
-                "pages": (total + limit - 1) // limit
-            }
+            "pagination": pagination
         }
     }
 
@@ -114,6 +160,7 @@ async def get_all_users(
     current_user: dict = Depends(get_admin_user),
     role: Optional[str] = Query(None),
     page: int = Query(1, ge=1),
+    cursor: Optional[str] = Query(None),
     limit: int = Query(10, ge=1, le=100)
 ):
     db = get_database()
@@ -122,10 +169,7 @@ async def get_all_users(
     if role:
         query["role"] = role
     
-    skip = (page - 1) * limit
-    
-    users = list(db.users.find(query).sort("createdAt", -1).skip(skip).limit(limit))
-    total = db.users.count_documents(query)
+    users, pagination = await fetch_page(db.users, query, "createdAt", page, limit, cursor)
     
     for user in users:
         user["id"] = str(user.pop("_id"))
@@ -139,12 +183,7 @@ async def get_all_users(
         "success": True,
         "data": {
             "users": users,
-            "pagination": {
-                "page": page,
-                "limit": limit,
-                "total": total,
-                "pages": (total + limit - 1) // limit
-            }
+            "pagination": pagination
         }
     }
 
@@ -154,6 +193,7 @@ async def get_all_drivers(
     current_user: dict = Depends(get_admin_user),
     available: Optional[bool] = Query(None),
     page: int = Query(1, ge=1),
+    cursor: Optional[str] = Query(None),
     limit: int = Query(10, ge=1, le=100)
 ):
     db = get_database()
@@ -162,10 +202,10 @@ async def get_all_drivers(
     if available is not None:
         query["isAvailable"] = available
     
-    skip = (page - 1) * limit
+    drivers, pagination = await fetch_page(db.drivers, query, "createdAt", page, limit, cursor)
     
-    drivers = list(db.drivers.find(query).sort("createdAt", -1).skip(skip).limit(limit))
-    total = db.drivers.count_documents(query)
+    # User info for the whole page
+    users = await resolve_users(db, (driver["userId"] for driver in drivers))
     
     for driver in drivers:
         driver["id"] = str(driver.pop("_id"))
@@ -174,8 +214,7 @@ async def get_all_drivers(
         if driver.get("updatedAt"):
             driver["updatedAt"] = driver["updatedAt"].isoformat()
         
-        # Get user info
-        user = db.users.find_one({"_id": ObjectId(driver["userId"])})
+        user = users.get(driver["userId"])
         if user:
             driver["userName"] = user["name"]
             driver["userEmail"] = user["email"]
@@ -185,12 +224,7 @@ async def get_all_drivers(
         "success": True,
         "data": {
             "drivers": drivers,
-            "pagination": {
-                "page": page,
-                "limit": limit,
-                "total": total,
-                "pages": (total + limit - 1) // limit
-            }
+            "pagination": pagination
         }
     }
 
@@ -198,25 +232,48 @@ async def get_all_drivers(
 @router.get("/payments")
 async def get_payment_reports(
     current_user: dict = Depends(get_admin_user),
+    start_date: Optional[datetime] = Query(None),
+    end_date: Optional[datetime] = Query(None),
+    driver_id: Optional[str] = Query(None),
     page: int = Query(1, ge=1),
+    cursor: Optional[str] = Query(None),
     limit: int = Query(10, ge=1, le=100)
 ):
     db = get_database()
     
-    skip = (page - 1) * limit
-    
-    # Get all rides for summary
-    all_rides = list(db.rides.find())
-    summary = get_payment_summary(all_rides)
+    # Date filters apply to completion time, so they select completed rides;
+    # saying so lets the status-led payment index serve the range
+    filters = {}
+    if driver_id:
+        filters["driverId"] = driver_id
+    if start_date or end_date:
+        filters["status"] = "completed"
+        filters["endTime"] = {}
+        if start_date:
+            filters["endTime"]["$gte"] = start_date
+        if end_date:
+            filters["endTime"]["$lt"] = end_date
+    
+    if filters:
+        summary = await get_payment_summary(db, filters)
+    else:
+        # Unfiltered totals are maintained incrementally
+        totals = await read_platform_stats(db)
+        summary = {
+            "totalRides": totals["totalRides"],
+            "completedRides": totals["completedRides"],
+            "pooledRides": totals["pooledRides"],
+            "totalRevenue": totals["totalRevenue"],
+            "averageFare": totals["averageFare"]
+        }
     
     # Get paginated completed rides with payment info
-    completed_rides = list(
-        db.rides.find({"status": "completed"})
-        .sort("endTime", -1)
-        .skip(skip)
-        .limit(limit)
+    completed_rides, pagination = await fetch_page(
+        db.rides, {"status": "completed", **filters}, "endTime", page, limit, cursor
     )
-    total = db.rides.count_documents({"status": "completed"})
+    
+    # Driver info for the whole page
+    drivers = await resolve_drivers(db, (ride.get("driverId") for ride in completed_rides))
     
     payments = []
     for ride in completed_rides:
@@ -228,12 +285,9 @@ async def get_payment_reports(
             "completedAt": ride["endTime"].isoformat() if ride.get("endTime") else None
         }
         
-        # Get driver info
-        if ride.get("driverId"):
-            driver = db.drivers.find_one({"_id": ObjectId(ride["driverId"])})
-            if driver:
-                user = db.users.find_one({"_id": ObjectId(driver["userId"])})
-                payment["driverName"] = user["name"] if user else "Unknown"
+        driver = drivers.get(ride.get("driverId"))
+        if driver:
+            payment["driverName"] = driver["name"]
         
         payments.append(payment)
     
@@ -242,12 +296,7 @@ async def get_payment_reports(
         "data": {
             "summary": summary,
             "payments": payments,
-            "pagination": {
-                "page": page,
-                "limit": limit,
-                "total": total,
-                "pages": (total + limit - 1) // limit
-            }
+            "pagination": pagination
         }
     }
 
@@ -256,45 +305,37 @@ async def get_payment_reports(
 async def get_all_feedback(
     current_user: dict = Depends(get_admin_user),
     page: int = Query(1, ge=1),
+    cursor: Optional[str] = Query(None),
     limit: int = Query(10, ge=1, le=100)
 ):
     db = get_database()
     
-    skip = (page - 1) * limit
+    feedbacks, pagination = await fetch_page(db.feedback, {}, "createdAt", page, limit, cursor)
     
-    feedbacks = list(db.feedback.find().sort("createdAt", -1).skip(skip).limit(limit))
-    total = db.feedback.count_documents({})
+    # User and driver info for the whole page
+    users = await resolve_users(db, (feedback["userId"] for feedback in feedbacks))
+    drivers = await resolve_drivers(db, (feedback["driverId"] for feedback in feedbacks))
     
     for feedback in feedbacks:
         feedback["id"] = str(feedback.pop("_id"))
         if feedback.get("createdAt"):
             feedback["createdAt"] = feedback["createdAt"].isoformat()
         
-        # Get user info
-        user = db.users.find_one({"_id": ObjectId(feedback["userId"])})
+        user = users.get(feedback["userId"])
         feedback["userName"] = user["name"] if user else "Unknown"
         
-        # Get driver info
-        driver = db.drivers.find_one({"_id": ObjectId(feedback["driverId"])})
+        driver = drivers.get(feedback["driverId"])
         if driver:
-            driver_user = db.users.find_one({"_id": ObjectId(driver["userId"])})
-            feedback["driverName"] = driver_user["name"] if driver_user else "Unknown"
+            feedback["driverName"] = driver["name"]
     
-    # Calculate average rating
-    all_feedbacks = list(db.feedback.find())
-    avg_rating = sum(f.get("rating", 0) for f in all_feedbacks) / len(all_feedbacks) if all_feedbacks else 0
+    totals = await read_platform_stats(db)
     
     return {
         "success": True,
         "data": {
             "feedback": feedbacks,
-            "averageRating": round(avg_rating, 2),
-            "pagination": {
-                "page": page,
-                "limit": limit,
-                "total": total,
-                "pages": (total + limit - 1) // limit
-            }
+            "averageRating": totals["averageRating"],
+            "pagination": pagination
         }
     }
 
@@ -304,7 +345,9 @@ async def update_user_status(
     user_id: str,
     current_user: dict = Depends(get_admin_user)
 ):
-    # Placeholder for user status update
+    # Placeholder for user status update; whatever it changes (status, role)
+    # must not keep being served from the auth cache
+    invalidate_user(user_id)
     return {
         "success": True,
         "message": "User updated successfully"
@@ -320,7 +363,7 @@ async def update_driver_status(
     db = get_database()
     
     try:
-        driver = db.drivers.find_one({"_id": ObjectId(driver_id)})
+        driver = await db.drivers.find_one({"_id": ObjectId(driver_id)})
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid driver ID")
     
@@ -331,7 +374,8 @@ async def update_driver_status(
     if is_available is not None:
         update_data["isAvailable"] = is_available
     
-    db.drivers.update_one({"_id": ObjectId(driver_id)}, {"$set": update_data})
+    await db.drivers.update_one({"_id": ObjectId(driver_id)}, {"$set": update_data})
+    sync_driver(location_buffer.with_latest_location({**driver, **update_data}))
     
     return {
         "success": True,
@@ -357,16 +401,10 @@ async def create_feedback(
         "createdAt": now
     }
     
-    result = db.feedback.insert_one(feedback_doc)
+    result = await db.feedback.insert_one(feedback_doc)
+    await record_feedback(db, feedback_data.rating)
     
-    # Update driver's average rating
-    driver_feedbacks = list(db.feedback.find({"driverId": feedback_data.driverId}))
-    avg_rating = sum(f["rating"] for f in driver_feedbacks) / len(driver_feedbacks)
-    
-    db.drivers.update_one(
-        {"_id": ObjectId(feedback_data.driverId)},
-        {"$set": {"rating": round(avg_rating, 2)}}
-    )
+    await record_rating(db, feedback_data.driverId, feedback_data.rating)
     
     return {
         "success": True,
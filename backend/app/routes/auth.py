@@ -2,14 +2,23 @@ from fastapi import APIRouter, HTTPException, Depends, Header
 from typing import Optional
 from app.models.user import UserCreate, UserLogin, UserUpdate
 from app.services.auth_service import (
-    register_user, login_user, get_user_by_id, update_user
+    register_user, login_user, get_cached_user, update_user
 )
+from app.services.password_pool import PasswordPoolBusy
 from app.utils.jwt_handler import decode_access_token
 
 router = APIRouter(prefix="/api/auth", tags=["Authentication"])
 
 
-def get_current_user(authorization: Optional[str] = Header(None)):
+def _password_pool_busy() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Server is busy, please try again shortly",
+        headers={"Retry-After": "1"}
+    )
+
+
+async def get_current_user(authorization: Optional[str] = Header(None)):
     if not authorization:
         raise HTTPException(status_code=401, detail="Authorization header required")
     
@@ -19,7 +28,7 @@ def get_current_user(authorization: Optional[str] = Header(None)):
     if not payload:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
     
-    user = get_user_by_id(payload.get("sub"))
+    user = await get_cached_user(payload.get("sub"))
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
     
@@ -28,7 +37,10 @@ def get_current_user(authorization: Optional[str] = Header(None)):
 
 @router.post("/register")
 async def register(user_data: UserCreate):
-    result = register_user(user_data)
+    try:
+        result = await register_user(user_data)
+    except PasswordPoolBusy:
+        raise _password_pool_busy()
     
     if "error" in result:
         raise HTTPException(status_code=400, detail=result["error"])
@@ -42,7 +54,10 @@ async def register(user_data: UserCreate):
 
 @router.post("/login")
 async def login(login_data: UserLogin):
-    result = login_user(login_data)
+    try:
+        result = await login_user(login_data)
+    except PasswordPoolBusy:
+        raise _password_pool_busy()
     
     if "error" in result:
         raise HTTPException(status_code=401, detail=result["error"])
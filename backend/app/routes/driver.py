@@ -2,12 +2,29 @@ from fastapi import APIRouter, HTTPException, Depends, Query
 from datetime import datetime
 from bson import ObjectId
 from typing import Optional
+from pymongo import ASCENDING
+from pymongo.errors import DuplicateKeyError
 from app.routes.auth import get_current_user
-from app.utils.database import get_database
+from app.utils.database import EXAMPLE_ID, declare_index, declare_query, get_database
+from app.utils.pagination import NEWEST_FIRST, fetch_page
 from app.models.driver import DriverCreate, DriverUpdate, DriverLocationUpdate
+from app.services.driver_index import driver_index, sync_driver
+from app.services.reference_resolver import resolve_users
+from app.services.dispatch import build_ride_from_booking
+from app.services.ride_feed import retract_ride_request
+from app.services.open_pools import remove_pools, sync_ride_pool
+from app.services.platform_stats import record_ride_status, record_rides_created
+from app.services.location_buffer import PROFILE_DEFAULTS, location_buffer
+from app.websocket.socket_handler import close_ride_room
 
 router = APIRouter(prefix="/api/driver", tags=["Driver"])
 
+declare_index("bookings", [("status", ASCENDING), ("rideId", ASCENDING)] + NEWEST_FIRST)
+declare_index("rides", [("driverId", ASCENDING)] + NEWEST_FIRST)
+declare_query("driver ride requests page", "bookings", {"status": "requested", "rideId": None}, NEWEST_FIRST)
+declare_query("driver rides page", "rides", {"driverId": EXAMPLE_ID}, NEWEST_FIRST)
+declare_query("driver rides by status", "rides", {"driverId": EXAMPLE_ID, "status": "completed"}, NEWEST_FIRST)
+
 
 def get_driver_user(current_user: dict = Depends(get_current_user)):
     if current_user["role"] not in ["driver", "admin"]:
@@ -15,26 +32,25 @@ def get_driver_user(current_user: dict = Depends(get_current_user)):
     return current_user
 
 
-def get_or_create_driver_profile(user_id: str, db):
+async def get_or_create_driver_profile(user_id: str, db):
     """Get driver profile or create one if it doesn't exist"""
-    driver = db.drivers.find_one({"userId": user_id})
+    driver = await db.drivers.find_one({"userId": user_id})
     
     if not driver:
         now = datetime.utcnow()
         driver_doc = {
             "userId": user_id,
-            "vehicleType": "Sedan",
-            "vehicleNumber": "PENDING",
-            "licenseNumber": "PENDING",
+            **PROFILE_DEFAULTS,
             "currentLocation": None,
-            "isAvailable": False,
-            "rating": 0.0,
-            "totalTrips": 0,
             "createdAt": now,
             "updatedAt": now
         }
-        result = db.drivers.insert_one(driver_doc)
-        driver = db.drivers.find_one({"_id": result.inserted_id})
+        try:
+            await db.drivers.insert_one(driver_doc)
+        except DuplicateKeyError:
+            # A location flush created the profile first
+            pass
+        driver = await db.drivers.find_one({"userId": user_id})
     
     return driver
 
@@ -42,7 +58,7 @@ def get_or_create_driver_profile(user_id: str, db):
 @router.get("/profile")
 async def get_driver_profile(current_user: dict = Depends(get_driver_user)):
     db = get_database()
-    driver = get_or_create_driver_profile(current_user["id"], db)
+    driver = await get_or_create_driver_profile(current_user["id"], db)
     
     driver["id"] = str(driver.pop("_id"))
     if driver.get("createdAt"):
@@ -67,7 +83,7 @@ async def update_driver_profile(
     db = get_database()
     
     # Get or create driver profile
-    driver = get_or_create_driver_profile(current_user["id"], db)
+    driver = await get_or_create_driver_profile(current_user["id"], db)
     
     # Build update document
     update_doc = {}
@@ -89,11 +105,12 @@ async def update_driver_profile(
     
     update_doc["updatedAt"] = datetime.utcnow()
     
-    result = db.drivers.find_one_and_update(
+    result = await db.drivers.find_one_and_update(
         {"_id": driver["_id"]},
         {"$set": update_doc},
         return_document=True
     )
+    sync_driver(location_buffer.with_latest_location(result))
     
     result["id"] = str(result.pop("_id"))
     if result.get("createdAt"):
@@ -113,21 +130,10 @@ async def update_location(
     location: DriverLocationUpdate,
     current_user: dict = Depends(get_driver_user)
 ):
-    db = get_database()
-    
-    # Ensure driver profile exists
-    driver = get_or_create_driver_profile(current_user["id"], db)
-    
-    result = db.drivers.find_one_and_update(
-        {"_id": driver["_id"]},
-        {
-            "$set": {
-                "currentLocation": {"lat": location.lat, "lng": location.lng},
-                "updatedAt": datetime.utcnow()
-            }
-        },
-        return_document=True
-    )
+    # Written to the database by the next buffer flush, which also creates
+    # the driver profile if this is its first location
+    if not location_buffer.add(current_user["id"], location.lat, location.lng):
+        raise HTTPException(status_code=503, detail="Location updates are backed up, retry shortly")
     
     return {
         "success": True,
@@ -143,26 +149,24 @@ async def update_location(
 async def get_pending_ride_requests(
     current_user: dict = Depends(get_driver_user),
     page: int = Query(1, ge=1),
+    cursor: Optional[str] = Query(None),
     limit: int = Query(10, ge=1, le=50)
 ):
     db = get_database()
     
     # Get or create driver profile
-    driver = get_or_create_driver_profile(current_user["id"], db)
-    
-    skip = (page - 1) * limit
+    driver = await get_or_create_driver_profile(current_user["id"], db)
     
     # Find pending bookings
-    bookings = list(db.bookings.find({
-        "status": "requested",
-        "rideId": None
-    }).sort("createdAt", -1).skip(skip).limit(limit))
+    bookings, pagination = await fetch_page(
+        db.bookings, {"status": "requested", "rideId": None}, "createdAt", page, limit, cursor
+    )
     
-    total = db.bookings.count_documents({"status": "requested", "rideId": None})
+    users = await resolve_users(db, (booking["userId"] for booking in bookings))
     
     requests = []
     for booking in bookings:
-        user = db.users.find_one({"_id": ObjectId(booking["userId"])})
+        user = users.get(booking["userId"])
         requests.append({
             "bookingId": str(booking["_id"]),
             "userId": booking["userId"],
@@ -178,12 +182,7 @@ async def get_pending_ride_requests(
         "success": True,
         "data": {
             "requests": requests,
-            "pagination": {
-                "page": page,
-                "limit": limit,
-                "total": total,
-                "pages": (total + limit - 1) // limit
-            }
+            "pagination": pagination
         }
     }
 
@@ -196,62 +195,52 @@ async def accept_ride(
     db = get_database()
     
     # Get or create driver
-    driver = get_or_create_driver_profile(current_user["id"], db)
+    driver = await get_or_create_driver_profile(current_user["id"], db)
     
-    # Get booking
     try:
-        booking = db.bookings.find_one({"_id": ObjectId(booking_id)})
+        booking_oid = ObjectId(booking_id)
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid booking ID")
     
-    if not booking:
-        raise HTTPException(status_code=404, detail="Booking not found")
+    now = datetime.utcnow()
     
-    if booking["status"] != "requested":
+    # Claim the booking and the driver atomically, so a concurrent accept or
+    # dispatch cycle can never turn the same booking or driver into two rides
+    booking = await db.bookings.find_one_and_update(
+        {"_id": booking_oid, "status": "requested", "rideId": None},
+        {"$set": {"status": "matched", "updatedAt": now}}
+    )
+    if not booking:
+        if not await db.bookings.find_one({"_id": booking_oid}, {"_id": 1}):
+            raise HTTPException(status_code=404, detail="Booking not found")
         raise HTTPException(status_code=400, detail="Booking is no longer available")
     
-    now = datetime.utcnow()
+    claimed = await db.drivers.update_one(
+        {"_id": driver["_id"], "isAvailable": True},
+        {"$set": {"isAvailable": False, "updatedAt": now}}
+    )
+    if not claimed.modified_count:
+        await db.bookings.update_one(
+            {"_id": booking_oid, "status": "matched", "rideId": None},
+            {"$set": {"status": "requested", "updatedAt": now}}
+        )
+        raise HTTPException(status_code=400, detail="Driver is not available")
+    driver_index.remove(driver["userId"])
     
     # Create a new ride
-    ride_doc = {
-        "driverId": str(driver["_id"]),
-        "passengers": [{
-            "userId": booking["userId"],
-            "pickupLocation": booking["pickupLocation"],
-            "dropoffLocation": booking["dropoffLocation"],
-            "status": "pending",
-            "fare": booking["fare"]
-        }],
-        "isPooled": booking["wantPooling"],
-        "status": "accepted",
-        "route": [],
-        "totalFare": booking["fare"],
-        "startTime": None,
-        "endTime": None,
-        "createdAt": now,
-        "updatedAt": now
-    }
+    ride_doc = build_ride_from_booking(booking, str(driver["_id"]), now, driver.get("currentLocation"))
     
-    ride_result = db.rides.insert_one(ride_doc)
+    ride_result = await db.rides.insert_one(ride_doc)
     ride_id = str(ride_result.inserted_id)
+    await record_rides_created(db, [ride_doc])
     
-    # Update booking
-    db.bookings.update_one(
-        {"_id": ObjectId(booking_id)},
-        {
-            "$set": {
-                "rideId": ride_id,
-                "status": "matched",
-                "updatedAt": now
-            }
-        }
-    )
+    await db.bookings.update_one({"_id": booking_oid}, {"$set": {"rideId": ride_id}})
     
-    # Mark driver as unavailable
-    db.drivers.update_one(
-        {"_id": driver["_id"]},
-        {"$set": {"isAvailable": False, "updatedAt": now}}
-    )
+    # The booking stops being poolable; a pooled ride takes its place
+    await remove_pools(db, [booking["_id"]])
+    await sync_ride_pool(db, ride_doc)
+    
+    await retract_ride_request(booking, "accepted")
     
     return {
         "success": True,
@@ -289,10 +278,10 @@ async def update_ride_status(
 ):
     db = get_database()
     
-    driver = get_or_create_driver_profile(current_user["id"], db)
+    driver = await get_or_create_driver_profile(current_user["id"], db)
     
     try:
-        ride = db.rides.find_one({
+        ride = await db.rides.find_one({
             "_id": ObjectId(ride_id),
             "driverId": str(driver["_id"])
         })
@@ -302,6 +291,17 @@ async def update_ride_status(
     if not ride:
         raise HTTPException(status_code=404, detail="Ride not found")
     
+    if ride["status"] == status:
+        # Repeated request: the transition and its side effects already happened
+        return {
+            "success": True,
+            "message": f"Ride status updated to {status}",
+            "data": {"rideId": ride_id, "status": status}
+        }
+    
+    if ride["status"] in ["completed", "cancelled"]:
+        raise HTTPException(status_code=400, detail=f"Ride is already {ride['status']}")
+    
     now = datetime.utcnow()
     update_data = {"status": status, "updatedAt": now}
     
@@ -309,31 +309,49 @@ async def update_ride_status(
         update_data["startTime"] = now
     elif status == "completed":
         update_data["endTime"] = now
+    
+    ride_update = {"$set": update_data}
+    if status in ["completed", "cancelled"]:
+        # Finished rides leave the pool corridor index
+        ride_update["$unset"] = {"corridor": ""}
+    
+    # Only the request that actually moves the ride applies the transition
+    result = await db.rides.update_one({"_id": ObjectId(ride_id), "status": ride["status"]}, ride_update)
+    if not result.modified_count:
+        raise HTTPException(status_code=400, detail="Ride status changed, please retry")
+    await record_ride_status(db, ride["status"], status, ride.get("totalFare", 0))
+    
+    if status == "completed":
         # Mark driver as available
-        db.drivers.update_one(
+        await db.drivers.update_one(
             {"_id": driver["_id"]},
             {"$set": {"isAvailable": True, "updatedAt": now}, "$inc": {"totalTrips": 1}}
         )
+        sync_driver(location_buffer.with_latest_location({**driver, "isAvailable": True}))
         # Update all passenger bookings
         for passenger in ride.get("passengers", []):
-            db.bookings.update_one(
+            await db.bookings.update_one(
                 {"userId": passenger["userId"], "rideId": ride_id},
                 {"$set": {"status": "completed", "paymentStatus": "paid", "updatedAt": now}}
             )
     elif status == "cancelled":
         # Mark driver as available
-        db.drivers.update_one(
+        await db.drivers.update_one(
             {"_id": driver["_id"]},
             {"$set": {"isAvailable": True, "updatedAt": now}}
         )
+        sync_driver(location_buffer.with_latest_location({**driver, "isAvailable": True}))
         # Update all passenger bookings
         for passenger in ride.get("passengers", []):
-            db.bookings.update_one(
+            await db.bookings.update_one(
                 {"userId": passenger["userId"], "rideId": ride_id},
                 {"$set": {"status": "cancelled", "updatedAt": now}}
             )
     
-    db.rides.update_one({"_id": ObjectId(ride_id)}, {"$set": update_data})
+    # None of these statuses can be joined any more
+    await remove_pools(db, [ride["_id"]])
+    if status in ["completed", "cancelled"]:
+        await close_ride_room(ride_id)
     
     return {
         "success": True,
@@ -347,20 +365,18 @@ async def get_driver_rides(
     current_user: dict = Depends(get_driver_user),
     status: Optional[str] = Query(None),
     page: int = Query(1, ge=1),
+    cursor: Optional[str] = Query(None),
     limit: int = Query(10, ge=1, le=50)
 ):
     db = get_database()
     
-    driver = get_or_create_driver_profile(current_user["id"], db)
+    driver = await get_or_create_driver_profile(current_user["id"], db)
     
     query = {"driverId": str(driver["_id"])}
     if status:
         query["status"] = status
     
-    skip = (page - 1) * limit
-    
-    rides = list(db.rides.find(query).sort("createdAt", -1).skip(skip).limit(limit))
-    total = db.rides.count_documents(query)
+    rides, pagination = await fetch_page(db.rides, query, "createdAt", page, limit, cursor)
     
     for ride in rides:
         ride["id"] = str(ride.pop("_id"))
@@ -377,11 +393,6 @@ async def get_driver_rides(
         "success": True,
         "data": {
             "rides": rides,
-            "pagination": {
-                "page": page,
-                "limit": limit,
-                "total": total,
-                "pages": (total + limit - 1) // limit
-            }
+            "pagination": pagination
         }
     }
@@ -2,8 +2,13 @@ from fastapi import APIRouter, HTTPException, Query, Depends
 from bson import ObjectId
 from typing import Optional
 from app.utils.database import get_database
-from app.services.ride_matching import find_pool_matches, find_nearby_drivers, haversine_distance
+from app.services.ride_matching import find_pool_matches, find_nearby_drivers
 from app.routes.auth import get_current_user
+from app.utils.geo import geo_near_stage
+from app.services.pool_corridor import MAX_POOL_DEVIATION_KM, build_corridor
+from app.services.ride_feed import retract_ride_request
+from app.services.open_pools import MAX_POOL_PASSENGERS, remove_pools, sync_ride_pool
+from app.services.platform_stats import record_rides_created
 
 router = APIRouter(prefix="/api/rides", tags=["Rides"])
 
@@ -20,130 +25,49 @@ async def get_available_pools(
     """Get available pooling rides that users can join."""
     db = get_database()
     
-    # Find rides that accept pooling and are not full
-    query = {
-        "isPooled": True,
-        "status": {"$in": ["requested", "accepted"]},
-        "$expr": {"$lt": [{"$size": "$passengers"}, 4]}  # Max 4 passengers
-    }
+    query = {}
+    # Skip pools the current user is already part of
+    if current_user:
+        query["memberIds"] = {"$ne": current_user["id"]}
     
     skip = (page - 1) * limit
+    use_location = lat is not None and lng is not None
     
-    rides = list(db.rides.find(query).sort("createdAt", -1).skip(skip).limit(limit))
-    
-    # Also find requested bookings that want pooling (not yet matched to a ride)
-    pooling_bookings = list(db.bookings.find({
-        "wantPooling": True,
-        "status": "requested",
-        "rideId": None
-    }).sort("createdAt", -1).skip(skip).limit(limit))
+    # Closest first when searching by location, newest first otherwise
+    if use_location:
+        pipeline = [geo_near_stage(lat, lng, "pickupGeo", query, radius)]
+    else:
+        pipeline = [{"$match": query}, {"$sort": {"createdAt": -1}}]
     
-    total_rides = db.rides.count_documents(query)
-    total_bookings = db.bookings.count_documents({
-        "wantPooling": True,
-        "status": "requested",
-        "rideId": None
+    # Page and total come back from the same query
+    pipeline.append({
+        "$facet": {
+            "pools": [{"$skip": skip}, {"$limit": limit}],
+            "total": [{"$count": "count"}]
+        }
     })
+    results = await db.open_pools.aggregate(pipeline).to_list(None)
+    result = results[0] if results else {"pools": [], "total": []}
+    total = result["total"][0]["count"] if result["total"] else 0
     
     available_pools = []
-    
-    # Process active rides
-    for ride in rides:
-        if not ride.get("passengers"):
-            continue
-        
-        first_passenger = ride["passengers"][0]
-        pickup = first_passenger.get("pickupLocation", {})
-        dropoff = first_passenger.get("dropoffLocation", {})
-        
-        # Skip if no location or if user is already in this ride
-        if not pickup or not dropoff:
-            continue
-        
-        # Check if current user is already a passenger
-        user_in_ride = False
-        if current_user:
-            for p in ride.get("passengers", []):
-                if p.get("userId") == current_user.get("id"):
-                    user_in_ride = True
-                    break
-        
-        if user_in_ride:
-            continue
-        
-        # Filter by proximity if coordinates provided
-        if lat is not None and lng is not None:
-            distance = haversine_distance(lat, lng, pickup["lat"], pickup["lng"])
-            if distance > radius:
-                continue
-        else:
-            distance = None
-        
-        # Get driver info if available
-        driver_info = None
-        if ride.get("driverId"):
-            driver = db.drivers.find_one({"_id": ObjectId(ride["driverId"])})
-            if driver:
-                user = db.users.find_one({"_id": ObjectId(driver["userId"])})
-                driver_info = {
-                    "name": user["name"] if user else "Unknown",
-                    "vehicleType": driver["vehicleType"],
-                    "rating": driver.get("rating", 0)
-                }
-        
-        available_pools.append({
-            "type": "ride",
-            "id": str(ride["_id"]),
-            "pickupLocation": pickup,
-            "dropoffLocation": dropoff,
-            "currentPassengers": len(ride.get("passengers", [])),
-            "maxPassengers": 4,
-            "status": ride["status"],
-            "driver": driver_info,
-            "distance": round(distance, 2) if distance else None,
-            "createdAt": ride["createdAt"].isoformat() if ride.get("createdAt") else None
-        })
-    
-    # Process pooling bookings
-    for booking in pooling_bookings:
-        pickup = booking.get("pickupLocation", {})
-        dropoff = booking.get("dropoffLocation", {})
-        
-        if not pickup or not dropoff:
-            continue
-        
-        # Skip if this is the current user's booking
-        if current_user and booking.get("userId") == current_user.get("id"):
-            continue
-        
-        # Filter by proximity if coordinates provided
-        if lat is not None and lng is not None:
-            distance = haversine_distance(lat, lng, pickup["lat"], pickup["lng"])
-            if distance > radius:
-                continue
+    for entry in result["pools"]:
+        pool = {
+            "type": entry["type"],
+            "id": str(entry["_id"]),
+            "pickupLocation": entry["pickupLocation"],
+            "dropoffLocation": entry["dropoffLocation"],
+            "currentPassengers": entry["currentPassengers"],
+            "maxPassengers": entry["maxPassengers"],
+            "status": entry["status"],
+            "distance": round(entry["distance"], 2) if use_location else None,
+            "createdAt": entry["createdAt"].isoformat() if entry.get("createdAt") else None
+        }
+        if entry["type"] == "ride":
+            pool["driver"] = entry.get("driver")
         else:
-            distance = None
-        
-        # Get user info
-        user = db.users.find_one({"_id": ObjectId(booking["userId"])})
-        user_name = user["name"] if user else "Unknown"
-        
-        available_pools.append({
-            "type": "booking",
-            "id": str(booking["_id"]),
-            "pickupLocation": pickup,
-            "dropoffLocation": dropoff,
-            "currentPassengers": 1,
-            "maxPassengers": 4,
-            "status": booking["status"],
-            "userName": user_name,
-            "distance": round(distance, 2) if distance else None,
-            "createdAt": booking["createdAt"].isoformat() if booking.get("createdAt") else None
-        })
-    
-    # Sort by distance if available
-    if lat is not None and lng is not None:
-        available_pools.sort(key=lambda x: x.get("distance") or float("inf"))
+            pool["userName"] = entry.get("userName", "Unknown")
+        available_pools.append(pool)
     
     return {
         "success": True,
@@ -152,8 +76,8 @@ async def get_available_pools(
             "pagination": {
                 "page": page,
                 "limit": limit,
-                "total": total_rides + total_bookings,
-                "pages": ((total_rides + total_bookings) + limit - 1) // limit
+                "total": total,
+                "pages": (total + limit - 1) // limit
             }
         }
     }
@@ -191,7 +115,7 @@ async def join_pool(
     
     try:
         # Try to find as ride first
-        ride = db.rides.find_one({"_id": pool_object_id})
+        ride = await db.rides.find_one({"_id": pool_object_id})
         
         if ride:
             # Check if ride is still open for pooling
@@ -201,7 +125,7 @@ async def join_pool(
             if ride["status"] not in ["requested", "accepted"]:
                 raise HTTPException(status_code=400, detail="This ride is no longer available for pooling")
             
-            if len(ride.get("passengers", [])) >= 4:
+            if len(ride.get("passengers", [])) >= MAX_POOL_PASSENGERS:
                 raise HTTPException(status_code=400, detail="This pool is full")
             
             # Check if user is already in the ride
@@ -228,15 +152,27 @@ async def join_pool(
                 "fare": fare_info["totalFare"]
             }
             
+            # The corridor also covers the assigned driver, where the route starts
+            driver = None
+            if ride.get("driverId"):
+                driver = await db.drivers.find_one({"_id": ObjectId(ride["driverId"])}, {"currentLocation": 1})
+            
             # Update ride with new passenger
-            db.rides.update_one(
+            await db.rides.update_one(
                 {"_id": ObjectId(pool_id)},
                 {
                     "$push": {"passengers": new_passenger},
                     "$inc": {"totalFare": fare_info["totalFare"]},
-                    "$set": {"updatedAt": now}
+                    "$set": {
+                        "corridor": build_corridor(
+                            ride["passengers"] + [new_passenger],
+                            driver.get("currentLocation") if driver else None
+                        ),
+                        "updatedAt": now
+                    }
                 }
             )
+            await sync_ride_pool(db, {**ride, "passengers": ride["passengers"] + [new_passenger]})
             
             # Create a booking for this user
             booking_doc = {
@@ -252,7 +188,7 @@ async def join_pool(
                 "updatedAt": now
             }
             
-            result = db.bookings.insert_one(booking_doc)
+            result = await db.bookings.insert_one(booking_doc)
             
             return {
                 "success": True,
@@ -265,7 +201,7 @@ async def join_pool(
             }
         else:
             # Try to find as a booking (user wants to pool with another user's booking)
-            existing_booking = db.bookings.find_one({"_id": pool_object_id})
+            existing_booking = await db.bookings.find_one({"_id": pool_object_id})
             
             if not existing_booking:
                 raise HTTPException(status_code=404, detail="Pool not found")
@@ -279,47 +215,50 @@ async def join_pool(
             now = datetime.utcnow()
             
             # Create a new ride that combines both bookings
+            passengers = [
+                {
+                    "userId": existing_booking["userId"],
+                    "pickupLocation": existing_booking["pickupLocation"],
+                    "dropoffLocation": existing_booking["dropoffLocation"],
+                    "status": "pending",
+                    "fare": existing_booking["fare"]
+                },
+                {
+                    "userId": current_user["id"],
+                    "pickupLocation": {
+                        "lat": pickup_lat,
+                        "lng": pickup_lng,
+                        "address": pickup_address
+                    },
+                    "dropoffLocation": {
+                        "lat": dropoff_lat,
+                        "lng": dropoff_lng,
+                        "address": dropoff_address
+                    },
+                    "status": "pending",
+                    "fare": fare_info["totalFare"]
+                }
+            ]
             ride_doc = {
                 "driverId": None,
-                "passengers": [
-                    {
-                        "userId": existing_booking["userId"],
-                        "pickupLocation": existing_booking["pickupLocation"],
-                        "dropoffLocation": existing_booking["dropoffLocation"],
-                        "status": "pending",
-                        "fare": existing_booking["fare"]
-                    },
-                    {
-                        "userId": current_user["id"],
-                        "pickupLocation": {
-                            "lat": pickup_lat,
-                            "lng": pickup_lng,
-                            "address": pickup_address
-                        },
-                        "dropoffLocation": {
-                            "lat": dropoff_lat,
-                            "lng": dropoff_lng,
-                            "address": dropoff_address
-                        },
-                        "status": "pending",
-                        "fare": fare_info["totalFare"]
-                    }
-                ],
+                "passengers": passengers,
                 "isPooled": True,
                 "status": "requested",
                 "route": [],
                 "totalFare": existing_booking["fare"] + fare_info["totalFare"],
                 "startTime": None,
                 "endTime": None,
+                "corridor": build_corridor(passengers),
                 "createdAt": now,
                 "updatedAt": now
             }
             
-            ride_result = db.rides.insert_one(ride_doc)
+            ride_result = await db.rides.insert_one(ride_doc)
             ride_id = str(ride_result.inserted_id)
+            await record_rides_created(db, [ride_doc])
             
             # Update existing booking
-            db.bookings.update_one(
+            await db.bookings.update_one(
                 {"_id": ObjectId(pool_id)},
                 {
                     "$set": {
@@ -329,6 +268,11 @@ async def join_pool(
                     }
                 }
             )
+            await retract_ride_request(existing_booking, "pooled")
+            
+            # The booking's pool entry is replaced by the new ride's
+            await remove_pools(db, [pool_object_id])
+            await sync_ride_pool(db, ride_doc)
             
             # Create new booking for current user
             new_booking_doc = {
@@ -352,7 +296,7 @@ async def join_pool(
                 "updatedAt": now
             }
             
-            result = db.bookings.insert_one(new_booking_doc)
+            result = await db.bookings.insert_one(new_booking_doc)
             
             return {
                 "success": True,
@@ -378,13 +322,13 @@ async def find_matches(
     pickup_lng: float = Query(..., ge=-180, le=180),
     dropoff_lat: float = Query(..., ge=-90, le=90),
     dropoff_lng: float = Query(..., ge=-180, le=180),
-    max_deviation: float = Query(5.0, ge=0, le=20)
+    max_deviation: float = Query(5.0, ge=0, le=MAX_POOL_DEVIATION_KM)
 ):
     """Find pool matches for a ride request."""
     pickup = {"lat": pickup_lat, "lng": pickup_lng}
     dropoff = {"lat": dropoff_lat, "lng": dropoff_lng}
     
-    matches = find_pool_matches(pickup, dropoff, max_deviation)
+    matches = await find_pool_matches(pickup, dropoff, max_deviation)
     
     return {
         "success": True,
@@ -402,7 +346,7 @@ async def get_nearby_drivers(
     radius: float = Query(10.0, ge=1, le=50)
 ):
     """Get available drivers within a specified radius."""
-    drivers = find_nearby_drivers(lat, lng, radius)
+    drivers = await find_nearby_drivers(lat, lng, radius)
     
     return {
         "success": True,
@@ -419,7 +363,7 @@ async def get_ride(ride_id: str):
     db = get_database()
     
     try:
-        ride = db.rides.find_one({"_id": ObjectId(ride_id)})
+        ride = await db.rides.find_one({"_id": ObjectId(ride_id)})
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid ride ID")
     
@@ -439,9 +383,9 @@ async def get_ride(ride_id: str):
     # Get driver info
     driver_info = None
     if ride.get("driverId"):
-        driver = db.drivers.find_one({"_id": ObjectId(ride["driverId"])})
+        driver = await db.drivers.find_one({"_id": ObjectId(ride["driverId"])})
         if driver:
-            user = db.users.find_one({"_id": ObjectId(driver["userId"])})
+            user = await db.users.find_one({"_id": ObjectId(driver["userId"])})
             driver_info = {
                 "id": str(driver["_id"]),
                 "name": user["name"] if user else "Unknown",
@@ -2,15 +2,23 @@ from fastapi import APIRouter, HTTPException, Depends, Query
 from datetime import datetime
 from bson import ObjectId
 from typing import Optional
+from pymongo import ASCENDING
 from app.routes.auth import get_current_user
-from app.utils.database import get_database
+from app.utils.database import EXAMPLE_ID, declare_index, declare_query, get_database
+from app.utils.pagination import NEWEST_FIRST, fetch_page
 from app.models.user import UserUpdate
 from app.models.booking import BookingCreate
 from app.services.auth_service import update_user
 from app.services.payment_service import calculate_fare
+from app.services.ride_feed import nearest_driver_ids, publish_ride_request, retract_ride_request
+from app.services.open_pools import remove_pools, sync_booking_pool
 
 router = APIRouter(prefix="/api/user", tags=["User"])
 
+declare_index("bookings", [("userId", ASCENDING)] + NEWEST_FIRST)
+declare_query("user rides page", "bookings", {"userId": EXAMPLE_ID}, NEWEST_FIRST)
+declare_query("user rides by status", "bookings", {"userId": EXAMPLE_ID, "status": "completed"}, NEWEST_FIRST)
+
 
 @router.get("/profile")
 async def get_profile(current_user: dict = Depends(get_current_user)):
@@ -29,7 +37,7 @@ async def update_profile(
     if not update_dict:
         raise HTTPException(status_code=400, detail="No data to update")
     
-    updated_user = update_user(current_user["id"], update_dict)
+    updated_user = await update_user(current_user["id"], update_dict)
     if not updated_user:
         raise HTTPException(status_code=500, detail="Failed to update profile")
     
@@ -69,12 +77,17 @@ async def request_ride(
         "status": "requested",
         "fare": fare_info["totalFare"],
         "paymentStatus": "pending",
+        # Drivers the request is pushed to, so removals reach the same set
+        "notifiedDrivers": nearest_driver_ids(booking_data.pickupLocation.model_dump()),
         "createdAt": now,
         "updatedAt": now
     }
     
-    result = db.bookings.insert_one(booking_doc)
+    result = await db.bookings.insert_one(booking_doc)
     booking_doc["_id"] = result.inserted_id
+    await sync_booking_pool(db, booking_doc, current_user["name"])
+    
+    await publish_ride_request(booking_doc, current_user["name"])
     
     return {
         "success": True,
@@ -97,6 +110,7 @@ async def get_user_rides(
     current_user: dict = Depends(get_current_user),
     status: Optional[str] = Query(None),
     page: int = Query(1, ge=1),
+    cursor: Optional[str] = Query(None),
     limit: int = Query(10, ge=1, le=50)
 ):
     db = get_database()
@@ -105,13 +119,11 @@ async def get_user_rides(
     if status:
         query["status"] = status
     
-    skip = (page - 1) * limit
-    
-    bookings = list(db.bookings.find(query).sort("createdAt", -1).skip(skip).limit(limit))
-    total = db.bookings.count_documents(query)
+    bookings, pagination = await fetch_page(db.bookings, query, "createdAt", page, limit, cursor)
     
     for booking in bookings:
         booking["id"] = str(booking.pop("_id"))
+        booking.pop("notifiedDrivers", None)
         if booking.get("createdAt"):
             booking["createdAt"] = booking["createdAt"].isoformat()
         if booking.get("updatedAt"):
@@ -121,12 +133,7 @@ async def get_user_rides(
         "success": True,
         "data": {
             "rides": bookings,
-            "pagination": {
-                "page": page,
-                "limit": limit,
-                "total": total,
-                "pages": (total + limit - 1) // limit
-            }
+            "pagination": pagination
         }
     }
 
@@ -139,7 +146,7 @@ async def get_ride_details(
     db = get_database()
     
     try:
-        booking = db.bookings.find_one({
+        booking = await db.bookings.find_one({
             "_id": ObjectId(ride_id),
             "userId": current_user["id"]
         })
@@ -150,6 +157,7 @@ async def get_ride_details(
         raise HTTPException(status_code=404, detail="Ride not found")
     
     booking["id"] = str(booking.pop("_id"))
+    booking.pop("notifiedDrivers", None)
     if booking.get("createdAt"):
         booking["createdAt"] = booking["createdAt"].isoformat()
     if booking.get("updatedAt"):
@@ -158,7 +166,7 @@ async def get_ride_details(
     # Get ride details if matched
     ride_info = None
     if booking.get("rideId"):
-        ride = db.rides.find_one({"_id": ObjectId(booking["rideId"])})
+        ride = await db.rides.find_one({"_id": ObjectId(booking["rideId"])})
         if ride:
             ride_info = {
                 "id": str(ride["_id"]),
@@ -169,9 +177,9 @@ async def get_ride_details(
             
             # Get driver info
             if ride.get("driverId"):
-                driver = db.drivers.find_one({"_id": ObjectId(ride["driverId"])})
+                driver = await db.drivers.find_one({"_id": ObjectId(ride["driverId"])})
                 if driver:
-                    user = db.users.find_one({"_id": ObjectId(driver["userId"])})
+                    user = await db.users.find_one({"_id": ObjectId(driver["userId"])})
                     ride_info["driver"] = {
                         "name": user["name"] if user else "Unknown",
                         "vehicleType": driver["vehicleType"],
@@ -187,3 +195,37 @@ async def get_ride_details(
             "ride": ride_info
         }
     }
+
+
+@router.put("/rides/{booking_id}/cancel")
+async def cancel_ride_request(
+    booking_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """Cancel a booking that no driver has taken yet."""
+    db = get_database()
+    
+    try:
+        booking = await db.bookings.find_one_and_update(
+            {
+                "_id": ObjectId(booking_id),
+                "userId": current_user["id"],
+                "status": "requested",
+                "rideId": None
+            },
+            {"$set": {"status": "cancelled", "updatedAt": datetime.utcnow()}}
+        )
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid booking ID")
+    
+    if not booking:
+        raise HTTPException(status_code=400, detail="Booking cannot be cancelled")
+    
+    await remove_pools(db, [booking["_id"]])
+    await retract_ride_request(booking, "cancelled")
+    
+    return {
+        "success": True,
+        "message": "Ride request cancelled",
+        "data": {"bookingId": booking_id, "status": "cancelled"}
+    }
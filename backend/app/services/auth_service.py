@@ -1,23 +1,43 @@
 import bcrypt
 from datetime import datetime
 from bson import ObjectId
-from app.utils.database import get_database
+from pymongo import ASCENDING
+from app.config import settings
+from app.utils.cache import TTLCache
+from app.utils.database import declare_index, declare_query, get_database
 from app.utils.jwt_handler import create_access_token
 from app.models.user import UserCreate, UserLogin
+from app.services.password_pool import password_pool
 
+# Login and registration look users up by email
+declare_index("users", [("email", ASCENDING)], unique=True)
+declare_query("login by email", "users", {"email": "user1@ridepool.pk"})
 
-def hash_password(password: str) -> str:
+# Formatted users keyed by id, for resolving the caller of every request
+user_cache = TTLCache(settings.USER_CACHE_SIZE, settings.USER_CACHE_TTL)
+
+
+def _hash_password(password: str) -> str:
     return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
 
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
+def _verify_password(plain_password: str, hashed_password: str) -> bool:
     return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
 
 
-def register_user(user_data: UserCreate) -> dict:
+async def hash_password(password: str) -> str:
+    """bcrypt on the password pool; raises PasswordPoolBusy when saturated."""
+    return await password_pool.run(_hash_password, password)
+
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await password_pool.run(_verify_password, plain_password, hashed_password)
+
+
+async def register_user(user_data: UserCreate) -> dict:
     db = get_database()
     
-    existing_user = db.users.find_one({"email": user_data.email})
+    existing_user = await db.users.find_one({"email": user_data.email})
     if existing_user:
         return {"error": "Email already registered"}
     
@@ -26,14 +46,14 @@ def register_user(user_data: UserCreate) -> dict:
         "name": user_data.name,
         "email": user_data.email,
         "phone": user_data.phone,
-        "password": hash_password(user_data.password),
+        "password": await hash_password(user_data.password),
         "role": user_data.role,
         "profileImage": None,
         "createdAt": now,
         "updatedAt": now
     }
     
-    result = db.users.insert_one(user_doc)
+    result = await db.users.insert_one(user_doc)
     user_doc["_id"] = result.inserted_id
     
     # If registering as a driver, create a driver profile
@@ -46,11 +66,13 @@ def register_user(user_data: UserCreate) -> dict:
             "currentLocation": None,
             "isAvailable": False,  # Not available until profile is completed
             "rating": 0.0,
+            "ratingSum": 0,
+            "ratingCount": 0,
             "totalTrips": 0,
             "createdAt": now,
             "updatedAt": now
         }
-        db.drivers.insert_one(driver_doc)
+        await db.drivers.insert_one(driver_doc)
     
     token = create_access_token({
         "sub": str(user_doc["_id"]),
@@ -64,14 +86,14 @@ def register_user(user_data: UserCreate) -> dict:
     }
 
 
-def login_user(login_data: UserLogin) -> dict:
+async def login_user(login_data: UserLogin) -> dict:
     db = get_database()
     
-    user = db.users.find_one({"email": login_data.email})
+    user = await db.users.find_one({"email": login_data.email})
     if not user:
         return {"error": "Invalid email or password"}
     
-    if not verify_password(login_data.password, user["password"]):
+    if not await verify_password(login_data.password, user["password"]):
         return {"error": "Invalid email or password"}
     
     token = create_access_token({
@@ -86,10 +108,10 @@ def login_user(login_data: UserLogin) -> dict:
     }
 
 
-def get_user_by_id(user_id: str) -> dict | None:
+async def get_user_by_id(user_id: str) -> dict | None:
     db = get_database()
     try:
-        user = db.users.find_one({"_id": ObjectId(user_id)})
+        user = await db.users.find_one({"_id": ObjectId(user_id)})
         if user:
             return format_user_response(user)
         return None
@@ -97,15 +119,33 @@ def get_user_by_id(user_id: str) -> dict | None:
         return None
 
 
-def update_user(user_id: str, update_data: dict) -> dict | None:
+async def get_cached_user(user_id: str) -> dict | None:
+    """get_user_by_id through user_cache; callers get their own copy."""
+    user = user_cache.get(user_id)
+    if user is None:
+        user = await get_user_by_id(user_id)
+        if user is None:
+            return None
+        user_cache.set(user_id, user)
+    return dict(user)
+
+
+def invalidate_user(user_id: str):
+    """Drop a user from the cache after their record or role changed."""
+    user_cache.invalidate(user_id)
+
+
+async def update_user(user_id: str, update_data: dict) -> dict | None:
     db = get_database()
     try:
         update_data["updatedAt"] = datetime.utcnow()
-        result = db.users.find_one_and_update(
+        result = await db.users.find_one_and_update(
             {"_id": ObjectId(user_id)},
             {"$set": update_data},
             return_document=True
         )
+        # After the write, so a concurrent request cannot re-cache the old record
+        invalidate_user(user_id)
         if result:
             return format_user_response(result)
         return None
@@ -0,0 +1,378 @@
+import asyncio
+import math
+import time
+from datetime import datetime
+from typing import Dict, List, Tuple
+from bson import ObjectId
+from pymongo import ASCENDING, UpdateOne
+from scipy.optimize import linear_sum_assignment
+from app.config import settings
+from app.utils.database import declare_index, declare_query, get_database
+from app.utils.geo import haversine_matrix, to_arrays
+from app.utils.pagination import NEWEST_FIRST
+from app.services.driver_index import driver_index
+from app.services.pool_corridor import build_corridor, corridor_fields
+from app.services.ride_matching import build_stop_sequence
+from app.services.ride_feed import retract_ride_request
+from app.services.open_pools import remove_pools, sync_ride_pools
+from app.services.platform_stats import record_ride_status, record_rides_created
+from app.websocket.socket_handler import emit_ride_accepted, emit_ride_assigned
+
+REGION_CELL_DEG = 0.5  # Matching is solved per ~55 km region and its neighbours
+UNREACHABLE_COST = 1e9
+
+# Each cycle loads open bookings, unassigned pooled rides and available drivers
+declare_index("bookings", [("status", ASCENDING), ("rideId", ASCENDING)] + NEWEST_FIRST)
+declare_index("rides", [("isPooled", ASCENDING), ("status", ASCENDING), ("driverId", ASCENDING)])
+declare_index("drivers", [("isAvailable", ASCENDING)] + NEWEST_FIRST)
+declare_query("open bookings", "bookings", {"status": "requested", "rideId": None})
+declare_query("unassigned pooled rides", "rides", {"isPooled": True, "status": "requested", "driverId": None})
+declare_query("available drivers", "drivers", {"isAvailable": True, "currentLocation": {"$ne": None}})
+# Per-cycle claim markers, only set mid-cycle
+declare_index("drivers", [("dispatchId", ASCENDING)], sparse=True)
+declare_index("bookings", [("dispatchId", ASCENDING)], sparse=True)
+declare_index("rides", [("dispatchId", ASCENDING)], sparse=True)
+for collection in ("drivers", "bookings", "rides"):
+    declare_query(f"dispatch claimed {collection}", collection, {"dispatchId": ObjectId()})
+
+
+def build_ride_from_booking(booking: dict, driver_id: str, now: datetime, start: dict | None = None) -> dict:
+    """
+    Ride document for a booking accepted by (or dispatched to) a driver.
+    start is the driver's position, which a pooled ride's corridor covers.
+    """
+    passengers = [{
+        "userId": booking["userId"],
+        "pickupLocation": booking["pickupLocation"],
+        "dropoffLocation": booking["dropoffLocation"],
+        "status": "pending",
+        "fare": booking["fare"]
+    }]
+    return {
+        "driverId": driver_id,
+        "passengers": passengers,
+        "isPooled": booking["wantPooling"],
+        "status": "accepted",
+        "route": [],
+        "totalFare": booking["fare"],
+        "startTime": None,
+        "endTime": None,
+        **corridor_fields(passengers, booking["wantPooling"], start),
+        "createdAt": now,
+        "updatedAt": now
+    }
+
+
+def _region(location: dict) -> Tuple[int, int]:
+    return (
+        math.floor(location["lat"] / REGION_CELL_DEG),
+        math.floor(location["lng"] / REGION_CELL_DEG)
+    )
+
+
+def solve_assignment(
+    jobs: List[dict],
+    drivers: List[dict],
+    max_pickup_km: float
+) -> List[Tuple[int, int, float]]:
+    """
+    Min-cost assignment of jobs to drivers on pickup distance.
+
+    Each job needs a `pickup` location and each driver a `currentLocation`.
+    Regions are solved one at a time (Hungarian method) against the drivers
+    of the surrounding 3x3 regions that are still free, which keeps every
+    cost matrix city-sized. Returns (job index, driver index, km) triples.
+    """
+    jobs_by_region: Dict[Tuple[int, int], List[int]] = {}
+    for i, job in enumerate(jobs):
+        jobs_by_region.setdefault(_region(job["pickup"]), []).append(i)
+
+    drivers_by_region: Dict[Tuple[int, int], List[int]] = {}
+    for j, driver in enumerate(drivers):
+        drivers_by_region.setdefault(_region(driver["currentLocation"]), []).append(j)
+
+    taken = set()
+    assignments = []
+    for (row, col), job_ids in jobs_by_region.items():
+        driver_ids = [
+            j
+            for d_row in (row - 1, row, row + 1)
+            for d_col in (col - 1, col, col + 1)
+            for j in drivers_by_region.get((d_row, d_col), ())
+            if j not in taken
+        ]
+        if not driver_ids:
+            continue
+
+        job_lats, job_lngs = to_arrays([jobs[i]["pickup"] for i in job_ids])
+        driver_lats, driver_lngs = to_arrays([drivers[j]["currentLocation"] for j in driver_ids])
+        costs = haversine_matrix(job_lats, job_lngs, driver_lats, driver_lngs)
+        costs[costs > max_pickup_km] = UNREACHABLE_COST
+
+        for r, c in zip(*linear_sum_assignment(costs)):
+            if costs[r, c] >= UNREACHABLE_COST:
+                continue
+            taken.add(driver_ids[c])
+            assignments.append((job_ids[r], driver_ids[c], float(costs[r, c])))
+
+    return assignments
+
+
+class DispatchEngine:
+    """
+    Periodically assigns every open booking and driverless pooled ride to
+    the available drivers with a global min-cost matching.
+    """
+
+    def __init__(self, interval: float, max_pickup_km: float):
+        self.interval = interval
+        self.max_pickup_km = max_pickup_km
+        self.cycles = 0
+        self.total_assigned = 0
+        self.last_cycle: dict | None = None
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                notifications, driver_notifications, taken_bookings = await self.run_cycle()
+                for user_id, ride_data in notifications:
+                    await emit_ride_accepted(user_id, ride_data)
+                for driver_user_id, ride_data in driver_notifications:
+                    await emit_ride_assigned(driver_user_id, ride_data)
+                for booking in taken_bookings:
+                    await retract_ride_request(booking, "accepted")
+            except Exception as e:
+                print(f"Dispatch cycle failed: {str(e)}")
+
+    async def run_cycle(self) -> Tuple[List[Tuple[str, dict]], List[Tuple[str, dict]], List[dict]]:
+        """
+        Run one dispatch cycle. Returns the (user id, payload) ride_accepted
+        notifications for passengers, the (driver user id, payload)
+        ride_assigned notifications, and the bookings to retract from the
+        driver feed.
+        """
+        db = get_database()
+        started_at = datetime.utcnow()
+        started = time.perf_counter()
+
+        bookings = await db.bookings.find(
+            {"status": "requested", "rideId": None},
+            {
+                "userId": 1,
+                "pickupLocation": 1,
+                "dropoffLocation": 1,
+                "wantPooling": 1,
+                "fare": 1,
+                "notifiedDrivers": 1
+            }
+        ).to_list(None)
+        pooled_rides = await db.rides.find(
+            {"isPooled": True, "status": "requested", "driverId": None},
+            {"passengers": 1, "isPooled": 1, "createdAt": 1}
+        ).to_list(None)
+        drivers = await db.drivers.find(
+            {"isAvailable": True, "currentLocation": {"$ne": None}},
+            {"userId": 1, "currentLocation": 1}
+        ).to_list(None)
+
+        jobs = [{"booking": booking, "pickup": booking["pickupLocation"]} for booking in bookings]
+        for ride in pooled_rides:
+            stops = build_stop_sequence(ride)
+            if stops:
+                jobs.append({"ride": ride, "pickup": stops[0]})
+
+        loaded = time.perf_counter()
+        assignments = []
+        if jobs and drivers:
+            # The solver is CPU bound, keep it off the event loop
+            assignments = await asyncio.to_thread(solve_assignment, jobs, drivers, self.max_pickup_km)
+        solved = time.perf_counter()
+
+        notifications, driver_notifications, taken_bookings = await self._write_assignments(
+            db, jobs, drivers, assignments
+        )
+        written = time.perf_counter()
+
+        self.cycles += 1
+        assigned = len(driver_notifications)
+        self.total_assigned += assigned
+        self.last_cycle = {
+            "startedAt": started_at.isoformat(),
+            "openBookings": len(bookings),
+            "openPooledRides": len(pooled_rides),
+            "availableDrivers": len(drivers),
+            "proposed": len(assignments),
+            "assigned": assigned,
+            "loadMs": round((loaded - started) * 1000, 2),
+            "solveMs": round((solved - loaded) * 1000, 2),
+            "writeMs": round((written - solved) * 1000, 2)
+        }
+        return notifications, driver_notifications, taken_bookings
+
+    async def _write_assignments(
+        self,
+        db,
+        jobs: List[dict],
+        drivers: List[dict],
+        assignments: List[Tuple[int, int, float]]
+    ) -> Tuple[List[Tuple[str, dict]], List[Tuple[str, dict]], List[dict]]:
+        """
+        Apply assignments in bulk. Drivers and jobs are first claimed with a
+        per-cycle marker so that anything accepted manually in the meantime
+        is left alone and its driver released again. Returns the passenger
+        and driver notifications and the bookings that were turned into rides.
+        """
+        if not assignments:
+            return [], [], []
+
+        now = datetime.utcnow()
+        cycle_id = ObjectId()
+
+        await db.drivers.bulk_write([
+            UpdateOne(
+                {"_id": drivers[j]["_id"], "isAvailable": True},
+                {"$set": {"isAvailable": False, "dispatchId": cycle_id, "updatedAt": now}}
+            )
+            for _, j, _ in assignments
+        ], ordered=False)
+        claimed_drivers = {
+            d["_id"] async for d in db.drivers.find({"dispatchId": cycle_id}, {"_id": 1})
+        }
+
+        booking_claims = []
+        ride_claims = []
+        for i, j, _ in assignments:
+            driver = drivers[j]
+            if driver["_id"] not in claimed_drivers:
+                continue
+            job = jobs[i]
+            if "booking" in job:
+                booking_claims.append(UpdateOne(
+                    {"_id": job["booking"]["_id"], "status": "requested", "rideId": None},
+                    {"$set": {"status": "matched", "dispatchId": cycle_id, "updatedAt": now}}
+                ))
+            else:
+                ride_claims.append(UpdateOne(
+                    {"_id": job["ride"]["_id"], "status": "requested", "driverId": None},
+                    {"$set": {
+                        "driverId": str(driver["_id"]),
+                        "status": "accepted",
+                        "corridor": build_corridor(job["ride"].get("passengers", []), driver["currentLocation"]),
+                        "dispatchId": cycle_id,
+                        "updatedAt": now
+                    }}
+                ))
+
+        if booking_claims:
+            await db.bookings.bulk_write(booking_claims, ordered=False)
+        if ride_claims:
+            await db.rides.bulk_write(ride_claims, ordered=False)
+        claimed_bookings = {
+            b["_id"] async for b in db.bookings.find({"dispatchId": cycle_id}, {"_id": 1})
+        }
+        claimed_rides = {
+            r["_id"] async for r in db.rides.find({"dispatchId": cycle_id}, {"_id": 1})
+        }
+
+        new_rides = []
+        pooled_rides = []
+        taken_bookings = []
+        booking_links = []
+        notifications = []
+        driver_notifications = []
+        busy_drivers = set()
+        for i, j, distance in assignments:
+            job = jobs[i]
+            driver = drivers[j]
+            if "booking" in job and job["booking"]["_id"] in claimed_bookings:
+                booking = job["booking"]
+                ride_doc = build_ride_from_booking(booking, str(driver["_id"]), now, driver["currentLocation"])
+                ride_doc["_id"] = ObjectId()
+                new_rides.append(ride_doc)
+                taken_bookings.append(booking)
+                booking_links.append(UpdateOne(
+                    {"_id": booking["_id"]},
+                    {"$set": {"rideId": str(ride_doc["_id"])}}
+                ))
+                passengers = ride_doc["passengers"]
+                ride_id = str(ride_doc["_id"])
+            elif "ride" in job and job["ride"]["_id"] in claimed_rides:
+                pooled_rides.append({
+                    **job["ride"],
+                    "driverId": str(driver["_id"]),
+                    "status": "accepted"
+                })
+                passengers = job["ride"].get("passengers", [])
+                ride_id = str(job["ride"]["_id"])
+            else:
+                continue
+
+            busy_drivers.add(driver["_id"])
+            driver_index.remove(driver["userId"])
+            for passenger in passengers:
+                notifications.append((passenger["userId"], {
+                    "rideId": ride_id,
+                    "driverId": str(driver["_id"]),
+                    "pickupDistance": round(distance, 2)
+                }))
+            driver_notifications.append((driver["userId"], {
+                "rideId": ride_id,
+                "pickupDistance": round(distance, 2),
+                "passengers": [
+                    {
+                        "userId": p["userId"],
+                        "pickupLocation": p["pickupLocation"],
+                        "dropoffLocation": p["dropoffLocation"]
+                    }
+                    for p in passengers
+                ]
+            }))
+
+        if new_rides:
+            await db.rides.insert_many(new_rides)
+            await db.bookings.bulk_write(booking_links, ordered=False)
+        await record_rides_created(db, new_rides)
+        await record_ride_status(db, "requested", "accepted", count=len(pooled_rides))
+
+        await remove_pools(db, (booking["_id"] for booking in taken_bookings))
+        await sync_ride_pools(db, [ride for ride in new_rides if ride["isPooled"]] + pooled_rides)
+
+        # Drivers whose job was taken by someone else go back online
+        released = claimed_drivers - busy_drivers
+        if released:
+            await db.drivers.update_many(
+                {"_id": {"$in": list(released)}},
+                {"$set": {"isAvailable": True, "updatedAt": now}}
+            )
+
+        for collection in (db.drivers, db.bookings, db.rides):
+            await collection.update_many({"dispatchId": cycle_id}, {"$unset": {"dispatchId": ""}})
+
+        return notifications, driver_notifications, taken_bookings
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.interval > 0,
+            "intervalSeconds": self.interval,
+            "cycles": self.cycles,
+            "totalAssigned": self.total_assigned,
+            "lastCycle": self.last_cycle
+        }
+
+
+dispatch_engine = DispatchEngine(settings.DISPATCH_INTERVAL, settings.DISPATCH_MAX_PICKUP_KM)
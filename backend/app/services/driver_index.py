@@ -0,0 +1,163 @@
+import heapq
+import math
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from app.utils.geo import haversine_one_to_many
+
+CELL_SIZE_DEG = 0.05  # Grid cell edge in degrees (~5.5 km of latitude)
+KM_PER_DEG_LAT = 111.32
+
+Cell = Tuple[int, int]
+
+
+class DriverLocationIndex:
+    """
+    In-process uniform lat/lng grid holding the last known position of
+    every available driver, keyed by the driver's user id (the same id
+    used for the `driver_{id}` socket rooms). Available drivers that have
+    not reported a position yet are remembered and enter the grid on
+    their first move.
+    """
+
+    def __init__(self, cell_size_deg: float = CELL_SIZE_DEG):
+        self.cell_size_deg = cell_size_deg
+        self.loaded = False
+        self._cells: Dict[Cell, Set[str]] = {}
+        self._positions: Dict[str, Tuple[float, float, Cell]] = {}
+        self._awaiting_position: Set[str] = set()
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def __contains__(self, driver_id: str) -> bool:
+        return driver_id in self._positions
+
+    def _cell(self, lat: float, lng: float) -> Cell:
+        return (
+            math.floor(lat / self.cell_size_deg),
+            math.floor(lng / self.cell_size_deg)
+        )
+
+    def upsert(self, driver_id: str, lat: float, lng: float):
+        """Insert a driver or move an already indexed one."""
+        cell = self._cell(lat, lng)
+        previous = self._positions.get(driver_id)
+        if previous and previous[2] != cell:
+            self._discard_from_cell(driver_id, previous[2])
+        self._cells.setdefault(cell, set()).add(driver_id)
+        self._positions[driver_id] = (lat, lng, cell)
+        self._awaiting_position.discard(driver_id)
+
+    def await_position(self, driver_id: str):
+        """Remember an available driver whose position is not known yet."""
+        self.remove(driver_id)
+        self._awaiting_position.add(driver_id)
+
+    def move(self, driver_id: str, lat: float, lng: float) -> bool:
+        """
+        Update the position of an indexed or awaited driver; drivers that
+        are not available are ignored.
+        """
+        if driver_id not in self._positions and driver_id not in self._awaiting_position:
+            return False
+        self.upsert(driver_id, lat, lng)
+        return True
+
+    def remove(self, driver_id: str):
+        self._awaiting_position.discard(driver_id)
+        previous = self._positions.pop(driver_id, None)
+        if previous:
+            self._discard_from_cell(driver_id, previous[2])
+
+    def clear(self):
+        self._cells.clear()
+        self._positions.clear()
+        self._awaiting_position.clear()
+
+    def _discard_from_cell(self, driver_id: str, cell: Cell):
+        members = self._cells.get(cell)
+        if members is None:
+            return
+        members.discard(driver_id)
+        if not members:
+            del self._cells[cell]
+
+    def get_position(self, driver_id: str) -> Optional[Tuple[float, float]]:
+        position = self._positions.get(driver_id)
+        return (position[0], position[1]) if position else None
+
+    def query(
+        self,
+        lat: float,
+        lng: float,
+        radius_km: float,
+        limit: Optional[int] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Return (driver_id, distance_km) pairs within radius_km of the point,
+        closest first. Only the grid cells overlapping the radius are scanned.
+        """
+        lat_span = radius_km / KM_PER_DEG_LAT
+        cos_lat = math.cos(math.radians(min(abs(lat) + lat_span, 90.0)))
+        lng_span = radius_km / (KM_PER_DEG_LAT * cos_lat) if cos_lat > 1e-6 else 180.0
+
+        min_row, min_col = self._cell(lat - lat_span, lng - lng_span)
+        max_row, max_col = self._cell(lat + lat_span, lng + lng_span)
+
+        candidates = []
+        for row in range(min_row, max_row + 1):
+            for col in range(min_col, max_col + 1):
+                candidates.extend(self._cells.get((row, col), ()))
+        if not candidates:
+            return []
+        
+        lats = [self._positions[driver_id][0] for driver_id in candidates]
+        lngs = [self._positions[driver_id][1] for driver_id in candidates]
+        distances = haversine_one_to_many(lat, lng, lats, lngs)
+        
+        hits = [
+            (float(distance), driver_id)
+            for distance, driver_id in zip(distances, candidates)
+            if distance <= radius_km
+        ]
+
+        if limit is not None:
+            hits = heapq.nsmallest(limit, hits)
+        else:
+            hits.sort()
+        return [(driver_id, distance) for distance, driver_id in hits]
+
+    def load(self, drivers: Iterable[dict]):
+        """Rebuild the index from driver documents."""
+        self.clear()
+        for driver in drivers:
+            sync_driver(driver, self)
+        self.loaded = True
+
+
+def sync_driver(driver: dict, index: Optional[DriverLocationIndex] = None):
+    """
+    Index a driver document if it is available, otherwise drop it. Available
+    drivers without a location wait for their first position.
+    """
+    if index is None:
+        index = driver_index
+    loc = driver.get("currentLocation")
+    if driver.get("isAvailable") and loc:
+        index.upsert(str(driver["userId"]), loc["lat"], loc["lng"])
+    elif driver.get("isAvailable"):
+        index.await_position(str(driver["userId"]))
+    else:
+        index.remove(str(driver["userId"]))
+
+
+async def load_driver_index(db) -> int:
+    """Warm the shared index with every available driver in the database."""
+    drivers = await db.drivers.find(
+        {"isAvailable": True},
+        {"userId": 1, "isAvailable": 1, "currentLocation": 1}
+    ).to_list(None)
+    driver_index.load(drivers)
+    return len(driver_index)
+
+
+driver_index = DriverLocationIndex()
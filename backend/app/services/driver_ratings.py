@@ -0,0 +1,103 @@
+import asyncio
+import sys
+from typing import Dict, List
+from bson import ObjectId
+from pymongo import ASCENDING, UpdateOne
+from app.utils.database import EXAMPLE_ID, declare_index, declare_query
+
+# Drivers carry ratingSum and ratingCount next to the derived `rating`, so a
+# new rating is applied with one write instead of re-reading the driver's
+# whole feedback history.
+declare_index("feedback", [("driverId", ASCENDING)])
+declare_query("driver feedback totals", "feedback", {"driverId": {"$in": [EXAMPLE_ID]}})
+
+
+async def record_rating(db, driver_id: str, rating: float):
+    """Add one rating and recompute the average in the same atomic update."""
+    await db.drivers.update_one(
+        {"_id": ObjectId(driver_id)},
+        [
+            {"$set": {
+                "ratingSum": {"$add": [{"$ifNull": ["$ratingSum", 0]}, rating]},
+                "ratingCount": {"$add": [{"$ifNull": ["$ratingCount", 0]}, 1]}
+            }},
+            {"$set": {"rating": {"$round": [{"$divide": ["$ratingSum", "$ratingCount"]}, 2]}}}
+        ]
+    )
+
+
+async def _feedback_totals(db, driver_ids: List[str] | None = None) -> Dict[str, dict]:
+    pipeline = []
+    if driver_ids is not None:
+        pipeline.append({"$match": {"driverId": {"$in": driver_ids}}})
+    pipeline.append({"$group": {"_id": "$driverId", "sum": {"$sum": "$rating"}, "count": {"$sum": 1}}})
+    return {group["_id"]: group async for group in db.feedback.aggregate(pipeline)}
+
+
+def _rating_fields(totals: dict | None) -> dict:
+    if not totals:
+        return {"ratingSum": 0, "ratingCount": 0}
+    return {
+        "ratingSum": totals["sum"],
+        "ratingCount": totals["count"],
+        "rating": round(totals["sum"] / totals["count"], 2)
+    }
+
+
+async def backfill_driver_ratings(db) -> int:
+    """Populate ratingSum/ratingCount for drivers that predate them."""
+    drivers = await db.drivers.find({"ratingCount": {"$exists": False}}, {"_id": 1}).to_list(None)
+    if not drivers:
+        return 0
+
+    totals = await _feedback_totals(db, [str(driver["_id"]) for driver in drivers])
+    await db.drivers.bulk_write([
+        UpdateOne(
+            {"_id": driver["_id"], "ratingCount": {"$exists": False}},
+            {"$set": _rating_fields(totals.get(str(driver["_id"])))}
+        )
+        for driver in drivers
+    ], ordered=False)
+    return len(drivers)
+
+
+async def check_driver_ratings(db, fix: bool = False) -> List[dict]:
+    """
+    Compare every driver's counters with the feedback collection. Returns the
+    drivers that disagree; with `fix` their counters are reset from feedback.
+    """
+    totals = await _feedback_totals(db)
+    mismatches = []
+    async for driver in db.drivers.find({}, {"ratingSum": 1, "ratingCount": 1}):
+        actual = totals.get(str(driver["_id"])) or {"sum": 0, "count": 0}
+        stored = {"sum": driver.get("ratingSum"), "count": driver.get("ratingCount")}
+        if stored["count"] != actual["count"] or abs((stored["sum"] or 0) - actual["sum"]) > 1e-6:
+            mismatches.append({
+                "driverId": str(driver["_id"]),
+                "stored": stored,
+                "actual": {"sum": actual["sum"], "count": actual["count"]}
+            })
+
+    if fix and mismatches:
+        await db.drivers.bulk_write([
+            UpdateOne(
+                {"_id": ObjectId(m["driverId"])},
+                {"$set": _rating_fields(totals.get(m["driverId"]))}
+            )
+            for m in mismatches
+        ], ordered=False)
+    return mismatches
+
+
+async def _main(fix: bool):
+    from app.utils.database import close_database, get_database
+
+    mismatches = await check_driver_ratings(get_database(), fix=fix)
+    for m in mismatches:
+        print(f"Driver {m['driverId']}: stored {m['stored']}, feedback {m['actual']}")
+    print(f"{len(mismatches)} driver(s) out of sync" + (", fixed" if fix and mismatches else ""))
+    close_database()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main("--fix" in sys.argv[1:]))
@@ -0,0 +1,174 @@
+import asyncio
+import time
+from datetime import datetime
+from typing import Dict
+from pymongo import ASCENDING, UpdateOne
+from app.config import settings
+from app.utils.database import EXAMPLE_ID, declare_index, declare_query, get_database
+from app.utils.geo import to_geojson_point
+from app.utils.metrics import LatencyStats
+from app.services.driver_index import driver_index
+from app.services.pool_corridor import refresh_driver_corridors
+
+# Flushes upsert one driver per userId
+declare_index("drivers", [("userId", ASCENDING)], unique=True)
+declare_query("driver profile by user", "drivers", {"userId": EXAMPLE_ID})
+
+# Fields of a driver profile that is first created by a location write
+PROFILE_DEFAULTS = {
+    "vehicleType": "Sedan",
+    "vehicleNumber": "PENDING",
+    "licenseNumber": "PENDING",
+    "isAvailable": False,
+    "rating": 0.0,
+    "ratingSum": 0,
+    "ratingCount": 0,
+    "totalTrips": 0
+}
+
+
+class LocationBuffer:
+    """
+    Latest-value buffer of driver positions keyed by user id. Pings only touch
+    memory (and the matching index); a background task writes whatever is
+    pending as one unordered bulk_write per interval, so a driver pinging
+    many times between flushes costs a single update.
+    """
+
+    def __init__(self, flush_interval: float, max_pending: int):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.received = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.flushed = 0
+        self.failed_flushes = 0
+        self.last_flush_size = 0
+        self.ingest_rate = 0.0
+        self.flush_latency = LatencyStats()
+        self._pending: Dict[str, dict] = {}
+        self._received_at_last_flush = 0
+        self._last_flush_at = time.monotonic()
+        self._task: asyncio.Task | None = None
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def add(self, user_id: str, lat: float, lng: float) -> bool:
+        """Record a position. Returns False if it was dropped because the buffer is full."""
+        if user_id in self._pending:
+            self.coalesced += 1
+        elif len(self._pending) >= self.max_pending:
+            self.dropped += 1
+            return False
+
+        self.received += 1
+        self._pending[user_id] = {"lat": lat, "lng": lng, "at": datetime.utcnow()}
+        # Matching sees the new position right away, persistence catches up
+        driver_index.move(user_id, lat, lng)
+        return True
+
+    def latest(self, user_id: str) -> dict | None:
+        """Position still waiting to be written, if any."""
+        pending = self._pending.get(user_id)
+        if pending is None:
+            return None
+        return {"lat": pending["lat"], "lng": pending["lng"]}
+
+    def with_latest_location(self, driver: dict) -> dict:
+        """Driver document with any buffered position applied."""
+        location = self.latest(str(driver["userId"]))
+        if location is None:
+            return driver
+        return {**driver, "currentLocation": location}
+
+    async def flush(self) -> int:
+        now = time.monotonic()
+        elapsed = now - self._last_flush_at
+        if elapsed > 0:
+            self.ingest_rate = (self.received - self._received_at_last_flush) / elapsed
+        self._received_at_last_flush = self.received
+        self._last_flush_at = now
+
+        if not self._pending:
+            return 0
+
+        batch, self._pending = self._pending, {}
+        operations = [
+            UpdateOne(
+                {"userId": user_id},
+                {
+                    "$set": {
+                        "currentLocation": {"lat": pos["lat"], "lng": pos["lng"]},
+                        "currentGeo": to_geojson_point(pos),
+                        "updatedAt": pos["at"]
+                    },
+                    "$setOnInsert": {**PROFILE_DEFAULTS, "createdAt": pos["at"]}
+                },
+                upsert=True
+            )
+            for user_id, pos in batch.items()
+        ]
+
+        started = time.perf_counter()
+        try:
+            await get_database().drivers.bulk_write(operations, ordered=False)
+        except Exception as e:
+            self.failed_flushes += 1
+            # Retry next interval unless a newer position arrived meanwhile
+            for user_id, pos in batch.items():
+                self._pending.setdefault(user_id, pos)
+            print(f"Location flush failed: {str(e)}")
+            return 0
+        finally:
+            self.flush_latency.record((time.perf_counter() - started) * 1000)
+
+        self.flushes += 1
+        self.flushed += len(batch)
+        self.last_flush_size = len(batch)
+
+        # Pool corridors cover the driver's position, so they follow it
+        try:
+            await refresh_driver_corridors(get_database(), batch)
+        except Exception as e:
+            print(f"Corridor refresh failed: {str(e)}")
+        return len(batch)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._pending),
+            "maxPending": self.max_pending,
+            "flushIntervalSeconds": self.flush_interval,
+            "received": self.received,
+            "ingestRatePerSecond": round(self.ingest_rate, 2),
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "failedFlushes": self.failed_flushes,
+            "flushed": self.flushed,
+            "lastFlushSize": self.last_flush_size,
+            "flushLatency": self.flush_latency.summary()
+        }
+
+
+location_buffer = LocationBuffer(settings.LOCATION_FLUSH_INTERVAL, settings.LOCATION_BUFFER_MAX)
@@ -0,0 +1,178 @@
+from typing import Iterable, List
+from pymongo import ASCENDING, DESCENDING, GEOSPHERE, DeleteOne, ReplaceOne
+from app.utils.database import EXAMPLE_ID, EXAMPLE_POINT, declare_index, declare_query
+from app.utils.geo import geo_near_stage, to_geojson_point
+from app.utils.pagination import NEWEST_FIRST
+from app.services.reference_resolver import resolve_drivers, resolve_users
+
+MAX_POOL_PASSENGERS = 4
+JOINABLE_RIDE_STATUSES = ["requested", "accepted"]
+
+# One entry per joinable pooled ride or pooling booking, keyed by the source
+# document's _id. Entries are kept in the shape GET /api/rides/available-pools
+# returns, so the endpoint is a single query over this collection.
+declare_index("open_pools", [("pickupGeo", GEOSPHERE)])
+declare_index("open_pools", [("createdAt", DESCENDING)])
+declare_query("available pools by location", "open_pools", pipeline=[
+    geo_near_stage(EXAMPLE_POINT["lat"], EXAMPLE_POINT["lng"], "pickupGeo", {"memberIds": {"$ne": EXAMPLE_ID}}, 10.0)
+])
+declare_query("available pools newest", "open_pools", pipeline=[
+    {"$match": {"memberIds": {"$ne": EXAMPLE_ID}}},
+    {"$sort": {"createdAt": -1}}
+])
+# The startup rebuild reads joinable rides and pooling bookings
+declare_index("rides", [("isPooled", ASCENDING), ("status", ASCENDING), ("driverId", ASCENDING)])
+declare_index("bookings", [("status", ASCENDING), ("rideId", ASCENDING)] + NEWEST_FIRST)
+declare_query("open pool rebuild rides", "rides", {
+    "isPooled": True,
+    "status": {"$in": JOINABLE_RIDE_STATUSES},
+    f"passengers.{MAX_POOL_PASSENGERS - 1}": {"$exists": False}
+})
+declare_query("open pool rebuild bookings", "bookings", {"wantPooling": True, "status": "requested", "rideId": None})
+
+
+def _driver_summary(driver: dict | None) -> dict | None:
+    if not driver:
+        return None
+    return {
+        "name": driver["name"],
+        "vehicleType": driver["vehicleType"],
+        "rating": driver.get("rating", 0)
+    }
+
+
+def _is_joinable_ride(ride: dict) -> bool:
+    passengers = ride.get("passengers", [])
+    return (
+        ride.get("isPooled", False)
+        and ride.get("status") in JOINABLE_RIDE_STATUSES
+        and 0 < len(passengers) < MAX_POOL_PASSENGERS
+        and bool(passengers[0].get("pickupLocation"))
+        and bool(passengers[0].get("dropoffLocation"))
+    )
+
+
+def _is_joinable_booking(booking: dict) -> bool:
+    return (
+        booking.get("wantPooling", False)
+        and booking.get("status") == "requested"
+        and booking.get("rideId") is None
+        and bool(booking.get("pickupLocation"))
+        and bool(booking.get("dropoffLocation"))
+    )
+
+
+def ride_entry(ride: dict, driver: dict | None) -> dict:
+    """Read model entry for a pooled ride; `driver` must carry a `name`."""
+    passengers = ride["passengers"]
+    return {
+        "_id": ride["_id"],
+        "type": "ride",
+        "pickupLocation": passengers[0]["pickupLocation"],
+        "dropoffLocation": passengers[0]["dropoffLocation"],
+        # Searches match any passenger's pickup, as joining can happen en route
+        "pickupGeo": {
+            "type": "MultiPoint",
+            "coordinates": [
+                to_geojson_point(p["pickupLocation"])["coordinates"]
+                for p in passengers
+            ]
+        },
+        "memberIds": [p["userId"] for p in passengers],
+        "currentPassengers": len(passengers),
+        "maxPassengers": MAX_POOL_PASSENGERS,
+        "status": ride["status"],
+        "driver": _driver_summary(driver),
+        "createdAt": ride.get("createdAt")
+    }
+
+
+def booking_entry(booking: dict, user_name: str) -> dict:
+    """Read model entry for a booking other riders can pool with."""
+    return {
+        "_id": booking["_id"],
+        "type": "booking",
+        "pickupLocation": booking["pickupLocation"],
+        "dropoffLocation": booking["dropoffLocation"],
+        "pickupGeo": to_geojson_point(booking["pickupLocation"]),
+        "memberIds": [booking["userId"]],
+        "currentPassengers": 1,
+        "maxPassengers": MAX_POOL_PASSENGERS,
+        "status": booking["status"],
+        "userName": user_name,
+        "createdAt": booking.get("createdAt")
+    }
+
+
+async def sync_ride_pools(db, rides: List[dict]):
+    """Upsert the entries of joinable rides and drop the rest."""
+    if not rides:
+        return
+    drivers = await resolve_drivers(
+        db, (ride.get("driverId") for ride in rides if _is_joinable_ride(ride))
+    )
+    operations = []
+    for ride in rides:
+        if _is_joinable_ride(ride):
+            entry = ride_entry(ride, drivers.get(ride.get("driverId")))
+            operations.append(ReplaceOne({"_id": ride["_id"]}, entry, upsert=True))
+        else:
+            operations.append(DeleteOne({"_id": ride["_id"]}))
+    await db.open_pools.bulk_write(operations, ordered=False)
+
+
+async def sync_ride_pool(db, ride: dict):
+    await sync_ride_pools(db, [ride])
+
+
+async def sync_booking_pool(db, booking: dict, user_name: str):
+    """Add a booking that accepts pooling; other bookings are ignored."""
+    if _is_joinable_booking(booking):
+        await db.open_pools.replace_one(
+            {"_id": booking["_id"]},
+            booking_entry(booking, user_name),
+            upsert=True
+        )
+    else:
+        await remove_pools(db, [booking["_id"]])
+
+
+async def remove_pools(db, pool_ids: Iterable):
+    pool_ids = list(pool_ids)
+    if pool_ids:
+        await db.open_pools.delete_many({"_id": {"$in": pool_ids}})
+
+
+async def rebuild_open_pools(db) -> int:
+    """Recompute every entry from rides and bookings and drop stale ones."""
+    rides = await db.rides.find({
+        "isPooled": True,
+        "status": {"$in": JOINABLE_RIDE_STATUSES},
+        f"passengers.{MAX_POOL_PASSENGERS - 1}": {"$exists": False}
+    }).to_list(None)
+    bookings = await db.bookings.find({
+        "wantPooling": True,
+        "status": "requested",
+        "rideId": None
+    }).to_list(None)
+
+    drivers = await resolve_drivers(db, (ride.get("driverId") for ride in rides))
+    users = await resolve_users(db, (booking["userId"] for booking in bookings))
+
+    entries = [
+        ride_entry(ride, drivers.get(ride.get("driverId")))
+        for ride in rides
+        if _is_joinable_ride(ride)
+    ]
+    for booking in bookings:
+        if _is_joinable_booking(booking):
+            user = users.get(booking["userId"])
+            entries.append(booking_entry(booking, user["name"] if user else "Unknown"))
+
+    if entries:
+        await db.open_pools.bulk_write(
+            [ReplaceOne({"_id": entry["_id"]}, entry, upsert=True) for entry in entries],
+            ordered=False
+        )
+    await db.open_pools.delete_many({"_id": {"$nin": [entry["_id"] for entry in entries]}})
+    return len(entries)
@@ -0,0 +1,67 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+from app.config import settings
+from app.utils.metrics import LatencyStats
+
+
+class PasswordPoolBusy(Exception):
+    """Raised when the password pool already holds its maximum backlog."""
+
+
+class PasswordPool:
+    """
+    Bounded thread pool for bcrypt. bcrypt releases the GIL, so hashes run in
+    parallel without ever occupying the event loop. Work beyond the running
+    workers waits in a queue of at most `queue_limit` items; anything past
+    that is rejected instead of piling up.
+    """
+
+    def __init__(self, workers: int, queue_limit: int):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.in_flight = 0
+        self.rejected = 0
+        self.hash_latency = LatencyStats()
+        self.queue_wait = LatencyStats()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password")
+
+    def _timed(self, submitted: float, fn: Callable, *args):
+        started = time.perf_counter()
+        self.queue_wait.record((started - submitted) * 1000)
+        try:
+            return fn(*args)
+        finally:
+            self.hash_latency.record((time.perf_counter() - started) * 1000)
+
+    async def run(self, fn: Callable, *args):
+        if self.in_flight >= self.workers + self.queue_limit:
+            self.rejected += 1
+            raise PasswordPoolBusy()
+
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._executor, self._timed, time.perf_counter(), fn, *args
+            )
+        finally:
+            self.in_flight -= 1
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queueLimit": self.queue_limit,
+            "inFlight": self.in_flight,
+            "queued": max(0, self.in_flight - self.workers),
+            "rejected": self.rejected,
+            "hashLatency": self.hash_latency.summary(),
+            "queueWait": self.queue_wait.summary()
+        }
+
+
+password_pool = PasswordPool(settings.PASSWORD_WORKERS, settings.PASSWORD_QUEUE_LIMIT)
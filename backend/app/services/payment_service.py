@@ -1,4 +1,4 @@
-from app.services.route_optimization import haversine_distance
+from app.utils.geo import haversine_distance
 
 BASE_FARE = 50.0  # Base fare in PKR
 PER_KM_RATE = 15.0  # Rate per kilometer in PKR
@@ -58,25 +58,30 @@ def calculate_pool_fare(
     }
 
 
-def get_payment_summary(rides: list) -> dict:
-    """Generate payment summary for admin reports."""
-    total_revenue = 0.0
-    total_rides = len(rides)
-    completed_rides = 0
-    pooled_rides = 0
-    
-    for ride in rides:
-        if ride.get("status") == "completed":
-            completed_rides += 1
-            total_revenue += ride.get("totalFare", 0)
-        
-        if ride.get("isPooled"):
-            pooled_rides += 1
+def payment_summary_pipeline(query: dict) -> list:
+    return [
+        {"$match": query},
+        {"$group": {
+            "_id": None,
+            "totalRides": {"$sum": 1},
+            "completedRides": {"$sum": {"$cond": [{"$eq": ["$status", "completed"]}, 1, 0]}},
+            "pooledRides": {"$sum": {"$cond": [{"$eq": ["$isPooled", True]}, 1, 0]}},
+            "totalRevenue": {"$sum": {"$cond": [{"$eq": ["$status", "completed"]}, "$totalFare", 0]}}
+        }}
+    ]
+
+
+async def get_payment_summary(db, query: dict) -> dict:
+    """Payment summary over the rides matching `query`, computed server-side."""
+    result = await db.rides.aggregate(payment_summary_pipeline(query)).to_list(None)
+    totals = result[0] if result else {}
     
+    total_revenue = totals.get("totalRevenue", 0) or 0
+    completed_rides = totals.get("completedRides", 0)
     return {
-        "totalRides": total_rides,
+        "totalRides": totals.get("totalRides", 0),
         "completedRides": completed_rides,
-        "pooledRides": pooled_rides,
+        "pooledRides": totals.get("pooledRides", 0),
         "totalRevenue": round(total_revenue, 2),
         "averageFare": round(total_revenue / completed_rides, 2) if completed_rides > 0 else 0
     }
@@ -0,0 +1,140 @@
+import asyncio
+from typing import Dict, List
+
+RIDE_STATUSES = ["requested", "accepted", "in-progress", "completed", "cancelled"]
+ACTIVE_RIDE_STATUSES = ["requested", "accepted", "in-progress"]
+STATS_ID = "platform"
+
+# platform_stats holds a single document of running totals, kept in step with
+# rides and feedback by $inc at every lifecycle transition:
+#   {_id: "platform", rides: {<status>: n}, pooledRides, revenue, ratingSum, ratingCount}
+# Admin reads cost one _id lookup. rebuild_platform_stats recomputes it from
+# the source collections.
+
+
+async def _inc(db, inc: Dict[str, float]):
+    if inc:
+        await db.platform_stats.update_one({"_id": STATS_ID}, {"$inc": inc}, upsert=True)
+
+
+async def record_rides_created(db, rides: List[dict]):
+    inc: Dict[str, float] = {}
+    for ride in rides:
+        key = f"rides.{ride['status']}"
+        inc[key] = inc.get(key, 0) + 1
+        if ride.get("isPooled"):
+            inc["pooledRides"] = inc.get("pooledRides", 0) + 1
+    await _inc(db, inc)
+
+
+async def record_ride_status(db, old_status: str, new_status: str, fare: float = 0, count: int = 1):
+    """Move `count` rides between statuses; revenue follows rides in and out of completed."""
+    if old_status == new_status or count <= 0:
+        return
+    inc = {f"rides.{old_status}": -count, f"rides.{new_status}": count}
+    if new_status == "completed":
+        inc["revenue"] = fare
+    elif old_status == "completed":
+        inc["revenue"] = -fare
+    await _inc(db, inc)
+
+
+async def record_feedback(db, rating: float):
+    await _inc(db, {"ratingSum": rating, "ratingCount": 1})
+
+
+def summarize(doc: dict | None) -> dict:
+    """Dashboard shaped view of a counters document."""
+    doc = doc or {}
+    rides = doc.get("rides", {})
+    completed = rides.get("completed", 0)
+    revenue = doc.get("revenue", 0)
+    rating_count = doc.get("ratingCount", 0)
+    return {
+        "totalRides": sum(rides.values()),
+        "activeRides": sum(rides.get(s, 0) for s in ACTIVE_RIDE_STATUSES),
+        "completedRides": completed,
+        "cancelledRides": rides.get("cancelled", 0),
+        "pooledRides": doc.get("pooledRides", 0),
+        "totalRevenue": round(revenue, 2),
+        "averageFare": round(revenue / completed, 2) if completed > 0 else 0,
+        "averageRating": round(doc.get("ratingSum", 0) / rating_count, 2) if rating_count > 0 else 0
+    }
+
+
+async def read_platform_stats(db) -> dict:
+    return summarize(await db.platform_stats.find_one({"_id": STATS_ID}))
+
+
+async def compute_platform_stats(db) -> dict:
+    """Counters document recomputed from rides and feedback, server-side."""
+    ride_groups, feedback_groups = await asyncio.gather(
+        db.rides.aggregate([
+            {"$group": {
+                "_id": "$status",
+                "count": {"$sum": 1},
+                "pooled": {"$sum": {"$cond": [{"$eq": ["$isPooled", True]}, 1, 0]}},
+                "revenue": {"$sum": "$totalFare"}
+            }}
+        ]).to_list(None),
+        db.feedback.aggregate([
+            {"$group": {"_id": None, "sum": {"$sum": "$rating"}, "count": {"$sum": 1}}}
+        ]).to_list(None)
+    )
+    by_status = {group["_id"]: group for group in ride_groups}
+    feedback = feedback_groups[0] if feedback_groups else {}
+    return {
+        "_id": STATS_ID,
+        "rides": {s: by_status[s]["count"] for s in RIDE_STATUSES if s in by_status},
+        "pooledRides": sum(group["pooled"] for group in ride_groups),
+        "revenue": by_status.get("completed", {}).get("revenue", 0) or 0,
+        "ratingSum": feedback.get("sum", 0),
+        "ratingCount": feedback.get("count", 0)
+    }
+
+
+def _flatten(doc: dict) -> Dict[str, float]:
+    flat = {f"rides.{s}": doc.get("rides", {}).get(s, 0) for s in RIDE_STATUSES}
+    for key in ("pooledRides", "revenue", "ratingSum", "ratingCount"):
+        flat[key] = doc.get(key, 0)
+    return flat
+
+
+async def rebuild_platform_stats(db) -> Dict[str, dict]:
+    """
+    Replace the counters with freshly computed ones. Returns the drift that
+    was corrected as {counter: {"stored", "actual"}}; empty when in sync.
+    """
+    stored = await db.platform_stats.find_one({"_id": STATS_ID}) or {}
+    actual = await compute_platform_stats(db)
+    await db.platform_stats.replace_one({"_id": STATS_ID}, actual, upsert=True)
+
+    stored_flat, actual_flat = _flatten(stored), _flatten(actual)
+    return {
+        key: {"stored": stored_flat[key], "actual": actual_flat[key]}
+        for key in actual_flat
+        if abs(stored_flat[key] - actual_flat[key]) > 1e-6
+    }
+
+
+async def ensure_platform_stats(db) -> bool:
+    """Build the counters if they have never been built. Returns True if it did."""
+    if await db.platform_stats.find_one({"_id": STATS_ID}, {"_id": 1}):
+        return False
+    await rebuild_platform_stats(db)
+    return True
+
+
+async def _main():
+    from app.utils.database import close_database, get_database
+
+    drift = await rebuild_platform_stats(get_database())
+    if not drift:
+        print("Platform stats were in sync")
+    for key, values in drift.items():
+        print(f"{key}: stored {values['stored']}, actual {values['actual']}")
+    close_database()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -0,0 +1,173 @@
+import math
+from typing import Dict, List
+from pymongo import ASCENDING, GEOSPHERE, UpdateOne
+from app.utils.database import EXAMPLE_ID, EXAMPLE_POINT, declare_index, declare_query
+from app.utils.geo import haversine_distance, to_geojson_point
+
+MAX_POOL_DEVIATION_KM = 20.0  # Largest detour a pool match may ever be asked for
+CORRIDOR_MARGIN_KM = 1.0  # Slack for geodesic polygon edges bowing inwards
+KM_PER_DEG_LAT = 111.32
+ACTIVE_POOL_STATUSES = ["requested", "accepted", "in-progress"]
+
+# Pool matching narrows by corridor; the backfill and driver refresh walk active pooled rides
+declare_index("rides", [("corridor", GEOSPHERE)])
+declare_index("rides", [("isPooled", ASCENDING), ("status", ASCENDING), ("driverId", ASCENDING)])
+
+
+def corridor_buffer_km(span_km: float, max_deviation_km: float = MAX_POOL_DEVIATION_KM) -> float:
+    """
+    Distance around a route's bounding box (stops plus the driver's position)
+    within which any new stop costing at most max_deviation_km of detour
+    must lie.
+
+    Inserting a stop X between points a and b costs d(a,X) + d(X,b) - d(a,b),
+    so X lies in the ellipse with foci a and b. That ellipse reaches at most
+    its semi-minor axis away from the a-b segment, and the segment is no
+    longer than the box diagonal (span_km). Appending X after the last stop
+    costs at least d(last,X), so X can also lie up to max_deviation_km away
+    from the last stop, which the ellipse bound does not cover on short
+    routes.
+    """
+    semi_minor = math.sqrt(max_deviation_km ** 2 + 2 * span_km * max_deviation_km) / 2
+    return max(semi_minor, max_deviation_km) + CORRIDOR_MARGIN_KM
+
+
+def build_corridor(passengers: List[dict], start: dict | None = None) -> dict | None:
+    """
+    GeoJSON polygon covering every stop of the ride and the driver's position
+    (start, when a driver is assigned) plus the detour buffer.
+    """
+    points = []
+    for passenger in passengers:
+        for key in ("pickupLocation", "dropoffLocation"):
+            if passenger.get(key):
+                points.append(passenger[key])
+    if not points:
+        return None
+    if start:
+        points.append(start)
+
+    min_lat = min(p["lat"] for p in points)
+    max_lat = max(p["lat"] for p in points)
+    min_lng = min(p["lng"] for p in points)
+    max_lng = max(p["lng"] for p in points)
+
+    span_km = haversine_distance(min_lat, min_lng, max_lat, max_lng)
+    buffer_km = corridor_buffer_km(span_km)
+
+    lat_buffer = buffer_km / KM_PER_DEG_LAT
+    min_lat = max(min_lat - lat_buffer, -89.0)
+    max_lat = min(max_lat + lat_buffer, 89.0)
+
+    # Longitude degrees shrink towards the poles, so size for the widest edge
+    widest_cos = math.cos(math.radians(max(abs(min_lat), abs(max_lat))))
+    lng_buffer = buffer_km / (KM_PER_DEG_LAT * widest_cos)
+    min_lng = max(min_lng - lng_buffer, -180.0)
+    max_lng = min(max_lng + lng_buffer, 180.0)
+
+    return {
+        "type": "Polygon",
+        "coordinates": [[
+            [min_lng, min_lat],
+            [max_lng, min_lat],
+            [max_lng, max_lat],
+            [min_lng, max_lat],
+            [min_lng, min_lat]
+        ]]
+    }
+
+
+def corridor_fields(passengers: List[dict], is_pooled: bool, start: dict | None = None) -> dict:
+    """Fields to store on a ride document; only pooled rides carry a corridor."""
+    if not is_pooled:
+        return {}
+    return {"corridor": build_corridor(passengers, start)}
+
+
+def corridor_match_query(pickup: dict, dropoff: dict) -> dict:
+    """Rides whose corridor contains both the new pickup and the new dropoff."""
+    return {
+        "$and": [
+            {"corridor": {"$geoIntersects": {"$geometry": to_geojson_point(pickup)}}},
+            {"corridor": {"$geoIntersects": {"$geometry": to_geojson_point(dropoff)}}}
+        ]
+    }
+
+
+declare_query("pool matches by corridor", "rides", {
+    "isPooled": True,
+    "status": {"$in": ACTIVE_POOL_STATUSES},
+    "passengers.3": {"$exists": False},
+    **corridor_match_query(EXAMPLE_POINT, {"lat": 33.7294, "lng": 73.0931})
+})
+declare_query("corridor backfill", "rides", {
+    "isPooled": True,
+    "status": {"$in": ACTIVE_POOL_STATUSES},
+    "corridor": {"$exists": False}
+})
+declare_query("corridor refresh drivers", "drivers", {"userId": {"$in": [EXAMPLE_ID]}, "isAvailable": False})
+declare_query("corridor refresh rides", "rides", {
+    "isPooled": True,
+    "status": {"$in": ACTIVE_POOL_STATUSES},
+    "driverId": {"$in": [EXAMPLE_ID]}
+})
+
+
+async def backfill_corridors(db) -> int:
+    """Give active pooled rides created before corridors existed their corridor."""
+    rides = db.rides.find(
+        {
+            "isPooled": True,
+            "status": {"$in": ACTIVE_POOL_STATUSES},
+            "corridor": {"$exists": False}
+        },
+        {"passengers": 1}
+    )
+    operations = [
+        UpdateOne(
+            {"_id": ride["_id"]},
+            {"$set": {"corridor": build_corridor(ride.get("passengers", []))}}
+        )
+        async for ride in rides
+    ]
+    if operations:
+        await db.rides.bulk_write(operations, ordered=False)
+    return len(operations)
+
+
+async def refresh_driver_corridors(db, positions: Dict[str, dict]) -> int:
+    """
+    Rebuild the corridors of active pooled rides whose driver moved, so each
+    box keeps covering where the route really starts. positions maps driver
+    user ids to their new location.
+    """
+    drivers = {
+        str(driver["_id"]): driver["userId"]
+        async for driver in db.drivers.find(
+            {"userId": {"$in": list(positions)}, "isAvailable": False},
+            {"userId": 1}
+        )
+    }
+    if not drivers:
+        return 0
+
+    rides = db.rides.find(
+        {
+            "isPooled": True,
+            "status": {"$in": ACTIVE_POOL_STATUSES},
+            "driverId": {"$in": list(drivers)}
+        },
+        {"passengers": 1, "driverId": 1}
+    )
+    operations = [
+        UpdateOne(
+            {"_id": ride["_id"]},
+            {"$set": {"corridor": build_corridor(
+                ride.get("passengers", []), positions[drivers[ride["driverId"]]]
+            )}}
+        )
+        async for ride in rides
+    ]
+    if operations:
+        await db.rides.bulk_write(operations, ordered=False)
+    return len(operations)
@@ -0,0 +1,58 @@
+from typing import Dict, Iterable, List
+from bson import ObjectId
+from bson.errors import InvalidId
+
+USER_PROJECTION = {"name": 1, "email": 1, "phone": 1}
+DRIVER_PROJECTION = {
+    "userId": 1,
+    "vehicleType": 1,
+    "vehicleNumber": 1,
+    "rating": 1,
+    "totalTrips": 1,
+    "currentLocation": 1
+}
+
+
+def _object_ids(ids: Iterable) -> List[ObjectId]:
+    """Deduplicate string ids, skipping empty or malformed ones."""
+    object_ids = set()
+    for value in ids:
+        if not value:
+            continue
+        try:
+            object_ids.add(ObjectId(value))
+        except (InvalidId, TypeError):
+            continue
+    return list(object_ids)
+
+
+async def resolve_users(db, user_ids: Iterable[str]) -> Dict[str, dict]:
+    """Fetch every referenced user in one query, keyed by user id."""
+    object_ids = _object_ids(user_ids)
+    if not object_ids:
+        return {}
+    return {
+        str(user["_id"]): user
+        async for user in db.users.find({"_id": {"$in": object_ids}}, USER_PROJECTION)
+    }
+
+
+async def resolve_drivers(db, driver_ids: Iterable[str]) -> Dict[str, dict]:
+    """
+    Fetch every referenced driver plus their user names with one query per
+    collection, keyed by driver id. Each driver carries a `name` field.
+    """
+    object_ids = _object_ids(driver_ids)
+    if not object_ids:
+        return {}
+    drivers = await db.drivers.find({"_id": {"$in": object_ids}}, DRIVER_PROJECTION).to_list(None)
+    await attach_driver_names(db, drivers)
+    return {str(driver["_id"]): driver for driver in drivers}
+
+
+async def attach_driver_names(db, drivers: List[dict]):
+    """Set `name` on already loaded driver documents from their users."""
+    users = await resolve_users(db, (driver.get("userId") for driver in drivers))
+    for driver in drivers:
+        user = users.get(str(driver.get("userId")))
+        driver["name"] = user["name"] if user else "Unknown"
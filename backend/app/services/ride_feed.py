@@ -0,0 +1,43 @@
+from typing import List
+from app.config import settings
+from app.services.driver_index import driver_index
+from app.websocket.socket_handler import emit_new_ride_request, emit_ride_request_removed
+
+
+def nearest_driver_ids(location: dict) -> List[str]:
+    """User ids of the available drivers a new request is pushed to."""
+    hits = driver_index.query(
+        location["lat"],
+        location["lng"],
+        settings.RIDE_FEED_RADIUS_KM,
+        settings.RIDE_FEED_DRIVERS
+    )
+    return [user_id for user_id, _ in hits]
+
+
+def ride_request_payload(booking: dict, user_name: str) -> dict:
+    """Same shape as an entry of GET /api/driver/ride-requests."""
+    return {
+        "bookingId": str(booking["_id"]),
+        "userId": booking["userId"],
+        "userName": user_name,
+        "pickupLocation": booking["pickupLocation"],
+        "dropoffLocation": booking["dropoffLocation"],
+        "wantPooling": booking["wantPooling"],
+        "fare": booking["fare"],
+        "createdAt": booking["createdAt"].isoformat() if booking.get("createdAt") else None
+    }
+
+
+async def publish_ride_request(booking: dict, user_name: str):
+    """Push a new booking to the drivers stored in its `notifiedDrivers`."""
+    payload = ride_request_payload(booking, user_name)
+    for driver_user_id in booking.get("notifiedDrivers", []):
+        await emit_new_ride_request(driver_user_id, payload)
+
+
+async def retract_ride_request(booking: dict, reason: str):
+    """Tell every driver the booking was pushed to that it is gone."""
+    payload = {"bookingId": str(booking["_id"]), "reason": reason}
+    for driver_user_id in booking.get("notifiedDrivers", []):
+        await emit_ride_request_removed(driver_user_id, payload)
@@ -1,57 +1,168 @@
-import math
 from typing import List
-from bson import ObjectId
-from app.utils.database import get_database
-
-
-def haversine_distance(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
-    """Calculate the distance between two points in kilometers."""
-    R = 6371  # Earth's radius in kilometers
-    
-    lat1_rad = math.radians(lat1)
-    lat2_rad = math.radians(lat2)
-    delta_lat = math.radians(lat2 - lat1)
-    delta_lng = math.radians(lng2 - lng1)
-    
-    a = math.sin(delta_lat / 2) ** 2 + \
-        math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(delta_lng / 2) ** 2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    
-    return R * c
-
-
-def calculate_route_deviation(
-    original_pickup: dict,
-    original_dropoff: dict,
-    new_pickup: dict,
-    new_dropoff: dict
-) -> float:
-    """Calculate how much the route deviates when adding a new passenger."""
-    original_distance = haversine_distance(
-        original_pickup["lat"], original_pickup["lng"],
-        original_dropoff["lat"], original_dropoff["lng"]
-    )
-    
-    # Route with new passenger: original pickup -> new pickup -> new dropoff -> original dropoff
-    new_distance = (
-        haversine_distance(
-            original_pickup["lat"], original_pickup["lng"],
-            new_pickup["lat"], new_pickup["lng"]
-        ) +
-        haversine_distance(
-            new_pickup["lat"], new_pickup["lng"],
-            new_dropoff["lat"], new_dropoff["lng"]
-        ) +
-        haversine_distance(
-            new_dropoff["lat"], new_dropoff["lng"],
-            original_dropoff["lat"], original_dropoff["lng"]
+from pymongo import ASCENDING, GEOSPHERE
+from app.utils.database import EXAMPLE_ID, EXAMPLE_POINT, declare_index, declare_query, get_database
+from app.utils.geo import (
+    geo_near_stage, haversine_distance,
+    haversine_one_to_many, haversine_matrix, to_arrays
+)
+from app.services.driver_index import driver_index
+from app.services.reference_resolver import resolve_drivers, resolve_users
+from app.services.pool_corridor import ACTIVE_POOL_STATUSES, corridor_match_query
+
+MAX_DETOUR_RATIO = 1.5  # A pooled passenger rides at most 1.5x their direct distance
+
+# $geoNear fallback for nearby drivers, and resolving index hits by user id
+declare_index("drivers", [("currentGeo", GEOSPHERE), ("isAvailable", ASCENDING)])
+declare_index("drivers", [("userId", ASCENDING)], unique=True)
+declare_query("nearby drivers fallback", "drivers", pipeline=[
+    geo_near_stage(EXAMPLE_POINT["lat"], EXAMPLE_POINT["lng"], "currentGeo", {"isAvailable": True}, 10.0),
+    {"$limit": 10}
+])
+declare_query("nearby drivers by user ids", "drivers", {"userId": {"$in": [EXAMPLE_ID]}, "isAvailable": True})
+
+
+def _stop(kind: str, passenger, location: dict, direct_km: float = 0.0) -> dict:
+    return {
+        "type": kind,
+        "passenger": passenger,
+        "lat": location["lat"],
+        "lng": location["lng"],
+        "direct": direct_km
+    }
+
+
+def passenger_stops(passenger, pickup: dict | None, dropoff: dict, direct_km: float) -> tuple:
+    """Pickup (None once the passenger is aboard) and dropoff stops for a passenger."""
+    pickup_stop = _stop("pickup", passenger, pickup) if pickup else None
+    return pickup_stop, _stop("dropoff", passenger, dropoff, direct_km)
+
+
+def build_stop_sequence(ride: dict) -> List[dict]:
+    """
+    Remaining stops of a ride. Passengers are inserted in the order they
+    joined, each at its cheapest position, which is how the pool was built.
+    Dropped passengers have no stops left and picked ones only a dropoff.
+    """
+    stops = []
+    for i, passenger in enumerate(ride.get("passengers", [])):
+        status = passenger.get("status", "pending")
+        pickup = passenger.get("pickupLocation")
+        dropoff = passenger.get("dropoffLocation")
+        if status == "dropped" or not pickup or not dropoff:
+            continue
+        
+        direct_km = haversine_distance(pickup["lat"], pickup["lng"], dropoff["lat"], dropoff["lng"])
+        pickup_stop, dropoff_stop = passenger_stops(
+            i, pickup if status == "pending" else None, dropoff, direct_km
         )
-    )
+        stops = find_best_insertion(stops, pickup_stop, dropoff_stop)["stops"]
     
-    return new_distance - original_distance
+    return stops
 
 
-def find_pool_matches(
+def find_best_insertion(
+    stops: List[dict],
+    pickup: dict | None,
+    dropoff: dict,
+    start: dict | None = None,
+    max_detour_ratio: float | None = None
+) -> dict | None:
+    """
+    Cheapest way to add a passenger's pickup/dropoff pair to a stop sequence.
+    
+    Every pickup position and every later dropoff position is tried, so the
+    result is exact. Leg distances come from one distance matrix over all
+    points. With max_detour_ratio set, an insertion is rejected when it makes
+    any passenger ride more than that multiple of their direct distance
+    (unless their ride was already that long). Returns the new stop list and
+    the added distance, or None when no insertion is feasible.
+    """
+    new_stops = ([pickup] if pickup else []) + [dropoff]
+    points = ([start] if start else []) + stops + new_stops
+    lats, lngs = to_arrays(points)
+    legs = haversine_matrix(lats, lngs)
+    
+    offset = 1 if start else 0
+    n = len(stops)
+    old_order = list(range(offset, offset + n))
+    dropoff_point = offset + n + len(new_stops) - 1
+    pickup_point = dropoff_point - 1 if pickup else None
+    
+    def cumulative(order: List[int]) -> List[float]:
+        total = 0.0
+        prev = 0 if start else None
+        distances = []
+        for point in order:
+            if prev is not None:
+                total += legs[prev, point]
+            distances.append(total)
+            prev = point
+        return distances
+    
+    def ride_lengths(order: List[int], distances: List[float]) -> dict:
+        """In-vehicle distance per passenger from boarding (or now) to dropoff."""
+        boarded = {}
+        lengths = {}
+        for position, point in enumerate(order):
+            stop = points[point]
+            if stop["type"] == "pickup":
+                boarded[stop["passenger"]] = distances[position]
+            else:
+                lengths[stop["passenger"]] = distances[position] - boarded.get(stop["passenger"], 0.0)
+        return lengths
+    
+    old_distances = cumulative(old_order)
+    old_cost = old_distances[-1] if old_distances else 0.0
+    old_lengths = ride_lengths(old_order, old_distances)
+    
+    if pickup:
+        candidates = (
+            old_order[:i] + [pickup_point] + old_order[i:j] + [dropoff_point] + old_order[j:]
+            for i in range(n + 1)
+            for j in range(i, n + 1)
+        )
+    else:
+        candidates = (
+            old_order[:j] + [dropoff_point] + old_order[j:]
+            for j in range(n + 1)
+        )
+    
+    best_order = None
+    best_cost = float("inf")
+    for order in candidates:
+        distances = cumulative(order)
+        cost = distances[-1]
+        if cost >= best_cost:
+            continue
+        
+        if max_detour_ratio is not None:
+            lengths = ride_lengths(order, distances)
+            feasible = True
+            for point in order:
+                stop = points[point]
+                if stop["type"] != "dropoff":
+                    continue
+                length = lengths[stop["passenger"]]
+                limit = max(stop["direct"] * max_detour_ratio, old_lengths.get(stop["passenger"], 0.0))
+                if length > limit + 1e-9:
+                    feasible = False
+                    break
+            if not feasible:
+                continue
+        
+        best_order = order
+        best_cost = cost
+    
+    if best_order is None:
+        return None
+    
+    return {
+        "stops": [points[point] for point in best_order],
+        "deviation": float(best_cost - old_cost)
+    }
+
+
+async def find_pool_matches(
     pickup: dict,
     dropoff: dict,
     max_deviation_km: float = 5.0,
@@ -60,32 +171,34 @@ def find_pool_matches(
     """Find existing rides that can accommodate a new pooling passenger."""
     db = get_database()
     
-    # Find active rides that accept pooling
-    active_rides = db.rides.find({
+    # Only rides whose corridor covers both new stops can stay within the detour
+    active_rides = await db.rides.find({
         "isPooled": True,
-        "status": {"$in": ["requested", "accepted", "in-progress"]},
-        "$expr": {"$lt": [{"$size": "$passengers"}, 4]}  # Max 4 passengers per pool
-    })
+        "status": {"$in": ACTIVE_POOL_STATUSES},
+        "passengers.3": {"$exists": False},  # Max 4 passengers per pool
+        **corridor_match_query(pickup, dropoff)
+    }).to_list(None)
+    
+    # Assigned drivers' positions are where each route really starts
+    drivers = await resolve_drivers(db, (ride.get("driverId") for ride in active_rides))
+    
+    direct_km = haversine_distance(pickup["lat"], pickup["lng"], dropoff["lat"], dropoff["lng"])
+    new_pickup, new_dropoff = passenger_stops("new", pickup, dropoff, direct_km)
     
     matches = []
     for ride in active_rides:
         if not ride.get("passengers"):
             continue
         
-        # Use the first passenger's route as reference
-        first_passenger = ride["passengers"][0]
-        original_pickup = first_passenger.get("pickupLocation", {})
-        original_dropoff = first_passenger.get("dropoffLocation", {})
-        
-        if not original_pickup or not original_dropoff:
-            continue
+        driver = drivers.get(ride.get("driverId"))
+        start = driver.get("currentLocation") if driver else None
         
-        deviation = calculate_route_deviation(
-            original_pickup, original_dropoff,
-            pickup, dropoff
+        insertion = find_best_insertion(
+            build_stop_sequence(ride), new_pickup, new_dropoff,
+            start, MAX_DETOUR_RATIO
         )
         
-        if deviation <= max_deviation_km:
+        if insertion and insertion["deviation"] <= max_deviation_km:
             # Calculate discount (more passengers = more discount)
             passenger_count = len(ride["passengers"])
             discount_percentage = min(30, 10 + (passenger_count * 5))
@@ -94,7 +207,7 @@ def find_pool_matches(
                 "rideId": str(ride["_id"]),
                 "driverId": ride.get("driverId"),
                 "currentPassengers": passenger_count,
-                "deviation": round(deviation, 2),
+                "deviation": round(insertion["deviation"], 2),
                 "discountPercentage": discount_percentage
             })
     
@@ -103,40 +216,84 @@ def find_pool_matches(
     return matches[:max_results]
 
 
-def find_nearby_drivers(lat: float, lng: float, radius_km: float = 10.0, limit: int = 10) -> List[dict]:
+async def find_nearby_drivers(lat: float, lng: float, radius_km: float = 10.0, limit: int = 10) -> List[dict]:
     """Find available drivers within a given radius."""
+    if not driver_index.loaded:
+        return await _geo_nearby_drivers(lat, lng, radius_km, limit)
+    
     db = get_database()
     
-    available_drivers = db.drivers.find({
-        "isAvailable": True,
-        "currentLocation": {"$ne": None}
-    })
+    # Only the grid cells covering the radius are scanned
+    hits = driver_index.query(lat, lng, radius_km, limit)
+    if not hits:
+        return []
+    
+    drivers = {
+        driver["userId"]: driver
+        async for driver in db.drivers.find({
+            "userId": {"$in": [user_id for user_id, _ in hits]},
+            "isAvailable": True
+        })
+    }
+    
+    users = await resolve_users(db, drivers.keys())
     
     nearby = []
-    for driver in available_drivers:
-        loc = driver.get("currentLocation")
-        if not loc:
+    for user_id, distance in hits:
+        driver = drivers.get(user_id)
+        if not driver:
+            # Stale entry, the driver went offline through another path
+            driver_index.remove(user_id)
             continue
         
-        distance = haversine_distance(lat, lng, loc["lat"], loc["lng"])
+        lat_lng = driver_index.get_position(user_id)
+        user = users.get(user_id)
+        nearby.append(_format_nearby_driver(
+            driver,
+            user["name"] if user else "Unknown",
+            distance,
+            {"lat": lat_lng[0], "lng": lat_lng[1]}
+        ))
+    
+    return nearby
+
+
+async def _geo_nearby_drivers(lat: float, lng: float, radius_km: float, limit: int) -> List[dict]:
+    """Server-side radius search, used until the location index is loaded."""
+    db = get_database()
+    
+    # Mongo returns only drivers inside the radius, closest first
+    available_drivers = await db.drivers.aggregate([
+        geo_near_stage(lat, lng, "currentGeo", {"isAvailable": True}, radius_km),
+        {"$limit": limit}
+    ]).to_list(None)
+    users = await resolve_users(db, (driver["userId"] for driver in available_drivers))
+    
+    if not available_drivers:
+        return []
+    
+    lats, lngs = to_arrays([driver["currentLocation"] for driver in available_drivers])
+    distances = haversine_one_to_many(lat, lng, lats, lngs)
+    
+    nearby = []
+    for driver, distance in zip(available_drivers, distances):
+        user = users.get(driver["userId"])
+        user_name = user["name"] if user else "Unknown"
         
-        if distance <= radius_km:
-            # Get driver's user info
-            user = db.users.find_one({"_id": ObjectId(driver["userId"])})
-            user_name = user["name"] if user else "Unknown"
-            
-            nearby.append({
-                "driverId": str(driver["_id"]),
-                "userId": str(driver["userId"]),
-                "name": user_name,
-                "vehicleType": driver["vehicleType"],
-                "vehicleNumber": driver["vehicleNumber"],
-                "rating": driver.get("rating", 0),
-                "totalTrips": driver.get("totalTrips", 0),
-                "distance": round(distance, 2),
-                "location": loc
-            })
+        nearby.append(_format_nearby_driver(driver, user_name, float(distance), driver["currentLocation"]))
     
-    # Sort by distance (closest first)
-    nearby.sort(key=lambda x: x["distance"])
-    return nearby[:limit]
+    return nearby
+
+
+def _format_nearby_driver(driver: dict, user_name: str, distance: float, loc: dict) -> dict:
+    return {
+        "driverId": str(driver["_id"]),
+        "userId": str(driver["userId"]),
+        "name": user_name,
+        "vehicleType": driver["vehicleType"],
+        "vehicleNumber": driver["vehicleNumber"],
+        "rating": driver.get("rating", 0),
+        "totalTrips": driver.get("totalTrips", 0),
+        "distance": round(distance, 2),
+        "location": loc
+    }
@@ -1,111 +1,177 @@
 from typing import List
-import math
+from app.utils.geo import haversine_matrix, haversine_pairwise, to_arrays
 
 
-def haversine_distance(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
-    """Calculate the distance between two points in kilometers."""
-    R = 6371
-    lat1_rad = math.radians(lat1)
-    lat2_rad = math.radians(lat2)
-    delta_lat = math.radians(lat2 - lat1)
-    delta_lng = math.radians(lng2 - lng1)
-    
-    a = math.sin(delta_lat / 2) ** 2 + \
-        math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(delta_lng / 2) ** 2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    
-    return R * c
+EXACT_MAX_PASSENGERS = 5  # Bitmask DP covers up to 2 * 5 stops
+MAX_IMPROVEMENT_PASSES = 50
 
 
 def optimize_route(pickup_points: List[dict], dropoff_points: List[dict]) -> List[dict]:
     """
     Optimize route for multiple pickup and dropoff points.
-    Uses a simple nearest neighbor heuristic.
+    The route starts at the first pickup and every dropoff comes after its
+    pickup. Small pools are solved exactly; larger batches use a greedy
+    tour improved by precedence-safe 2-opt and or-opt moves.
     Returns ordered list of waypoints.
     """
     if not pickup_points:
         return []
     
-    waypoints = []
-    all_points = []
+    # Dropoffs without a matching pickup can never be served
+    paired_dropoffs = dropoff_points[:len(pickup_points)]
+    stops = (
+        [{"type": "pickup", **p} for p in pickup_points] +
+        [{"type": "dropoff", **d} for d in paired_dropoffs]
+    )
     
-    # Add all pickup points first (they must come before their corresponding dropoffs)
-    for i, p in enumerate(pickup_points):
-        all_points.append({
-            "type": "pickup",
-            "index": i,
-            "lat": p["lat"],
-            "lng": p["lng"],
-            "address": p.get("address", ""),
-            "visited": False
-        })
+    # pickup_of[node] is the pickup node a dropoff depends on, None for pickups
+    pickup_count = len(pickup_points)
+    pickup_of = [None] * pickup_count + list(range(len(paired_dropoffs)))
     
-    # Add dropoff points
-    for i, d in enumerate(dropoff_points):
-        all_points.append({
-            "type": "dropoff",
-            "index": i,
-            "lat": d["lat"],
-            "lng": d["lng"],
-            "address": d.get("address", ""),
-            "visited": False,
-            "pickup_done": False
-        })
+    lats, lngs = to_arrays(stops)
+    distances = haversine_matrix(lats, lngs).tolist()
     
-    # Start from first pickup point
-    current = all_points[0]
-    current["visited"] = True
-    waypoints.append({
-        "type": current["type"],
-        "lat": current["lat"],
-        "lng": current["lng"],
-        "address": current["address"]
-    })
+    if pickup_count <= EXACT_MAX_PASSENGERS:
+        order = _solve_exact(distances, pickup_of)
+    else:
+        order = _improve_route(_nearest_neighbour(distances, pickup_of), distances, pickup_of)
     
-    # Mark first pickup as done for corresponding dropoff
-    for p in all_points:
-        if p["type"] == "dropoff" and p["index"] == 0:
-            p["pickup_done"] = True
+    return [
+        {
+            "type": stops[node]["type"],
+            "lat": stops[node]["lat"],
+            "lng": stops[node]["lng"],
+            "address": stops[node].get("address", "")
+        }
+        for node in order
+    ]
+
+
+def _solve_exact(distances: List[List[float]], pickup_of: List) -> List[int]:
+    """Bitmask DP over visited sets that respect pickup-before-dropoff."""
+    n = len(pickup_of)
+    full = (1 << n) - 1
+    inf = float("inf")
     
-    # Nearest neighbor algorithm
-    while True:
-        unvisited = [p for p in all_points if not p["visited"]]
-        
-        # Filter out dropoffs whose pickups haven't been done yet
-        available = [
-            p for p in unvisited 
-            if p["type"] == "pickup" or (p["type"] == "dropoff" and p.get("pickup_done", False))
-        ]
-        
-        if not available:
-            break
-        
-        # Find nearest available point
-        nearest = min(
-            available,
-            key=lambda p: haversine_distance(
-                current["lat"], current["lng"],
-                p["lat"], p["lng"]
-            )
-        )
+    cost = [[inf] * n for _ in range(1 << n)]
+    parent = [[-1] * n for _ in range(1 << n)]
+    cost[1][0] = 0.0
+    
+    for mask in range(1, full + 1):
+        if not mask & 1:
+            continue
+        row = cost[mask]
+        for last in range(n):
+            current = row[last]
+            if current == inf:
+                continue
+            leg = distances[last]
+            for node in range(n):
+                bit = 1 << node
+                if mask & bit:
+                    continue
+                pickup = pickup_of[node]
+                if pickup is not None and not mask & (1 << pickup):
+                    continue
+                candidate = current + leg[node]
+                if candidate < cost[mask | bit][node]:
+                    cost[mask | bit][node] = candidate
+                    parent[mask | bit][node] = last
+    
+    last = min(range(n), key=lambda node: cost[full][node])
+    order = []
+    mask = full
+    while last != -1:
+        order.append(last)
+        previous = parent[mask][last]
+        mask ^= 1 << last
+        last = previous
+    order.reverse()
+    return order
+
+
+def _nearest_neighbour(distances: List[List[float]], pickup_of: List) -> List[int]:
+    """Greedy construction: always drive to the closest stop that is allowed."""
+    n = len(pickup_of)
+    dropoff_of = {pickup: node for node, pickup in enumerate(pickup_of) if pickup is not None}
+    
+    order = [0]
+    available = set(range(1, n)) - set(dropoff_of.values())
+    if 0 in dropoff_of:
+        available.add(dropoff_of[0])
+    
+    while available:
+        leg = distances[order[-1]]
+        node = min(available, key=leg.__getitem__)
+        available.remove(node)
+        order.append(node)
+        if node in dropoff_of:
+            available.add(dropoff_of[node])
+    
+    return order
+
+
+def _is_feasible(order: List[int], pickup_of: List) -> bool:
+    position = {node: i for i, node in enumerate(order)}
+    return all(
+        pickup is None or position[pickup] < position[node]
+        for node, pickup in enumerate(pickup_of)
+    )
+
+
+def _route_length(order: List[int], distances: List[List[float]]) -> float:
+    return sum(distances[a][b] for a, b in zip(order, order[1:]))
+
+
+def _improve_route(order: List[int], distances: List[List[float]], pickup_of: List) -> List[int]:
+    """
+    First-improvement local search with 2-opt segment reversals and or-opt
+    moves of 1-3 consecutive stops. The first stop stays fixed and moves
+    that would put a dropoff before its pickup are skipped.
+    """
+    n = len(order)
+    best_length = _route_length(order, distances)
+    
+    for _ in range(MAX_IMPROVEMENT_PASSES):
+        improved = False
         
-        nearest["visited"] = True
-        waypoints.append({
-            "type": nearest["type"],
-            "lat": nearest["lat"],
-            "lng": nearest["lng"],
-            "address": nearest["address"]
-        })
+        # 2-opt: reverse order[i:j + 1]
+        for i in range(1, n - 1):
+            for j in range(i + 1, n):
+                a, b = order[i - 1], order[i]
+                c = order[j]
+                d = order[j + 1] if j + 1 < n else None
+                delta = distances[a][c] - distances[a][b]
+                if d is not None:
+                    delta += distances[b][d] - distances[c][d]
+                if delta >= -1e-9:
+                    continue
+                candidate = order[:i] + order[i:j + 1][::-1] + order[j + 1:]
+                if _is_feasible(candidate, pickup_of):
+                    order = candidate
+                    best_length += delta
+                    improved = True
         
-        # If this was a pickup, mark corresponding dropoff as available
-        if nearest["type"] == "pickup":
-            for p in all_points:
-                if p["type"] == "dropoff" and p["index"] == nearest["index"]:
-                    p["pickup_done"] = True
+        # or-opt: move a segment of 1-3 stops elsewhere
+        for size in (1, 2, 3):
+            for i in range(1, n - size + 1):
+                segment = order[i:i + size]
+                rest = order[:i] + order[i + size:]
+                for k in range(1, len(rest) + 1):
+                    if k == i:
+                        continue
+                    candidate = rest[:k] + segment + rest[k:]
+                    length = _route_length(candidate, distances)
+                    if length < best_length - 1e-9 and _is_feasible(candidate, pickup_of):
+                        order = candidate
+                        best_length = length
+                        improved = True
+                        break
         
-        current = nearest
+        if not improved:
+            break
     
-    return waypoints
+    return order
 
 
 def calculate_total_distance(waypoints: List[dict]) -> float:
@@ -113,14 +179,10 @@ def calculate_total_distance(waypoints: List[dict]) -> float:
     if len(waypoints) < 2:
         return 0.0
     
-    total = 0.0
-    for i in range(len(waypoints) - 1):
-        total += haversine_distance(
-            waypoints[i]["lat"], waypoints[i]["lng"],
-            waypoints[i + 1]["lat"], waypoints[i + 1]["lng"]
-        )
+    lats, lngs = to_arrays(waypoints)
+    total = haversine_pairwise(lats[:-1], lngs[:-1], lats[1:], lngs[1:]).sum()
     
-    return round(total, 2)
+    return round(float(total), 2)
 
 
 def estimate_duration(distance_km: float, avg_speed_kmh: float = 40.0) -> int:
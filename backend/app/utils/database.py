@@ -1,15 +1,16 @@
-from pymongo import MongoClient
-from pymongo.database import Database
+from typing import Any, Dict, List, NamedTuple, Tuple
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo.errors import OperationFailure
 from app.config import settings
 
-_client: MongoClient | None = None
-_db: Database | None = None
+_client: AsyncIOMotorClient | None = None
+_db: AsyncIOMotorDatabase | None = None
 
 
-def get_database() -> Database:
+def get_database() -> AsyncIOMotorDatabase:
     global _client, _db
     if _db is None:
-        _client = MongoClient(settings.MONGO_URI)
+        _client = AsyncIOMotorClient(settings.MONGO_URI)
         _db = _client.get_database()
     return _db
 
@@ -20,3 +21,88 @@ def close_database():
         _client.close()
         _client = None
         _db = None
+
+
+class IndexSpec(NamedTuple):
+    collection: str
+    keys: List[Tuple[str, Any]]
+    options: Dict[str, Any]
+
+
+# Indexes declared by the modules whose queries need them
+_declared_indexes: List[IndexSpec] = []
+
+
+def declare_index(collection: str, keys: List[Tuple[str, Any]], **options):
+    """
+    Register an index next to the query that depends on it. Modules declare
+    at import time; ensure_indexes creates whatever has been declared.
+    """
+    spec = IndexSpec(collection, list(keys), options)
+    if spec not in _declared_indexes:
+        _declared_indexes.append(spec)
+
+
+def declared_indexes() -> List[IndexSpec]:
+    return list(_declared_indexes)
+
+
+# Representative values for declared example queries
+EXAMPLE_ID = "507f1f77bcf86cd799439011"
+EXAMPLE_POINT = {"lat": 33.6844, "lng": 73.0479}
+
+
+class QueryShape(NamedTuple):
+    name: str
+    collection: str
+    filter: Dict[str, Any] | None
+    sort: List[Tuple[str, Any]] | None
+    pipeline: List[Dict[str, Any]] | None
+
+
+# Example hot queries, declared next to the indexes that serve them
+_declared_queries: List[QueryShape] = []
+
+
+def declare_query(
+    name: str,
+    collection: str,
+    filter: Dict[str, Any] | None = None,
+    sort: List[Tuple[str, Any]] | None = None,
+    pipeline: List[Dict[str, Any]] | None = None
+):
+    """
+    Register an example of a hot query (a find filter and sort, or an
+    aggregation pipeline) with representative values. app.utils.index_check
+    explains every declared query and fails on collection scans.
+    """
+    _declared_queries.append(QueryShape(name, collection, filter, sort, pipeline))
+
+
+def declared_queries() -> List[QueryShape]:
+    return list(_declared_queries)
+
+
+# Same key pattern already indexed with other options (e.g. not yet unique)
+INDEX_CONFLICT_CODES = (85, 86)
+
+
+async def ensure_indexes(db: AsyncIOMotorDatabase):
+    """
+    Create every declared index. Existing ones are left as they are, so this
+    is safe to call repeatedly; an index whose declared options changed is
+    dropped and rebuilt.
+    """
+    for spec in _declared_indexes:
+        collection = db[spec.collection]
+        try:
+            try:
+                await collection.create_index(spec.keys, **spec.options)
+            except OperationFailure as e:
+                if e.code not in INDEX_CONFLICT_CODES:
+                    raise
+                print(f"Rebuilding index {spec.keys} on {spec.collection} with {spec.options}")
+                await collection.drop_index(spec.keys)
+                await collection.create_index(spec.keys, **spec.options)
+        except OperationFailure as e:
+            print(f"Could not create index {spec.keys} on {spec.collection}: {str(e)}")
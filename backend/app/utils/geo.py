@@ -0,0 +1,115 @@
+import math
+from typing import Any
+import numpy as np
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+EARTH_RADIUS_KM = 6371
+
+
+def haversine_distance(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Calculate the distance between two points in kilometers."""
+    lat1_rad = math.radians(lat1)
+    lat2_rad = math.radians(lat2)
+    delta_lat = math.radians(lat2 - lat1)
+    delta_lng = math.radians(lng2 - lng1)
+    
+    a = math.sin(delta_lat / 2) ** 2 + \
+        math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(delta_lng / 2) ** 2
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    
+    return EARTH_RADIUS_KM * c
+
+
+def _haversine_array(lat1, lng1, lat2, lng2) -> np.ndarray:
+    """Element-wise haversine over broadcastable arrays of degrees."""
+    lat1_rad = np.radians(lat1)
+    lat2_rad = np.radians(lat2)
+    delta_lat = np.radians(lat2 - lat1)
+    delta_lng = np.radians(lng2 - lng1)
+    
+    a = np.sin(delta_lat / 2) ** 2 + \
+        np.cos(lat1_rad) * np.cos(lat2_rad) * np.sin(delta_lng / 2) ** 2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    
+    return EARTH_RADIUS_KM * c
+
+
+def to_arrays(points: list[dict[str, Any]]) -> tuple[np.ndarray, np.ndarray]:
+    """Split a list of {lat, lng} dicts into latitude and longitude arrays."""
+    lats = np.fromiter((p["lat"] for p in points), dtype=float, count=len(points))
+    lngs = np.fromiter((p["lng"] for p in points), dtype=float, count=len(points))
+    return lats, lngs
+
+
+def haversine_pairwise(lats1, lngs1, lats2, lngs2) -> np.ndarray:
+    """Distances between the i-th point of each array, in kilometers."""
+    return _haversine_array(
+        np.asarray(lats1, dtype=float), np.asarray(lngs1, dtype=float),
+        np.asarray(lats2, dtype=float), np.asarray(lngs2, dtype=float)
+    )
+
+
+def haversine_one_to_many(lat: float, lng: float, lats, lngs) -> np.ndarray:
+    """Distances from a single point to every point of the arrays, in kilometers."""
+    return _haversine_array(
+        float(lat), float(lng),
+        np.asarray(lats, dtype=float), np.asarray(lngs, dtype=float)
+    )
+
+
+def haversine_matrix(lats, lngs, to_lats=None, to_lngs=None) -> np.ndarray:
+    """
+    Full distance matrix in kilometers. Without a second set of points the
+    matrix is square over the first set.
+    """
+    lats = np.asarray(lats, dtype=float)
+    lngs = np.asarray(lngs, dtype=float)
+    to_lats = lats if to_lats is None else np.asarray(to_lats, dtype=float)
+    to_lngs = lngs if to_lngs is None else np.asarray(to_lngs, dtype=float)
+    return _haversine_array(
+        lats[:, np.newaxis], lngs[:, np.newaxis],
+        to_lats[np.newaxis, :], to_lngs[np.newaxis, :]
+    )
+
+
+def to_geojson_point(location: dict[str, Any] | None) -> dict[str, Any] | None:
+    """Convert a {lat, lng} dict into a GeoJSON point (longitude first)."""
+    if not location:
+        return None
+    return {
+        "type": "Point",
+        "coordinates": [float(location["lng"]), float(location["lat"])]
+    }
+
+
+def geo_near_stage(
+    lat: float,
+    lng: float,
+    key: str,
+    query: dict[str, Any],
+    max_distance_km: float | None = None
+) -> dict[str, Any]:
+    """$geoNear stage returning `distance` in kilometers."""
+    stage = {
+        "near": {"type": "Point", "coordinates": [lng, lat]},
+        "key": key,
+        "query": query,
+        "distanceField": "distance",
+        "distanceMultiplier": 0.001,
+        "spherical": True
+    }
+    if max_distance_km is not None:
+        stage["maxDistance"] = max_distance_km * 1000
+    return {"$geoNear": stage}
+
+
+def _point_expr(path: str) -> dict[str, Any]:
+    return {"type": "Point", "coordinates": [f"{path}.lng", f"{path}.lat"]}
+
+
+async def backfill_geo_fields(db: AsyncIOMotorDatabase):
+    """Add GeoJSON points to driver documents written before they were stored."""
+    await db.drivers.update_many(
+        {"currentLocation": {"$ne": None}, "currentGeo": {"$exists": False}},
+        [{"$set": {"currentGeo": _point_expr("$currentLocation")}}]
+    )
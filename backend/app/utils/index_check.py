@@ -0,0 +1,99 @@
+"""
+Explains every declared hot query against the configured database and fails
+if any of them would scan a whole collection.
+
+    python -m app.utils.index_check
+
+Queries are declared with declare_query next to the indexes that serve them.
+List pages are also explained with a keyset cursor applied. Declared indexes
+are ensured first, so it can run against a fresh database. Exits with status
+1 when a query plan contains a COLLSCAN stage.
+"""
+
+import asyncio
+import sys
+from datetime import datetime
+from typing import Any, Iterator, List, Tuple
+from bson import SON, ObjectId
+from pymongo import DESCENDING
+from app.utils.database import (
+    QueryShape, close_database, declared_queries, ensure_indexes, get_database
+)
+from app.utils.pagination import encode_cursor, page_filter
+
+
+def _is_keyset_page(sort: List[Tuple[str, Any]] | None) -> bool:
+    """Whether `sort` is the (field, _id) descending order fetch_page uses."""
+    return (
+        sort is not None
+        and len(sort) == 2
+        and sort[1] == ("_id", DESCENDING)
+        and sort[0][1] == DESCENDING
+    )
+
+
+def expand_queries(queries: List[QueryShape]) -> List[QueryShape]:
+    """Declared queries plus the cursor variant of every list page."""
+    expanded = []
+    for query in queries:
+        expanded.append(query)
+        if _is_keyset_page(query.sort):
+            cursor = encode_cursor(datetime.utcnow(), ObjectId())
+            expanded.append(query._replace(
+                name=f"{query.name} (cursor)",
+                filter=page_filter(query.filter or {}, query.sort[0][0], cursor)
+            ))
+    return expanded
+
+
+def _explain_command(query: QueryShape) -> SON:
+    if query.pipeline is not None:
+        command = SON([("aggregate", query.collection), ("pipeline", query.pipeline), ("cursor", {})])
+    else:
+        command = SON([("find", query.collection), ("filter", query.filter or {})])
+        if query.sort:
+            command["sort"] = SON(query.sort)
+        command["limit"] = 21
+    return SON([("explain", command), ("verbosity", "queryPlanner")])
+
+
+def _stages(plan: Any) -> Iterator[str]:
+    """Every stage name of the chosen plans in an explain output."""
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for key, value in plan.items():
+            if key != "rejectedPlans":
+                yield from _stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _stages(item)
+
+
+async def check_queries(db, queries: List[QueryShape]) -> List[Tuple[str, List[str]]]:
+    """(name, plan stages) of every query that scans a collection."""
+    failures = []
+    for query in queries:
+        explain = await db.command(_explain_command(query))
+        stages = list(_stages(explain))
+        status = "COLLSCAN" if "COLLSCAN" in stages else "ok"
+        print(f"{status:8} {query.collection}: {query.name}: {' <- '.join(stages)}")
+        if status != "ok":
+            failures.append((query.name, stages))
+    return failures
+
+
+async def _main() -> int:
+    import app.main  # noqa: F401  Importing the API declares every index and query
+
+    db = get_database()
+    await ensure_indexes(db)
+    queries = expand_queries(declared_queries())
+    failures = await check_queries(db, queries)
+    close_database()
+    print(f"{len(queries) - len(failures)}/{len(queries)} hot queries use an index")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main()))
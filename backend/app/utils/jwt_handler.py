@@ -1,7 +1,14 @@
+import hashlib
+import time
 from datetime import datetime, timedelta
 from typing import Any
 from jose import jwt, JWTError
 from app.config import settings
+from app.utils.cache import TTLCache
+
+# Verified payloads keyed by the token's SHA-256 digest, so raw tokens are
+# never held in memory. Each entry expires with its token.
+token_cache = TTLCache(settings.TOKEN_CACHE_SIZE, settings.JWT_EXPIRY)
 
 
 def create_access_token(data: dict[str, Any]) -> str:
@@ -13,8 +20,21 @@ def create_access_token(data: dict[str, Any]) -> str:
 
 
 def decode_access_token(token: str) -> dict[str, Any] | None:
+    """
+    Verified payload of a token, or None. Shared by every caller that
+    authenticates a token (HTTP requests, socket handshakes), so a token is
+    only signature-checked once per process until it expires.
+    """
+    digest = hashlib.sha256(token.encode()).digest()
+    payload = token_cache.get(digest)
+    if payload is not None:
+        return dict(payload)
+    
     try:
         payload = jwt.decode(token, settings.JWT_SECRET, algorithms=["HS256"])
-        return payload
     except JWTError:
         return None
+    
+    if "exp" in payload:
+        token_cache.set(digest, payload, payload["exp"] - time.time())
+    return dict(payload)
@@ -0,0 +1,31 @@
+from collections import deque
+
+LATENCY_WINDOW = 1000  # Most recent samples kept per metric
+
+
+class LatencyStats:
+    """Rolling window of durations in milliseconds."""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.count = 0
+        self._samples: deque = deque(maxlen=window)
+
+    def record(self, ms: float):
+        self.count += 1
+        self._samples.append(ms)
+
+    def _percentile(self, ordered: list, fraction: float) -> float:
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+    def summary(self) -> dict:
+        if not self._samples:
+            return {"count": self.count}
+        ordered = sorted(self._samples)
+        return {
+            "count": self.count,
+            "avgMs": round(sum(ordered) / len(ordered), 2),
+            "p50Ms": round(self._percentile(ordered, 0.50), 2),
+            "p95Ms": round(self._percentile(ordered, 0.95), 2),
+            "p99Ms": round(self._percentile(ordered, 0.99), 2),
+            "maxMs": round(ordered[-1], 2)
+        }
@@ -0,0 +1,102 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Tuple
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException
+from pymongo import DESCENDING
+from motor.motor_asyncio import AsyncIOMotorCollection
+
+# Keyset order of createdAt pages; indexes serving them put equality filters first
+NEWEST_FIRST = [("createdAt", DESCENDING), ("_id", DESCENDING)]
+
+
+def encode_cursor(sort_value: datetime | None, doc_id: ObjectId) -> str:
+    """Opaque token for the position right after (sort_value, doc_id)."""
+    payload = {
+        "v": sort_value.isoformat() if sort_value else None,
+        "id": str(doc_id)
+    }
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime | None, ObjectId]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded))
+        sort_value = datetime.fromisoformat(payload["v"]) if payload["v"] else None
+        return sort_value, ObjectId(payload["id"])
+    except (ValueError, KeyError, TypeError, InvalidId):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _after(sort_field: str, sort_value: datetime | None, doc_id: ObjectId) -> dict[str, Any]:
+    """Documents that come after the cursor in (sort_field, _id) descending order."""
+    if sort_value is None:
+        # Missing values sort last, so only the _id tiebreak is left
+        return {sort_field: None, "_id": {"$lt": doc_id}}
+    return {
+        "$or": [
+            {sort_field: {"$lt": sort_value}},
+            {sort_field: None},
+            {sort_field: sort_value, "_id": {"$lt": doc_id}}
+        ]
+    }
+
+
+def page_filter(query: dict[str, Any], sort_field: str, cursor: str | None) -> dict[str, Any]:
+    """`query` narrowed to the documents after `cursor`, if there is one."""
+    if not cursor:
+        return query
+    after = _after(sort_field, *decode_cursor(cursor))
+    return {"$and": [query, after]} if query else after
+
+
+async def fetch_page(
+    collection: AsyncIOMotorCollection,
+    query: dict[str, Any],
+    sort_field: str,
+    page: int,
+    limit: int,
+    cursor: str | None = None
+) -> Tuple[List[dict], dict[str, Any]]:
+    """
+    Newest-first page of `collection` ordered by (sort_field, _id).
+
+    With a cursor the page starts right after it and costs the same however
+    deep it is; without one `page` is honoured through skip as before.
+    Returns the documents and the pagination block with `nextCursor`. Only
+    requests without a cursor count the matches for `page`, `total` and
+    `pages`: cursor pages skip the count, which grows with the result set.
+    """
+    find_query = page_filter(query, sort_field, cursor)
+    skip = 0 if cursor else (page - 1) * limit
+
+    # One extra document tells whether another page exists
+    docs = await (
+        collection.find(find_query)
+        .sort([(sort_field, DESCENDING), ("_id", DESCENDING)])
+        .skip(skip)
+        .limit(limit + 1)
+        .to_list(None)
+    )
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+
+    next_cursor = None
+    if has_more:
+        last = docs[-1]
+        next_cursor = encode_cursor(last.get(sort_field), last["_id"])
+
+    if cursor:
+        return docs, {"limit": limit, "nextCursor": next_cursor}
+
+    total = await collection.count_documents(query)
+    return docs, {
+        "page": page,
+        "limit": limit,
+        "total": total,
+        "pages": (total + limit - 1) // limit,
+        "nextCursor": next_cursor
+    }
@@ -0,0 +1,53 @@
+import asyncio
+import pickle
+from typing import Dict, List
+import socketio
+from socketio.async_pubsub_manager import AsyncPubSubManager
+
+
+class LocalPubSubManager(AsyncPubSubManager):
+    """
+    In-process stand-in for a pub/sub backend. Every instance on the same
+    channel receives what any of them publishes, so several servers in one
+    process (local runs, tests) go through the same cross-worker code path
+    as Redis. Messages are pickled like the Redis manager does.
+    """
+    name = "localpubsub"
+    _subscribers: Dict[str, List[asyncio.Queue]] = {}
+
+    def __init__(self, channel: str = "socketio", write_only: bool = False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self._queue: asyncio.Queue = asyncio.Queue()
+        if not write_only:
+            self._subscribers.setdefault(channel, []).append(self._queue)
+
+    async def _publish(self, data):
+        message = pickle.dumps(data)
+        for queue in self._subscribers.get(self.channel, []):
+            queue.put_nowait(message)
+
+    async def _listen(self):
+        while True:
+            yield await self._queue.get()
+
+
+def create_client_manager(kind: str, url: str, channel: str = "socketio", workers: int = 1):
+    """
+    Socket.IO client manager for SOCKET_MANAGER. "memory" keeps rooms inside
+    this process (single worker); "redis" relays emits and room changes
+    through pub/sub so every worker reaches its own clients. "local" relays
+    only between servers in one process, so like "memory" it is refused
+    when `workers` processes are configured.
+    """
+    if kind in ("memory", "local") and workers > 1:
+        raise ValueError(
+            f"SOCKET_MANAGER '{kind}' cannot relay events between {workers} worker processes; "
+            "set SOCKET_MANAGER=redis or run a single worker"
+        )
+    if kind == "memory":
+        return None
+    if kind == "redis":
+        return socketio.AsyncRedisManager(url, channel=channel)
+    if kind == "local":
+        return LocalPubSubManager(channel=channel)
+    raise ValueError(f"Unknown SOCKET_MANAGER '{kind}', expected memory, redis or local")
@@ -0,0 +1,87 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Tuple
+from app.utils.geo import haversine_distance
+
+Emit = Callable[..., Awaitable[None]]
+
+
+class LocationFanout:
+    """
+    Rate limits driver_location broadcasts per room. A room gets at most one
+    emit per interval carrying the latest position; positions arriving in
+    between replace the pending one, and positions within `min_move_m` of
+    what the room last saw are not sent at all.
+    """
+
+    def __init__(self, emit: Emit, interval: float, min_move_m: float):
+        self._emit = emit
+        self.interval = interval
+        self.min_move_m = min_move_m
+        self.sent = 0
+        self.coalesced = 0
+        self.suppressed = 0
+        self._last_sent: Dict[str, Tuple[float, float, float]] = {}  # room -> (lat, lng, monotonic)
+        self._pending: Dict[str, dict] = {}
+        self._scheduled: Dict[str, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._last_sent)
+
+    def _moved_enough(self, room: str, data: dict) -> bool:
+        last = self._last_sent.get(room)
+        if last is None:
+            return True
+        moved_m = haversine_distance(last[0], last[1], data["lat"], data["lng"]) * 1000
+        return moved_m >= self.min_move_m
+
+    async def publish(self, room: str, data: dict):
+        """Queue `data` ({lat, lng, ...}) for the room's driver_location listeners."""
+        if room in self._pending:
+            self._pending[room] = data
+            self.coalesced += 1
+            return
+        if not self._moved_enough(room, data):
+            self.suppressed += 1
+            return
+
+        last = self._last_sent.get(room)
+        wait = 0.0 if last is None else last[2] + self.interval - time.monotonic()
+        if wait <= 0:
+            await self._send(room, data)
+            return
+
+        self._pending[room] = data
+        self._scheduled[room] = asyncio.create_task(self._send_later(room, wait))
+
+    async def _send_later(self, room: str, wait: float):
+        await asyncio.sleep(wait)
+        self._scheduled.pop(room, None)
+        data = self._pending.pop(room, None)
+        if data is not None:
+            await self._send(room, data)
+
+    async def _send(self, room: str, data: dict):
+        self._last_sent[room] = (data["lat"], data["lng"], time.monotonic())
+        self.sent += 1
+        await self._emit("driver_location", data, room=room)
+
+    def forget(self, room: str):
+        """Drop a room's state, e.g. once its ride has ended."""
+        self._last_sent.pop(room, None)
+        self._pending.pop(room, None)
+        task = self._scheduled.pop(room, None)
+        if task:
+            task.cancel()
+
+    def stats(self) -> dict:
+        offered = self.sent + self.coalesced + self.suppressed
+        return {
+            "rooms": len(self._last_sent),
+            "intervalSeconds": self.interval,
+            "minMoveMeters": self.min_move_m,
+            "sent": self.sent,
+            "coalesced": self.coalesced,
+            "suppressed": self.suppressed,
+            "sentRatio": round(self.sent / offered, 4) if offered else 0.0
+        }
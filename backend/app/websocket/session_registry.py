@@ -0,0 +1,85 @@
+import sys
+from typing import Dict, Set
+
+
+class SessionRegistry:
+    """
+    Which socket sessions belong to which identities ("user_{id}",
+    "driver_{id}") and ride rooms, indexed both ways so connects, disconnects
+    and ride cleanup only touch the entries involved. An identity can hold
+    several sessions, one per connected device.
+    """
+
+    def __init__(self):
+        self._identities: Dict[str, Set[str]] = {}  # sid -> identities
+        self._sessions: Dict[str, Set[str]] = {}  # identity -> sids
+        self._sid_rides: Dict[str, Set[str]] = {}  # sid -> ride ids
+        self._ride_sessions: Dict[str, Set[str]] = {}  # ride id -> sids
+
+    def __len__(self) -> int:
+        """Number of sessions with at least one identity or ride."""
+        return len(self._identities.keys() | self._sid_rides.keys())
+
+    @staticmethod
+    def _link(forward: Dict[str, Set[str]], backward: Dict[str, Set[str]], a: str, b: str):
+        forward.setdefault(a, set()).add(b)
+        backward.setdefault(b, set()).add(a)
+
+    @staticmethod
+    def _unlink(forward: Dict[str, Set[str]], backward: Dict[str, Set[str]], a: str, b: str):
+        for index, key, value in ((forward, a, b), (backward, b, a)):
+            values = index.get(key)
+            if values is not None:
+                values.discard(value)
+                if not values:
+                    del index[key]
+
+    def add_identity(self, sid: str, identity: str):
+        self._link(self._identities, self._sessions, sid, identity)
+
+    def remove_identity(self, sid: str, identity: str):
+        self._unlink(self._identities, self._sessions, sid, identity)
+
+    def add_ride(self, sid: str, ride_id: str):
+        self._link(self._sid_rides, self._ride_sessions, sid, ride_id)
+
+    def remove_ride(self, sid: str, ride_id: str):
+        self._unlink(self._sid_rides, self._ride_sessions, sid, ride_id)
+
+    def remove_session(self, sid: str):
+        """Forget a disconnected session everywhere it is referenced."""
+        for identity in self._identities.pop(sid, set()):
+            self._unlink({}, self._sessions, sid, identity)
+        for ride_id in self._sid_rides.pop(sid, set()):
+            self._unlink({}, self._ride_sessions, sid, ride_id)
+
+    def end_ride(self, ride_id: str) -> Set[str]:
+        """Drop a finished ride; returns the sessions that were tracking it."""
+        sids = self._ride_sessions.pop(ride_id, set())
+        for sid in sids:
+            self._unlink(self._sid_rides, {}, sid, ride_id)
+        return sids
+
+    def sessions(self, identity: str) -> Set[str]:
+        return set(self._sessions.get(identity, ()))
+
+    def is_online(self, identity: str) -> bool:
+        return identity in self._sessions
+
+    def _approx_bytes(self) -> int:
+        """Shallow size of the index structures and the strings they hold."""
+        total = 0
+        for index in (self._identities, self._sessions, self._sid_rides, self._ride_sessions):
+            total += sys.getsizeof(index)
+            for key, values in index.items():
+                total += sys.getsizeof(key) + sys.getsizeof(values)
+                total += sum(sys.getsizeof(value) for value in values)
+        return total
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self),
+            "identities": len(self._sessions),
+            "rides": len(self._ride_sessions),
+            "approxBytes": self._approx_bytes()
+        }
@@ -1,42 +1,45 @@
 import socketio
 from datetime import datetime
-from typing import Dict, Set
+from app.config import settings
+from app.services.location_buffer import location_buffer
+from app.utils.jwt_handler import decode_access_token
+from app.utils.validators import validate_location
+from app.websocket.client_manager import create_client_manager
+from app.websocket.location_fanout import LocationFanout
+from app.websocket.session_registry import SessionRegistry
 
 sio = socketio.AsyncServer(
     async_mode='asgi',
-    cors_allowed_origins='*'
+    cors_allowed_origins='*',
+    # Rooms and emits span all workers unless this is the in-memory manager
+    client_manager=create_client_manager(settings.SOCKET_MANAGER, settings.SOCKET_MANAGER_URL, workers=settings.WORKERS)
 )
 
-# Track connected clients
-user_rooms: Dict[str, str] = {}  # user_id -> session_id
-driver_rooms: Dict[str, str] = {}  # driver_id -> session_id
-active_rides: Set[str] = set()  # ride_ids with active tracking
+# Track connected clients and the ride rooms they follow
+session_registry = SessionRegistry()
+
+# driver_location broadcasts, throttled and coalesced per ride room
+location_fanout = LocationFanout(
+    sio.emit,
+    settings.LOCATION_FANOUT_INTERVAL,
+    settings.LOCATION_FANOUT_MIN_METERS
+)
 
 
 @sio.event
-async def connect(sid, environ):
+async def connect(sid, environ, auth=None):
     print(f"Client connected: {sid}")
+    # Clients that send their access token get an authenticated session
+    token = auth.get("token") if isinstance(auth, dict) else None
+    payload = decode_access_token(token) if token else None
+    if payload and payload.get("sub"):
+        await sio.save_session(sid, {"userId": payload["sub"], "role": payload.get("role")})
 
 
 @sio.event
 async def disconnect(sid):
     print(f"Client disconnected: {sid}")
-    # Clean up user/driver rooms
-    user_to_remove = None
-    for user_id, session_id in user_rooms.items():
-        if session_id == sid:
-            user_to_remove = user_id
-            break
-    if user_to_remove:
-        del user_rooms[user_to_remove]
-    
-    driver_to_remove = None
-    for driver_id, session_id in driver_rooms.items():
-        if session_id == sid:
-            driver_to_remove = driver_id
-            break
-    if driver_to_remove:
-        del driver_rooms[driver_to_remove]
+    session_registry.remove_session(sid)
 
 
 @sio.event
@@ -49,10 +52,7 @@ async def join_room(sid, data):
         room_name = f"{user_type}_{user_id}"
         await sio.enter_room(sid, room_name)
         
-        if user_type == "driver":
-            driver_rooms[user_id] = sid
-        else:
-            user_rooms[user_id] = sid
+        session_registry.add_identity(sid, room_name)
         
         print(f"{user_type} {user_id} joined room {room_name}")
         await sio.emit("room_joined", {"room": room_name}, room=sid)
@@ -67,30 +67,42 @@ async def leave_room(sid, data):
     if user_id:
         room_name = f"{user_type}_{user_id}"
         await sio.leave_room(sid, room_name)
+        session_registry.remove_identity(sid, room_name)
         print(f"{user_type} {user_id} left room {room_name}")
 
 
 @sio.event
 async def location_update(sid, data):
-    """Driver sends location updates."""
-    driver_id = data.get("driverId")
-    lat = data.get("lat")
-    lng = data.get("lng")
-    ride_id = data.get("rideId")
+    """
+    Driver sends location updates. The driver is the one the connection was
+    authenticated as; the position goes through the same buffer as
+    PUT /api/driver/location, so it is used for matching and persisted.
+    """
+    session = await sio.get_session(sid)
+    driver_id = session.get("userId")
+    if not driver_id or session.get("role") not in ["driver", "admin"]:
+        return {"success": False, "message": "Driver authentication required"}
+    
+    if not isinstance(data, dict) or not validate_location(data):
+        return {"success": False, "message": "Invalid location"}
     
-    if driver_id and lat is not None and lng is not None:
+    lat = float(data["lat"])
+    lng = float(data["lng"])
+    if not location_buffer.add(driver_id, lat, lng):
+        return {"success": False, "message": "Location updates are backed up, retry shortly"}
+    
+    # Broadcast to ride room if ride is active
+    ride_id = data.get("rideId")
+    if ride_id:
         location_data = {
             "driverId": driver_id,
             "lat": lat,
             "lng": lng,
             "timestamp": datetime.utcnow().isoformat()
         }
-        
-        # Broadcast to ride room if ride is active
-        if ride_id:
-            await sio.emit("driver_location", location_data, room=f"ride_{ride_id}")
-        
-        print(f"Driver {driver_id} location updated: {lat}, {lng}")
+        await location_fanout.publish(f"ride_{ride_id}", location_data)
+    
+    return {"success": True}
 
 
 @sio.event
@@ -100,7 +112,7 @@ async def join_ride_room(sid, data):
     if ride_id:
         room_name = f"ride_{ride_id}"
         await sio.enter_room(sid, room_name)
-        active_rides.add(ride_id)
+        session_registry.add_ride(sid, ride_id)
         print(f"Client joined ride room {room_name}")
 
 
@@ -111,6 +123,7 @@ async def leave_ride_room(sid, data):
     if ride_id:
         room_name = f"ride_{ride_id}"
         await sio.leave_room(sid, room_name)
+        session_registry.remove_ride(sid, ride_id)
         print(f"Client left ride room {room_name}")
 
 
@@ -138,11 +151,21 @@ async def emit_new_ride_request(driver_id: str, ride_data: dict):
     await sio.emit("new_ride_request", ride_data, room=f"driver_{driver_id}")
 
 
+async def emit_ride_request_removed(driver_id: str, data: dict):
+    """Tell a driver that a pushed ride request is no longer available."""
+    await sio.emit("ride_request_removed", data, room=f"driver_{driver_id}")
+
+
 async def emit_ride_accepted(user_id: str, ride_data: dict):
     """Emit ride accepted notification to user."""
     await sio.emit("ride_accepted", ride_data, room=f"user_{user_id}")
 
 
+async def emit_ride_assigned(driver_id: str, ride_data: dict):
+    """Tell a driver that the dispatch engine has assigned them a ride."""
+    await sio.emit("ride_assigned", ride_data, room=f"driver_{driver_id}")
+
+
 async def emit_ride_started(user_id: str, ride_data: dict):
     """Emit ride started notification to user."""
     await sio.emit("ride_started", ride_data, room=f"user_{user_id}")
@@ -160,4 +183,12 @@ async def emit_pool_match_found(user_id: str, match_data: dict):
 
 async def emit_driver_location(ride_id: str, location_data: dict):
     """Broadcast driver location to all users in a ride."""
-    await sio.emit("driver_location", location_data, room=f"ride_{ride_id}")
+    await location_fanout.publish(f"ride_{ride_id}", location_data)
+
+
+async def close_ride_room(ride_id: str):
+    """Drop per-ride realtime state and room members once the ride has ended."""
+    room_name = f"ride_{ride_id}"
+    location_fanout.forget(room_name)
+    session_registry.end_ride(ride_id)
+    await sio.close_room(room_name)
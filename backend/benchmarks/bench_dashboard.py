@@ -0,0 +1,153 @@
+"""
+Admin dashboard ride and rating totals at up to 1M rides: the original path
+(three sequential count_documents over rides, then every completed ride and
+every feedback row summed in Python) against read_platform_stats, the
+current path, which reads the platform_stats counters with one _id lookup.
+
+    python -m benchmarks.bench_dashboard              # MongoDB at MONGO_URI
+    python -m benchmarks.bench_dashboard --in-memory  # mongomock facade
+
+Rides go to a scratch `<database>_bench` database that is dropped at the
+end. The in-memory run stops at 100k rides: mongomock copies every document
+it stores and returns, so 1M rides do not fit in memory. Memory is the peak
+Python allocation (tracemalloc) during one read. The user and driver counts
+and the recent rides query are unchanged and left out of both sides.
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from motor.motor_asyncio import AsyncIOMotorClient
+from app.config import settings
+from app.services.platform_stats import RIDE_STATUSES, read_platform_stats, rebuild_platform_stats
+from app.utils.database import ensure_indexes
+
+RIDE_COUNTS = [10_000, 100_000, 1_000_000]
+IN_MEMORY_RIDE_COUNTS = [1_000, 10_000, 100_000]
+FEEDBACK_PER_RIDE = 0.3
+BATCH = 10_000
+REPEATS = 3
+SEED = 7
+
+
+def _ride(rng: random.Random, created_at: datetime) -> dict:
+    location = {"lat": 33.6844 + rng.uniform(-0.1, 0.1), "lng": 73.0479 + rng.uniform(-0.1, 0.1)}
+    fare = round(rng.uniform(150, 900), 2)
+    return {
+        "driverId": "507f1f77bcf86cd799439011",
+        "passengers": [{
+            "userId": "507f1f77bcf86cd799439012",
+            "pickupLocation": location,
+            "dropoffLocation": location,
+            "status": "dropped",
+            "fare": fare
+        }],
+        "isPooled": rng.random() < 0.3,
+        "status": rng.choice(RIDE_STATUSES),
+        "route": [],
+        "totalFare": fare,
+        "createdAt": created_at,
+        "updatedAt": created_at
+    }
+
+
+async def _seed(db, rng: random.Random, rides: int):
+    started = datetime.utcnow() - timedelta(days=365)
+    for first in range(0, rides, BATCH):
+        await db.rides.insert_many([
+            _ride(rng, started + timedelta(seconds=30 * i))
+            for i in range(first, min(first + BATCH, rides))
+        ])
+    feedback = int(rides * FEEDBACK_PER_RIDE)
+    for first in range(0, feedback, BATCH):
+        await db.feedback.insert_many([
+            {"rideId": "507f1f77bcf86cd799439013", "rating": rng.randint(1, 5)}
+            for _ in range(first, min(first + BATCH, feedback))
+        ])
+    await rebuild_platform_stats(db)
+
+
+async def _original_totals(db) -> dict:
+    """The dashboard totals before user-021/022, queried in turn as they were."""
+    total_rides = await db.rides.count_documents({})
+    active_rides = await db.rides.count_documents({"status": {"$in": ["requested", "accepted", "in-progress"]}})
+    completed_rides = await db.rides.count_documents({"status": "completed"})
+    completed = await db.rides.find({"status": "completed"}).to_list(None)
+    total_revenue = sum(ride.get("totalFare", 0) for ride in completed)
+    feedbacks = await db.feedback.find().to_list(None)
+    avg_rating = sum(f.get("rating", 0) for f in feedbacks) / len(feedbacks) if feedbacks else 0
+    return {
+        "totalRides": total_rides,
+        "activeRides": active_rides,
+        "completedRides": completed_rides,
+        "totalRevenue": round(total_revenue, 2),
+        "averageRating": round(avg_rating, 2)
+    }
+
+
+async def _measure(read) -> tuple:
+    """(median ms, peak MB) of a totals read."""
+    timings = []
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        await read()
+        timings.append((time.perf_counter() - started) * 1000)
+    tracemalloc.start()
+    await read()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(timings), peak / 1e6
+
+
+async def _run(in_memory: bool):
+    if in_memory:
+        import mongomock
+        from tests.conftest import FakeDatabase
+
+        def scratch():
+            return FakeDatabase(mongomock.MongoClient()["strps_bench"])
+        counts = IN_MEMORY_RIDE_COUNTS
+        client = None
+    else:
+        client = AsyncIOMotorClient(settings.MONGO_URI)
+        name = f"{client.get_database().name}_bench"
+
+        def scratch():
+            return client[name]
+        counts = RIDE_COUNTS
+
+    rng = random.Random(SEED)
+    print(f"{'rides':>9} {'original ms':>12} {'original MB':>12} {'current ms':>11} {'current MB':>11} {'same':>5}")
+    for count in counts:
+        db = scratch()
+        if client:
+            await client.drop_database(db.name)
+        await ensure_indexes(db)
+        await _seed(db, rng, count)
+
+        original_ms, original_mb = await _measure(lambda: _original_totals(db))
+        current_ms, current_mb = await _measure(lambda: read_platform_stats(db))
+        original = await _original_totals(db)
+        current = await read_platform_stats(db)
+        same = all(current[key] == value for key, value in original.items())
+        print(
+            f"{count:>9} {original_ms:>12.1f} {original_mb:>12.1f} "
+            f"{current_ms:>11.2f} {current_mb:>11.2f} {str(same):>5}"
+        )
+
+        if client:
+            await client.drop_database(db.name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--in-memory", action="store_true", help="use the mongomock facade instead of MONGO_URI")
+    asyncio.run(_run(parser.parse_args().in_memory))
+
+
+if __name__ == "__main__":
+    main()
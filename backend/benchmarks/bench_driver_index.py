@@ -0,0 +1,105 @@
+"""
+Nearby-driver lookup through the grid index against the lookup it replaced,
+which fetched every available driver from Mongo and filtered by distance in
+Python.
+
+    python -m benchmarks.bench_driver_index
+
+"fetch + filter" is that old path on the client: decoding the reply of
+find({"isAvailable": True, ...}) for every available driver, as pymongo
+does, then the distance filter. The server's scan and the network transfer
+are left out, so it understates the old cost; running the find through the
+mongomock facade instead takes over a minute per query at 100k drivers.
+"scan" is the distance filter alone over drivers already in memory.
+"""
+
+import heapq
+import random
+import time
+import bson
+from bson import ObjectId
+from app.services.driver_index import DriverLocationIndex
+from app.utils.geo import haversine_distance
+
+CENTER = (33.6844, 73.0479)
+SPREAD_DEG = 0.5
+DRIVER_COUNTS = [1_000, 10_000, 50_000, 100_000]
+QUERIES = 200
+FETCH_QUERIES = 20
+RADIUS_KM = 10.0
+LIMIT = 10
+SEED = 7
+
+
+def _full_scan(drivers, lat, lng):
+    hits = [
+        (haversine_distance(lat, lng, d_lat, d_lng), driver_id)
+        for driver_id, d_lat, d_lng in drivers
+    ]
+    return heapq.nsmallest(LIMIT, [hit for hit in hits if hit[0] <= RADIUS_KM])
+
+
+def _fetch_and_filter(reply: bytes, lat, lng):
+    """The old find_nearby_drivers minus its per-driver user lookups."""
+    nearby = []
+    for driver in bson.decode_all(reply):
+        loc = driver.get("currentLocation")
+        if not loc:
+            continue
+        distance = haversine_distance(lat, lng, loc["lat"], loc["lng"])
+        if distance <= RADIUS_KM:
+            nearby.append((distance, driver["userId"]))
+    nearby.sort()
+    return nearby[:LIMIT]
+
+
+def _per_query_ms(fn, points) -> float:
+    started = time.perf_counter()
+    for lat, lng in points:
+        fn(lat, lng)
+    return (time.perf_counter() - started) / len(points) * 1000
+
+
+def main():
+    rng = random.Random(SEED)
+    print(f"{'drivers':>8} {'fetch + filter ms':>18} {'scan ms':>8} {'grid index ms':>14}")
+    for count in DRIVER_COUNTS:
+        drivers = [
+            (
+                f"driver{i}",
+                CENTER[0] + rng.uniform(-SPREAD_DEG, SPREAD_DEG),
+                CENTER[1] + rng.uniform(-SPREAD_DEG, SPREAD_DEG)
+            )
+            for i in range(count)
+        ]
+        reply = b"".join(
+            bson.encode({
+                "_id": ObjectId(),
+                "userId": driver_id,
+                "vehicleType": "Sedan",
+                "vehicleNumber": "ISB-1234",
+                "licenseNumber": "LIC-1234",
+                "isAvailable": True,
+                "currentLocation": {"lat": lat, "lng": lng},
+                "currentGeo": {"type": "Point", "coordinates": [lng, lat]},
+                "rating": 4.5,
+                "totalTrips": 120
+            })
+            for driver_id, lat, lng in drivers
+        )
+        index = DriverLocationIndex()
+        for driver_id, lat, lng in drivers:
+            index.upsert(driver_id, lat, lng)
+
+        points = [
+            (CENTER[0] + rng.uniform(-SPREAD_DEG, SPREAD_DEG), CENTER[1] + rng.uniform(-SPREAD_DEG, SPREAD_DEG))
+            for _ in range(QUERIES)
+        ]
+        fetch = _per_query_ms(lambda lat, lng: _fetch_and_filter(reply, lat, lng), points[:FETCH_QUERIES])
+        scan = _per_query_ms(lambda lat, lng: _full_scan(drivers, lat, lng), points)
+        grid = _per_query_ms(lambda lat, lng: index.query(lat, lng, RADIUS_KM, LIMIT), points)
+        print(f"{count:>8} {fetch:>18.3f} {scan:>8.3f} {grid:>14.3f}")
+
+
+if __name__ == "__main__":
+    main()
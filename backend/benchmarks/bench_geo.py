@@ -0,0 +1,62 @@
+"""
+NumPy haversine helpers against the scalar haversine_distance loops they
+replaced, for one-to-many distances and full distance matrices.
+
+    python -m benchmarks.bench_geo
+
+Matrices stop at 1k points: a 100k-point matrix holds 10^10 float64
+distances (80 GB) before any temporaries, which no pool or dispatch region
+comes near. Large sizes are repeated fewer times so the scalar loops finish.
+"""
+
+import random
+import time
+from app.utils.geo import haversine_distance, haversine_matrix, haversine_one_to_many
+
+CENTER = (33.6844, 73.0479)
+SPREAD_DEG = 0.5
+ONE_TO_MANY_SIZES = [10, 1_000, 10_000, 100_000]
+MATRIX_SIZES = [10, 60, 200, 1_000]
+REPEATS = 20
+MAX_DISTANCES_PER_SIZE = 2_000_000  # Scalar distance calls per size, over all repeats
+SEED = 7
+
+
+def _points(rng: random.Random, count: int):
+    lats = [CENTER[0] + rng.uniform(-SPREAD_DEG, SPREAD_DEG) for _ in range(count)]
+    lngs = [CENTER[1] + rng.uniform(-SPREAD_DEG, SPREAD_DEG) for _ in range(count)]
+    return lats, lngs
+
+
+def _ms(fn, distances: int) -> float:
+    repeats = max(1, min(REPEATS, MAX_DISTANCES_PER_SIZE // distances))
+    started = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - started) / repeats * 1000
+
+
+def main():
+    rng = random.Random(SEED)
+    lat, lng = CENTER
+
+    print(f"{'one-to-many':>12} {'scalar ms':>10} {'numpy ms':>9}")
+    for size in ONE_TO_MANY_SIZES:
+        lats, lngs = _points(rng, size)
+        scalar = _ms(lambda: [haversine_distance(lat, lng, a, b) for a, b in zip(lats, lngs)], size)
+        vector = _ms(lambda: haversine_one_to_many(lat, lng, lats, lngs), size)
+        print(f"{size:>12} {scalar:>10.3f} {vector:>9.3f}")
+
+    print(f"{'matrix':>12} {'scalar ms':>10} {'numpy ms':>9}")
+    for size in MATRIX_SIZES:
+        lats, lngs = _points(rng, size)
+        scalar = _ms(lambda: [
+            [haversine_distance(a, b, c, d) for c, d in zip(lats, lngs)]
+            for a, b in zip(lats, lngs)
+        ], size * size)
+        vector = _ms(lambda: haversine_matrix(lats, lngs), size * size)
+        print(f"{size:>12} {scalar:>10.3f} {vector:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Latency of location_update fan-out while /api/admin/payments is under load,
+with the data layer blocking the event loop (the synchronous driver before
+the move to Motor) and with it running off the loop (Motor).
+
+    python -m benchmarks.bench_location_load
+
+The API runs in-process on the mongomock facade. Every command waits
+LATENCY_MS for its round trip: on the event loop in the blocking run, in a
+worker thread in the Motor run, which is where Motor runs pymongo. A driver
+sends location_update every TICK_MS for a ride room while LOAD_CLIENTS
+admins fetch payment pages back to back. Latency runs from when an update
+was due to when its driver_location emit went out, so stalls on the loop
+are counted even when they delay the sender. mongomock still evaluates
+queries in this process, competing for the GIL, where a real server would
+not; the Motor figures are pessimistic for that reason.
+"""
+
+import asyncio
+import statistics
+import time
+from datetime import datetime, timedelta
+import httpx
+import mongomock
+import app.utils.database as database
+from app.main import app
+from app.services.auth_service import user_cache
+from app.services.platform_stats import rebuild_platform_stats
+from app.websocket import socket_handler
+from tests.conftest import FakeDatabase, auth_headers, make_user
+
+LATENCY_MS = 2.0
+RIDES = 200
+LOAD_CLIENTS = 8
+PAGE_LIMIT = 50
+TICK_MS = 20.0
+DURATION_S = 5.0
+
+
+def _seed(db: FakeDatabase) -> str:
+    admin_id = make_user(db, "admin", "admin")
+    driver_user = make_user(db, "driver", "driver")
+    driver_id = str(db.sync.drivers.insert_one({"userId": driver_user, "vehicleType": "Sedan"}).inserted_id)
+    now = datetime.utcnow()
+    db.sync.rides.insert_many([
+        {
+            "driverId": driver_id,
+            "passengers": [],
+            "isPooled": False,
+            "status": "completed",
+            "totalFare": 400.0,
+            "endTime": now - timedelta(minutes=i),
+            "createdAt": now - timedelta(minutes=i)
+        }
+        for i in range(RIDES)
+    ])
+    return admin_id
+
+
+async def _payments_load(client: httpx.AsyncClient, headers: dict, stop: asyncio.Event) -> int:
+    served = 0
+    while not stop.is_set():
+        response = await client.get(f"/api/admin/payments?limit={PAGE_LIMIT}", headers=headers)
+        response.raise_for_status()
+        served += 1
+    return served
+
+
+async def _drive_locations(stop: asyncio.Event) -> list:
+    """Send location_update on a fixed schedule; returns emit delays in ms."""
+    delays = []
+    due = {}
+
+    async def emit(event, data, room=None):
+        delays.append((time.perf_counter() - due.pop(data["lat"])) * 1000)
+
+    async def get_session(sid):
+        return {"userId": "driver", "role": "driver"}
+
+    fanout = socket_handler.location_fanout
+    fanout._emit, fanout.interval, fanout.min_move_m = emit, 0.0, 0.0
+    socket_handler.sio.get_session = get_session
+
+    started = time.perf_counter()
+    tasks = []
+    seq = 0
+    while not stop.is_set():
+        next_due = started + seq * TICK_MS / 1000
+        await asyncio.sleep(max(0.0, next_due - time.perf_counter()))
+        # Each update has its own latitude, which identifies its emit
+        data = {"lat": 33.6844 + seq * 1e-4, "lng": 73.0479, "rideId": "r1"}
+        due[data["lat"]] = next_due
+        # Socket.IO runs every event handler as its own task
+        tasks.append(asyncio.create_task(socket_handler.location_update("sid", data)))
+        seq += 1
+    await asyncio.gather(*tasks)
+    return delays
+
+
+async def _run(blocking: bool) -> dict:
+    db = FakeDatabase(mongomock.MongoClient()["strps_bench"])
+    admin_id = _seed(db)
+    await rebuild_platform_stats(db)
+    db.latency, db.blocking = LATENCY_MS / 1000, blocking
+    database._db = db
+    user_cache.clear()
+    socket_handler.location_fanout.forget("ride_r1")
+
+    headers = auth_headers(admin_id, "admin")
+    stop = asyncio.Event()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        load = [asyncio.create_task(_payments_load(client, headers, stop)) for _ in range(LOAD_CLIENTS)]
+        driver = asyncio.create_task(_drive_locations(stop))
+        await asyncio.sleep(DURATION_S)
+        stop.set()
+        served = sum(await asyncio.gather(*load))
+        delays = sorted(await driver)
+
+    database._db = None
+    return {
+        "p50": statistics.median(delays),
+        "p99": delays[int(len(delays) * 0.99)],
+        "max": delays[-1],
+        "payments": served / DURATION_S
+    }
+
+
+def main():
+    print(f"{'data layer':>22} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'payments/s':>11}")
+    for name, blocking in (("blocking (before)", True), ("off the loop (Motor)", False)):
+        result = asyncio.run(_run(blocking))
+        print(
+            f"{name:>22} {result['p50']:>8.1f} {result['p99']:>8.1f} "
+            f"{result['max']:>8.1f} {result['payments']:>11.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
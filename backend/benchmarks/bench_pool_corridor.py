@@ -0,0 +1,102 @@
+"""
+Pool matching over every active pool against matching only the pools whose
+corridor contains both new stops, with pools spread over the seed cities.
+
+    python -m benchmarks.bench_pool_corridor
+
+Both sides score candidates exactly as find_pool_matches does. The corridor
+side selects candidates with a vectorised box test, which stands in for the
+2dsphere lookup; Mongo round trips are left out of both sides. Matches are
+compared to show the corridor loses none within the largest deviation.
+"""
+
+import random
+import time
+import numpy as np
+from app.services.pool_corridor import MAX_POOL_DEVIATION_KM, build_corridor
+from app.services.ride_matching import MAX_DETOUR_RATIO, build_stop_sequence, find_best_insertion, passenger_stops
+from app.utils.geo import haversine_distance
+from seed_data.seed import CITIES
+
+POOL_COUNTS = [5_000, 50_000]
+QUERIES = 5
+CITY_SPREAD_DEG = 0.1
+SEED = 7
+
+
+def _near(rng: random.Random, city: dict) -> dict:
+    return {
+        "lat": city["lat"] + rng.uniform(-CITY_SPREAD_DEG, CITY_SPREAD_DEG),
+        "lng": city["lng"] + rng.uniform(-CITY_SPREAD_DEG, CITY_SPREAD_DEG)
+    }
+
+
+def _pool(rng: random.Random) -> dict:
+    city = rng.choice(list(CITIES.values()))
+    passengers = [
+        {"pickupLocation": _near(rng, city), "dropoffLocation": _near(rng, city), "status": "pending"}
+        for _ in range(rng.randint(1, 3))
+    ]
+    start = _near(rng, city) if rng.random() < 0.7 else None
+    return {"passengers": passengers, "start": start, "corridor": build_corridor(passengers, start)}
+
+
+def _matches(pools, pickup: dict, dropoff: dict) -> set:
+    direct_km = haversine_distance(pickup["lat"], pickup["lng"], dropoff["lat"], dropoff["lng"])
+    new_pickup, new_dropoff = passenger_stops("new", pickup, dropoff, direct_km)
+    matched = set()
+    for i, pool in pools:
+        insertion = find_best_insertion(
+            build_stop_sequence(pool), new_pickup, new_dropoff,
+            pool["start"], MAX_DETOUR_RATIO
+        )
+        if insertion and insertion["deviation"] <= MAX_POOL_DEVIATION_KM:
+            matched.add(i)
+    return matched
+
+
+def main():
+    rng = random.Random(SEED)
+    print(f"{'pools':>7} {'scan ms':>9} {'corridor ms':>12} {'candidates':>11} {'matches':>8} {'same':>5}")
+    for count in POOL_COUNTS:
+        pools = [_pool(rng) for _ in range(count)]
+        boxes = np.array([
+            pool["corridor"]["coordinates"][0][0] + pool["corridor"]["coordinates"][0][2]
+            for pool in pools
+        ])
+        min_lng, min_lat, max_lng, max_lat = boxes.T
+
+        def inside(point: dict) -> np.ndarray:
+            return (
+                (min_lat <= point["lat"]) & (point["lat"] <= max_lat)
+                & (min_lng <= point["lng"]) & (point["lng"] <= max_lng)
+            )
+
+        scan_ms = corridor_ms = 0.0
+        candidates = matches = 0
+        same = True
+        for _ in range(QUERIES):
+            city = rng.choice(list(CITIES.values()))
+            pickup, dropoff = _near(rng, city), _near(rng, city)
+
+            started = time.perf_counter()
+            scanned = _matches(enumerate(pools), pickup, dropoff)
+            scan_ms += (time.perf_counter() - started) * 1000
+
+            started = time.perf_counter()
+            hits = np.flatnonzero(inside(pickup) & inside(dropoff))
+            filtered = _matches(((i, pools[i]) for i in hits), pickup, dropoff)
+            corridor_ms += (time.perf_counter() - started) * 1000
+
+            candidates += len(hits)
+            matches += len(filtered)
+            same = same and scanned == filtered
+
+        print(
+            f"{count:>7} {scan_ms / QUERIES:>9.1f} {corridor_ms / QUERIES:>12.1f} "
+            f"{candidates // QUERIES:>11} {matches // QUERIES:>8} {str(same):>5}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Route length and wall time of optimize_route against the nearest-neighbour
+tour it replaced, on random pools around Islamabad.
+
+    python -m benchmarks.bench_route_optimization
+"""
+
+import random
+import statistics
+import time
+from app.services.route_optimization import (
+    _nearest_neighbour,
+    calculate_total_distance,
+    optimize_route
+)
+from app.utils.geo import haversine_matrix, to_arrays
+
+CENTER = (33.6844, 73.0479)
+SPREAD_DEG = 0.5
+POOL_SIZES = [5, 8, 15, 30]
+INSTANCES = 30
+SEED = 7
+
+
+def _point(rng: random.Random) -> dict:
+    return {
+        "lat": CENTER[0] + rng.uniform(-SPREAD_DEG, SPREAD_DEG),
+        "lng": CENTER[1] + rng.uniform(-SPREAD_DEG, SPREAD_DEG)
+    }
+
+
+def _greedy_route(pickups, dropoffs):
+    """The previous optimize_route: nearest allowed stop, no improvement."""
+    stops = pickups + dropoffs
+    lats, lngs = to_arrays(stops)
+    distances = haversine_matrix(lats, lngs).tolist()
+    pickup_of = [None] * len(pickups) + list(range(len(dropoffs)))
+    return [stops[node] for node in _nearest_neighbour(distances, pickup_of)]
+
+
+def _measure(route_fn, pickups, dropoffs):
+    started = time.perf_counter()
+    route = route_fn(pickups, dropoffs)
+    return calculate_total_distance(route), (time.perf_counter() - started) * 1000
+
+
+def main():
+    rng = random.Random(SEED)
+    print(f"{'passengers':>10} {'greedy km':>10} {'optimized km':>13} {'greedy ms':>10} {'optimized ms':>13}")
+    for size in POOL_SIZES:
+        results = {"greedy": [], "optimized": []}
+        for _ in range(INSTANCES):
+            pickups = [_point(rng) for _ in range(size)]
+            dropoffs = [_point(rng) for _ in range(size)]
+            results["greedy"].append(_measure(_greedy_route, pickups, dropoffs))
+            results["optimized"].append(_measure(optimize_route, pickups, dropoffs))
+
+        km = {name: statistics.mean(r[0] for r in runs) for name, runs in results.items()}
+        ms = {name: statistics.mean(r[1] for r in runs) for name, runs in results.items()}
+        print(
+            f"{size:>10} {km['greedy']:>10.0f} {km['optimized']:>13.0f} "
+            f"{ms['greedy']:>10.2f} {ms['optimized']:>13.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
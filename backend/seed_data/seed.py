@@ -11,6 +11,8 @@ from datetime import datetime, timedelta
 import random
 import bcrypt
 from pymongo import MongoClient
+from app.utils.geo import to_geojson_point
+from app.services.pool_corridor import build_corridor, ACTIVE_POOL_STATUSES
 
 
 def hash_password(password: str) -> str:
@@ -50,6 +52,8 @@ def clear_database():
     db.rides.delete_many({})
     db.bookings.delete_many({})
     db.feedback.delete_many({})
+    # Rebuilt from the seeded data on the next API startup
+    db.platform_stats.delete_many({})
     print("Database cleared")
 
 def create_users():
@@ -126,6 +130,7 @@ def create_drivers(user_ids):
             "vehicleNumber": f"LEA-{random.randint(1000, 9999)}",
             "licenseNumber": f"DL-{random.randint(100000, 999999)}",
             "currentLocation": {"lat": lat, "lng": lng},
+            "currentGeo": to_geojson_point({"lat": lat, "lng": lng}),
             "isAvailable": random.choice([True, True, True, False]),  # 75% available
             "rating": round(random.uniform(3.5, 5.0), 1),
             "totalTrips": random.randint(10, 200),
@@ -199,6 +204,8 @@ def create_rides_and_bookings(user_ids, driver_ids):
             "createdAt": now - timedelta(hours=random.randint(1, 72)),
             "updatedAt": now
         }
+        if is_pooled and status in ACTIVE_POOL_STATUSES:
+            ride["corridor"] = build_corridor(ride["passengers"])
         rides.append(ride)
     
     ride_results = db.rides.insert_many(rides)
@@ -264,16 +271,12 @@ def create_feedback(user_ids, driver_ids, ride_ids):
         print("No completed rides to add feedback")
 
 def create_indexes():
-    """Create database indexes for performance"""
-    db.users.create_index("email", unique=True)
-    db.users.create_index("role")
-    db.drivers.create_index("userId")
-    db.drivers.create_index("isAvailable")
-    db.rides.create_index("status")
-    db.rides.create_index("driverId")
-    db.bookings.create_index("userId")
-    db.bookings.create_index("status")
-    db.feedback.create_index("driverId")
+    """Create the indexes the API declares next to its queries"""
+    import app.main  # noqa: F401  Importing the API declares every index
+    from app.utils.database import declared_indexes
+    
+    for spec in declared_indexes():
+        db[spec.collection].create_index(spec.keys, **spec.options)
     print("Database indexes created")
 
 def main():
@@ -0,0 +1,167 @@
+"""
+Shared fixtures. The API runs against an in-memory mongomock database behind
+a small async facade that also records every command a request sends.
+"""
+
+import asyncio
+import time
+from datetime import datetime
+from typing import Any, List, Tuple
+import mongomock
+import pytest
+from fastapi.testclient import TestClient
+import app.utils.database as database
+from app.main import app
+from app.services.auth_service import user_cache
+from app.services.driver_index import driver_index
+from app.services.location_buffer import location_buffer
+from app.utils.jwt_handler import create_access_token, token_cache
+
+
+class CommandLog:
+    """(collection, operation, filter or pipeline) of every command sent, in order."""
+
+    def __init__(self):
+        self.commands: List[Tuple[str, str, Any]] = []
+
+    def record(self, collection: str, operation: str, argument: Any = None):
+        self.commands.append((collection, operation, argument))
+
+    def __len__(self) -> int:
+        return len(self.commands)
+
+
+class FakeCursor:
+    """Counts as one command when it is read, like a single-batch find."""
+
+    def __init__(self, database: "FakeDatabase", collection: str, operation: str, argument: Any, cursor):
+        self._database = database
+        self._collection = collection
+        self._operation = operation
+        self._argument = argument
+        self._cursor = cursor
+        self._iterator = None
+
+    def sort(self, *args, **kwargs):
+        self._cursor = self._cursor.sort(*args, **kwargs)
+        return self
+
+    def skip(self, count):
+        self._cursor = self._cursor.skip(count)
+        return self
+
+    def limit(self, count):
+        self._cursor = self._cursor.limit(count)
+        return self
+
+    async def to_list(self, length=None):
+        self._database.log.record(self._collection, self._operation, self._argument)
+        return await self._database.round_trip(lambda: list(self._cursor))
+
+    def __aiter__(self):
+        self._database.log.record(self._collection, self._operation, self._argument)
+        return self
+
+    async def __anext__(self):
+        if self._iterator is None:
+            self._iterator = iter(await self._database.round_trip(lambda: list(self._cursor)))
+        try:
+            return next(self._iterator)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class FakeCollection:
+    def __init__(self, database: "FakeDatabase", collection):
+        self._database = database
+        self._collection = collection
+        self.name = collection.name
+
+    def find(self, filter=None, *args, **kwargs):
+        cursor = self._collection.find(filter, *args, **kwargs)
+        return FakeCursor(self._database, self.name, "find", filter, cursor)
+
+    def aggregate(self, pipeline, *args, **kwargs):
+        cursor = self._collection.aggregate(pipeline, *args, **kwargs)
+        return FakeCursor(self._database, self.name, "aggregate", pipeline, cursor)
+
+    def __getattr__(self, operation):
+        method = getattr(self._collection, operation)
+
+        async def call(*args, **kwargs):
+            self._database.log.record(self.name, operation, args[0] if args else None)
+            return await self._database.round_trip(lambda: method(*args, **kwargs))
+        return call
+
+
+class FakeDatabase:
+    """
+    Motor-shaped async access to a mongomock database. With latency set,
+    every command also waits that long for its round trip: in a worker
+    thread like Motor, or with blocking=True on the calling thread like a
+    synchronous driver awaited from the event loop.
+    """
+
+    def __init__(self, db, latency: float = 0.0, blocking: bool = False):
+        self.sync = db
+        self.log = CommandLog()
+        self.latency = latency
+        self.blocking = blocking
+
+    async def round_trip(self, command):
+        if not self.latency:
+            return command()
+
+        def send():
+            time.sleep(self.latency)
+            return command()
+        if self.blocking:
+            return send()
+        return await asyncio.to_thread(send)
+
+    def __getitem__(self, name: str) -> FakeCollection:
+        return FakeCollection(self, self.sync[name])
+
+    def __getattr__(self, name: str) -> FakeCollection:
+        return self[name]
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def db(monkeypatch):
+    fake = FakeDatabase(mongomock.MongoClient()["strps_test"])
+    monkeypatch.setattr(database, "_db", fake)
+    monkeypatch.setattr(database, "_client", None)
+    yield fake
+    user_cache.clear()
+    token_cache.clear()
+    driver_index.clear()
+    location_buffer._pending.clear()
+
+
+@pytest.fixture
+def client(db):
+    # Not entered as a context manager: the lifespan would start the
+    # background engines, which the tests drive directly instead
+    return TestClient(app)
+
+
+def make_user(db: FakeDatabase, name: str, role: str = "user") -> str:
+    now = datetime.utcnow()
+    return str(db.sync.users.insert_one({
+        "name": name,
+        "email": f"{name}@ridepool.pk",
+        "phone": "+923001234567",
+        "password": "not-a-hash",
+        "role": role,
+        "createdAt": now,
+        "updatedAt": now
+    }).inserted_id)
+
+
+def auth_headers(user_id: str, role: str) -> dict:
+    return {"Authorization": f"Bearer {create_access_token({'sub': user_id, 'role': role})}"}
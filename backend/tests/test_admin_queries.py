@@ -0,0 +1,137 @@
+from datetime import datetime, timedelta
+import pytest
+from app.services.driver_index import driver_index
+from app.services.open_pools import booking_entry
+from app.services.ride_matching import find_nearby_drivers
+from tests.conftest import auth_headers, make_user
+
+ISLAMABAD = (33.6844, 73.0479)
+
+# (path, role of the caller) of every list that resolves references per page
+LISTS = [
+    ("/api/admin/trips", "admin"),
+    ("/api/admin/feedback", "admin"),
+    ("/api/admin/payments", "admin"),
+    ("/api/admin/drivers", "admin"),
+    ("/api/driver/ride-requests", "driver"),
+    ("/api/rides/available-pools", "user")
+]
+
+
+@pytest.fixture
+def admin_headers(db):
+    return auth_headers(make_user(db, "admin", "admin"), "admin")
+
+
+@pytest.fixture
+def role_headers(db, admin_headers):
+    return {
+        "admin": admin_headers,
+        "driver": auth_headers(make_user(db, "on-duty", "driver"), "driver"),
+        "user": auth_headers(make_user(db, "browser"), "user")
+    }
+
+
+@pytest.fixture
+def history(db):
+    """
+    40 completed rides and feedback, each with its own driver and rider, and
+    40 poolable ride requests from other riders. The drivers are available
+    around Islamabad.
+    """
+    now = datetime.utcnow()
+    for i in range(40):
+        rider_id = make_user(db, f"rider{i}")
+        driver_user_id = make_user(db, f"driver{i}", "driver")
+        location = {"lat": ISLAMABAD[0] + i * 0.001, "lng": ISLAMABAD[1]}
+        driver_id = str(db.sync.drivers.insert_one({
+            "userId": driver_user_id,
+            "vehicleType": "Sedan",
+            "vehicleNumber": f"ABC-{i}",
+            "rating": 4.5,
+            "totalTrips": 1,
+            "isAvailable": True,
+            "currentLocation": location,
+            "createdAt": now - timedelta(minutes=i)
+        }).inserted_id)
+        driver_index.upsert(driver_user_id, location["lat"], location["lng"])
+        at = now - timedelta(minutes=i)
+        ride_id = db.sync.rides.insert_one({
+            "driverId": driver_id,
+            "passengers": [{"userId": rider_id, "status": "dropped", "fare": 200.0}],
+            "isPooled": i % 2 == 0,
+            "status": "completed",
+            "totalFare": 200.0,
+            "startTime": at,
+            "endTime": at,
+            "createdAt": at
+        }).inserted_id
+        db.sync.feedback.insert_one({
+            "userId": rider_id,
+            "rideId": str(ride_id),
+            "driverId": driver_id,
+            "rating": 5,
+            "createdAt": at
+        })
+
+        requester_id = make_user(db, f"requester{i}")
+        booking = {
+            "userId": requester_id,
+            "pickupLocation": {"lat": ISLAMABAD[0], "lng": ISLAMABAD[1], "address": "F-7"},
+            "dropoffLocation": {"lat": 33.7294, "lng": 73.0931, "address": "G-9"},
+            "wantPooling": True,
+            "status": "requested",
+            "rideId": None,
+            "fare": 300.0,
+            "createdAt": at
+        }
+        booking["_id"] = db.sync.bookings.insert_one(booking).inserted_id
+        db.sync.open_pools.insert_one(booking_entry(booking, f"requester{i}"))
+    driver_index.loaded = True
+
+
+def _commands_for(client, db, headers, path: str, limit: int) -> int:
+    client.get(path, headers=headers, params={"limit": limit})  # warm the auth caches
+    before = len(db.log)
+    response = client.get(path, headers=headers, params={"limit": limit})
+    assert response.status_code == 200, response.text
+    return len(db.log) - before
+
+
+@pytest.mark.parametrize("path,role", LISTS)
+def test_command_count_does_not_grow_with_page_size(client, db, role_headers, history, path, role):
+    small = _commands_for(client, db, role_headers[role], path, 5)
+    large = _commands_for(client, db, role_headers[role], path, 40)
+    assert small == large
+
+
+@pytest.mark.anyio
+async def test_nearby_driver_commands_do_not_grow_with_limit(db, history):
+    counts = []
+    for limit in (5, 40):
+        before = len(db.log)
+        drivers = await find_nearby_drivers(*ISLAMABAD, radius_km=10, limit=limit)
+        assert len(drivers) == limit
+        assert all(driver["name"].startswith("driver") for driver in drivers)
+        counts.append(len(db.log) - before)
+    assert counts[0] == counts[1]
+
+
+def test_page_references_are_resolved(client, db, admin_headers, history):
+    response = client.get("/api/admin/feedback", headers=admin_headers, params={"limit": 40})
+    feedback = response.json()["data"]["feedback"]
+    assert len(feedback) == 40
+    assert all(item["userName"].startswith("rider") for item in feedback)
+    assert all(item["driverName"].startswith("driver") for item in feedback)
+
+
+def test_date_sliced_payment_summary_matches_completed_rides(client, db, admin_headers, history):
+    since = (datetime.utcnow() - timedelta(minutes=9, seconds=30)).isoformat()
+    response = client.get("/api/admin/payments", headers=admin_headers, params={"start_date": since})
+    assert response.status_code == 200, response.text
+
+    summary = response.json()["data"]["summary"]
+    assert summary["completedRides"] == summary["totalRides"] == 10
+    # The status equality is what lets the status + endTime index serve the range
+    pipelines = [argument for collection, operation, argument in db.log.commands if operation == "aggregate"]
+    assert pipelines[-1][0]["$match"]["status"] == "completed"
@@ -0,0 +1,91 @@
+import asyncio
+import fakeredis
+import pytest
+import socketio
+from socketio import async_redis_manager
+from app.websocket.client_manager import LocalPubSubManager, create_client_manager
+
+
+@pytest.fixture(autouse=True)
+def local_channel():
+    yield
+    LocalPubSubManager._subscribers.clear()
+
+
+@pytest.fixture(params=["local", "redis"])
+def kind(request, monkeypatch):
+    """Each test runs on the in-process channel and on Redis (fakeredis, one server for all workers)."""
+    if request.param == "redis":
+        server = fakeredis.FakeServer()
+        monkeypatch.setattr(
+            async_redis_manager.aioredis.Redis, "from_url",
+            lambda url, **options: fakeredis.aioredis.FakeRedis(server=server)
+        )
+    return request.param
+
+
+def make_worker(kind: str, sent: list) -> socketio.AsyncServer:
+    """A Socket.IO server on the `kind` pub/sub channel that records what it sends to its clients."""
+    server = socketio.AsyncServer(
+        async_mode="asgi",
+        client_manager=create_client_manager(kind, "redis://localhost:6379/0")
+    )
+
+    async def send_packet(eio_sid, packet):
+        sent.append((eio_sid, packet.data))
+
+    async def send_eio_packet(eio_sid, eio_packet):
+        # Emits to a room arrive here already encoded once for all members
+        sent.append((eio_sid, socketio.packet.Packet(encoded_packet=eio_packet.data).data))
+
+    server._send_packet = send_packet
+    server._send_eio_packet = send_eio_packet
+    # Normally started on the first request; starts the pub/sub listener
+    server.manager.initialize()
+    return server
+
+
+@pytest.mark.anyio
+async def test_emit_on_one_worker_reaches_clients_of_another(kind):
+    sent_a, sent_b = [], []
+    worker_a, worker_b = make_worker(kind, sent_a), make_worker(kind, sent_b)
+    await asyncio.sleep(0)
+
+    sid = await worker_a.manager.connect("eio-a", "/")
+    await worker_a.manager.enter_room(sid, "/", "user_u1")
+
+    await worker_b.emit("ride_accepted", {"rideId": "r1"}, room="user_u1")
+    await worker_b.emit("ride_accepted", {"rideId": "r2"}, room="user_u2")
+    await asyncio.sleep(0.05)
+
+    assert sent_a == [("eio-a", ["ride_accepted", {"rideId": "r1"}])]
+    assert sent_b == []
+
+
+@pytest.mark.anyio
+async def test_close_room_on_one_worker_empties_it_everywhere(kind):
+    sent_a = []
+    worker_a, worker_b = make_worker(kind, sent_a), make_worker(kind, [])
+    await asyncio.sleep(0)
+
+    sid = await worker_a.manager.connect("eio-a", "/")
+    await worker_a.manager.enter_room(sid, "/", "ride_r1")
+    await worker_b.emit("driver_location", {"lat": 33.67}, room="ride_r1")
+    await asyncio.sleep(0.05)
+
+    await worker_b.close_room("ride_r1")
+    await asyncio.sleep(0.05)
+    await worker_b.emit("driver_location", {"lat": 33.68}, room="ride_r1")
+    await asyncio.sleep(0.05)
+
+    assert sent_a == [("eio-a", ["driver_location", {"lat": 33.67}])]
+
+
+@pytest.mark.parametrize("kind", ["memory", "local"])
+def test_single_process_managers_refuse_several_workers(kind):
+    with pytest.raises(ValueError, match="SOCKET_MANAGER=redis"):
+        create_client_manager(kind, "", workers=4)
+
+
+def test_redis_manager_serves_several_workers():
+    assert isinstance(create_client_manager("redis", "redis://localhost:6379/0", workers=4), socketio.AsyncRedisManager)
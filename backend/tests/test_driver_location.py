@@ -0,0 +1,55 @@
+import pytest
+from app.services.driver_index import DriverLocationIndex, driver_index, sync_driver
+from app.services.location_buffer import location_buffer
+from tests.conftest import auth_headers, make_user
+
+ISLAMABAD = (33.6844, 73.0479)
+
+
+def test_available_driver_without_position_enters_index_on_first_move():
+    index = DriverLocationIndex()
+    sync_driver({"userId": "u1", "isAvailable": True, "currentLocation": None}, index)
+    assert index.query(*ISLAMABAD, radius_km=5) == []
+
+    assert index.move("u1", *ISLAMABAD)
+    assert [driver_id for driver_id, _ in index.query(*ISLAMABAD, radius_km=5)] == ["u1"]
+
+
+def test_unavailable_driver_is_not_indexed_by_move():
+    index = DriverLocationIndex()
+    sync_driver({"userId": "u1", "isAvailable": True, "currentLocation": None}, index)
+    sync_driver({"userId": "u1", "isAvailable": False, "currentLocation": None}, index)
+
+    assert not index.move("u1", *ISLAMABAD)
+    assert index.query(*ISLAMABAD, radius_km=5) == []
+
+
+def test_driver_going_online_before_first_ping_is_matchable(client, db):
+    user_id = make_user(db, "driver", "driver")
+    headers = auth_headers(user_id, "driver")
+
+    response = client.put("/api/driver/profile", headers=headers, json={"isAvailable": True})
+    assert response.status_code == 200, response.text
+    response = client.put(
+        "/api/driver/location",
+        headers=headers,
+        json={"lat": ISLAMABAD[0], "lng": ISLAMABAD[1]}
+    )
+    assert response.status_code == 200, response.text
+
+    assert [driver_id for driver_id, _ in driver_index.query(*ISLAMABAD, radius_km=5)] == [user_id]
+
+
+@pytest.mark.anyio
+async def test_flush_reuses_the_profile_of_the_driver(db):
+    user_id = make_user(db, "driver", "driver")
+    db.sync.drivers.create_index("userId", unique=True)
+    db.sync.drivers.insert_one({"userId": user_id, "isAvailable": True, "vehicleNumber": "ISB-1"})
+
+    location_buffer.add(user_id, *ISLAMABAD)
+    assert await location_buffer.flush() == 1
+
+    drivers = list(db.sync.drivers.find({"userId": user_id}))
+    assert len(drivers) == 1
+    assert drivers[0]["vehicleNumber"] == "ISB-1"
+    assert drivers[0]["currentLocation"] == {"lat": ISLAMABAD[0], "lng": ISLAMABAD[1]}
@@ -0,0 +1,80 @@
+import os
+import pytest
+from motor.motor_asyncio import AsyncIOMotorClient
+import app.main  # noqa: F401  Importing the API declares every index and query
+from app.utils.database import declared_indexes, declared_queries, ensure_indexes
+from app.utils.index_check import _stages, check_queries, expand_queries
+
+# A MongoDB server to explain the declared queries against, e.g. in CI
+MONGO_TEST_URI = os.getenv("MONGO_TEST_URI")
+
+
+def _constrained_fields(query) -> set:
+    """Fields a query filters or sorts on, which an index could lead with."""
+    fields = set()
+
+    def walk(filter):
+        for key, value in filter.items():
+            if key in ("$and", "$or"):
+                for clause in value:
+                    walk(clause)
+            elif not key.startswith("$"):
+                fields.add(key)
+
+    if query.pipeline is not None:
+        first = query.pipeline[0]
+        if "$geoNear" in first:
+            fields.add(first["$geoNear"]["key"])
+            walk(first["$geoNear"].get("query", {}))
+        elif "$match" in first:
+            walk(first["$match"])
+        if len(query.pipeline) > 1 and "$sort" in query.pipeline[1]:
+            fields.update(query.pipeline[1]["$sort"])
+    else:
+        walk(query.filter or {})
+    if query.sort:
+        fields.add(query.sort[0][0])
+    return fields
+
+
+def test_every_declared_query_has_a_declared_index_to_start_from():
+    # Only the plan check below proves an index is used; this one runs
+    # everywhere and catches a query or index being changed without the other
+    leading_keys = {(spec.collection, spec.keys[0][0]) for spec in declared_indexes()}
+    unserved = [
+        query.name
+        for query in expand_queries(declared_queries())
+        if not any((query.collection, field) in leading_keys for field in _constrained_fields(query))
+    ]
+    assert unserved == []
+
+
+def test_list_pages_are_also_checked_with_a_cursor():
+    names = {query.name for query in expand_queries(declared_queries())}
+    assert {"admin trips page (cursor)", "payments by date (cursor)", "user rides page (cursor)"} <= names
+    cursor_page = next(q for q in expand_queries(declared_queries()) if q.name == "admin trips page (cursor)")
+    assert "$or" in cursor_page.filter
+
+
+def test_rejected_plans_do_not_count_as_chosen_stages():
+    explain = {"queryPlanner": {
+        "winningPlan": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}},
+        "rejectedPlans": [{"stage": "COLLSCAN"}]
+    }}
+    assert list(_stages(explain)) == ["FETCH", "IXSCAN"]
+
+
+@pytest.mark.anyio
+@pytest.mark.skipif(not MONGO_TEST_URI, reason="MONGO_TEST_URI is not set; query plans need a MongoDB server")
+async def test_no_declared_query_scans_a_collection():
+    client = AsyncIOMotorClient(MONGO_TEST_URI, serverSelectionTimeoutMS=5000)
+    db = client["strps_index_check"]
+    try:
+        await client.drop_database(db.name)
+        # Creating the indexes also creates the collections, so no plan is an empty EOF
+        await ensure_indexes(db)
+        failures = await check_queries(db, expand_queries(declared_queries()))
+    finally:
+        await client.drop_database(db.name)
+        client.close()
+    assert failures == []
@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+import pytest
+from tests.conftest import auth_headers, make_user
+
+
+@pytest.fixture
+def admin_headers(db):
+    return auth_headers(make_user(db, "admin", "admin"), "admin")
+
+
+@pytest.fixture
+def feedback_ids(db):
+    """23 feedback rows; groups of three share a createdAt, so ties need the _id order."""
+    now = datetime.utcnow()
+    rider_id = make_user(db, "rider")
+    return {
+        str(db.sync.feedback.insert_one({
+            "userId": rider_id,
+            "rideId": "r1",
+            "driverId": "d1",
+            "rating": 5,
+            "createdAt": now - timedelta(minutes=i // 3)
+        }).inserted_id)
+        for i in range(23)
+    }
+
+
+def _walk(client, headers, limit: int) -> list:
+    """Every page of /api/admin/feedback, following nextCursor."""
+    pages = []
+    params = {"limit": limit}
+    while len(pages) < 100:
+        response = client.get("/api/admin/feedback", headers=headers, params=params)
+        assert response.status_code == 200, response.text
+        data = response.json()["data"]
+        pages.append(data)
+        cursor = data["pagination"]["nextCursor"]
+        if not cursor:
+            return pages
+        params = {"limit": limit, "cursor": cursor}
+    raise AssertionError("nextCursor never ran out")
+
+
+@pytest.mark.parametrize("limit", [1, 3, 4, 10, 23, 50])
+def test_cursor_walk_returns_every_row_once_in_order(client, admin_headers, feedback_ids, limit):
+    pages = _walk(client, admin_headers, limit)
+    ids = [item["id"] for page in pages for item in page["feedback"]]
+
+    assert len(ids) == len(set(ids))
+    assert set(ids) == feedback_ids
+    assert len(pages) == max(1, -(-len(feedback_ids) // limit))
+
+    # Newest first, and within one createdAt the larger _id first
+    keys = [(item["createdAt"], item["id"]) for page in pages for item in page["feedback"]]
+    assert keys == sorted(keys, reverse=True)
+
+
+def test_only_the_first_page_counts_the_result_set(client, db, admin_headers, feedback_ids):
+    first = client.get("/api/admin/feedback", headers=admin_headers, params={"limit": 5}).json()["data"]
+    assert first["pagination"]["total"] == 23
+    assert first["pagination"]["page"] == 1
+
+    before = len(db.log)
+    response = client.get(
+        "/api/admin/feedback",
+        headers=admin_headers,
+        params={"limit": 5, "cursor": first["pagination"]["nextCursor"]}
+    )
+    assert response.status_code == 200, response.text
+    assert response.json()["data"]["pagination"].keys() == {"limit", "nextCursor"}
+    assert not [command for command in db.log.commands[before:] if command[1] == "count_documents"]
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "eyJ2IjogMX0", "eyJ2IjogbnVsbCwgImlkIjogIngifQ"])
+def test_malformed_cursor_is_rejected(client, admin_headers, feedback_ids, cursor):
+    response = client.get("/api/admin/feedback", headers=admin_headers, params={"cursor": cursor})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
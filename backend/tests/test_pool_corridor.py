@@ -0,0 +1,102 @@
+import random
+import pytest
+from app.services.location_buffer import location_buffer
+from app.services.pool_corridor import MAX_POOL_DEVIATION_KM, backfill_corridors, build_corridor
+from app.services.ride_matching import MAX_DETOUR_RATIO, build_stop_sequence, find_best_insertion, passenger_stops
+from app.utils.geo import haversine_distance
+from tests.conftest import make_user
+
+ISLAMABAD = (33.6844, 73.0479)
+
+
+def _point(lat: float, lng: float) -> dict:
+    return {"lat": lat, "lng": lng}
+
+
+def _passenger(pickup: dict, dropoff: dict) -> dict:
+    return {"pickupLocation": pickup, "dropoffLocation": dropoff, "status": "pending"}
+
+
+def _inside(corridor: dict, point: dict) -> bool:
+    ring = corridor["coordinates"][0]
+    (min_lng, min_lat), (max_lng, max_lat) = ring[0], ring[2]
+    return min_lat <= point["lat"] <= max_lat and min_lng <= point["lng"] <= max_lng
+
+
+def _insertion(ride: dict, start: dict | None, pickup: dict, dropoff: dict) -> dict | None:
+    direct_km = haversine_distance(pickup["lat"], pickup["lng"], dropoff["lat"], dropoff["lng"])
+    new_pickup, new_dropoff = passenger_stops("new", pickup, dropoff, direct_km)
+    return find_best_insertion(build_stop_sequence(ride), new_pickup, new_dropoff, start, MAX_DETOUR_RATIO)
+
+
+def test_corridor_covers_a_stop_appended_after_a_short_route():
+    ride = {"passengers": [_passenger(_point(33.70, 73.00), _point(33.70, 73.02))]}
+    pickup, dropoff = _point(33.70, 73.19), _point(33.70, 73.20)
+
+    insertion = _insertion(ride, None, pickup, dropoff)
+    assert insertion and insertion["deviation"] <= MAX_POOL_DEVIATION_KM
+
+    corridor = build_corridor(ride["passengers"])
+    assert _inside(corridor, pickup) and _inside(corridor, dropoff)
+
+
+def test_corridor_covers_every_insertion_within_the_largest_deviation():
+    rng = random.Random(7)
+
+    def near(center: tuple, spread: float) -> dict:
+        return _point(center[0] + rng.uniform(-spread, spread), center[1] + rng.uniform(-spread, spread))
+
+    accepted = 0
+    for _ in range(300):
+        passengers = [_passenger(near(ISLAMABAD, 0.2), near(ISLAMABAD, 0.2)) for _ in range(rng.randint(1, 3))]
+        ride = {"passengers": passengers}
+        start = near(ISLAMABAD, 0.4) if rng.random() < 0.7 else None
+        corridor = build_corridor(passengers, start)
+
+        for _ in range(20):
+            pickup, dropoff = near(ISLAMABAD, 0.5), near(ISLAMABAD, 0.5)
+            insertion = _insertion(ride, start, pickup, dropoff)
+            if insertion is None or insertion["deviation"] > MAX_POOL_DEVIATION_KM:
+                continue
+            accepted += 1
+            assert _inside(corridor, pickup), (passengers, start, pickup)
+            assert _inside(corridor, dropoff), (passengers, start, dropoff)
+
+    assert accepted > 100
+
+
+@pytest.mark.anyio
+async def test_flushing_a_driver_position_moves_their_pool_corridors(db):
+    user_id = make_user(db, "driver", "driver")
+    driver_id = db.sync.drivers.insert_one({"userId": user_id, "isAvailable": False}).inserted_id
+    passengers = [_passenger(_point(*ISLAMABAD), _point(33.70, 73.06))]
+    ride_id = db.sync.rides.insert_one({
+        "driverId": str(driver_id),
+        "passengers": passengers,
+        "isPooled": True,
+        "status": "accepted",
+        "corridor": build_corridor(passengers)
+    }).inserted_id
+
+    far = _point(34.20, 73.60)
+    assert not _inside(db.sync.rides.find_one({"_id": ride_id})["corridor"], far)
+
+    location_buffer.add(user_id, far["lat"], far["lng"])
+    await location_buffer.flush()
+
+    assert _inside(db.sync.rides.find_one({"_id": ride_id})["corridor"], far)
+
+
+@pytest.mark.anyio
+async def test_backfill_writes_every_corridor_in_one_command(db):
+    passengers = [_passenger(_point(*ISLAMABAD), _point(33.70, 73.06))]
+    db.sync.rides.insert_many([
+        {"passengers": passengers, "isPooled": True, "status": "accepted"}
+        for _ in range(5)
+    ])
+
+    assert await backfill_corridors(db) == 5
+
+    writes = [operation for _, operation, _ in db.log.commands if operation != "find"]
+    assert writes == ["bulk_write"]
+    assert db.sync.rides.count_documents({"corridor": {"$exists": False}}) == 0
@@ -0,0 +1,90 @@
+from datetime import datetime
+import pytest
+from app.services.dispatch import dispatch_engine
+from tests.conftest import auth_headers, make_user
+
+PICKUP = {"lat": 33.6844, "lng": 73.0479, "address": "F-7 Markaz"}
+DROPOFF = {"lat": 33.7294, "lng": 73.0931, "address": "Faisal Mosque"}
+
+
+def make_driver(db, name: str, available: bool = True) -> dict:
+    user_id = make_user(db, name, "driver")
+    driver = {
+        "userId": user_id,
+        "vehicleType": "Sedan",
+        "vehicleNumber": "ISB-123",
+        "licenseNumber": "L-1",
+        "isAvailable": available,
+        "currentLocation": {"lat": PICKUP["lat"], "lng": PICKUP["lng"]},
+        "rating": 0.0,
+        "totalTrips": 0,
+        "createdAt": datetime.utcnow()
+    }
+    driver["_id"] = db.sync.drivers.insert_one(driver).inserted_id
+    return driver
+
+
+def make_booking(db, status: str = "requested") -> str:
+    now = datetime.utcnow()
+    return str(db.sync.bookings.insert_one({
+        "userId": make_user(db, "rider"),
+        "rideId": None,
+        "pickupLocation": PICKUP,
+        "dropoffLocation": DROPOFF,
+        "wantPooling": False,
+        "status": status,
+        "fare": 250.0,
+        "paymentStatus": "pending",
+        "createdAt": now,
+        "updatedAt": now
+    }).inserted_id)
+
+
+def accept(client, driver: dict, booking_id: str):
+    return client.post(
+        f"/api/driver/ride/{booking_id}/accept",
+        headers=auth_headers(driver["userId"], "driver")
+    )
+
+
+def test_booking_is_accepted_once(client, db):
+    first, second = make_driver(db, "first"), make_driver(db, "second")
+    booking_id = make_booking(db)
+
+    assert accept(client, first, booking_id).status_code == 200
+    assert accept(client, second, booking_id).status_code == 400
+
+    assert db.sync.rides.count_documents({}) == 1
+    assert db.sync.drivers.find_one({"_id": second["_id"]})["isAvailable"] is True
+
+
+def test_booking_claimed_by_dispatch_cannot_be_accepted(client, db):
+    driver = make_driver(db, "driver")
+    booking_id = make_booking(db, status="matched")
+
+    assert accept(client, driver, booking_id).status_code == 400
+    assert db.sync.rides.count_documents({}) == 0
+
+
+def test_unavailable_driver_cannot_accept(client, db):
+    driver = make_driver(db, "busy", available=False)
+    booking_id = make_booking(db)
+
+    assert accept(client, driver, booking_id).status_code == 400
+    assert db.sync.rides.count_documents({}) == 0
+    # The booking is released for other drivers
+    assert db.sync.bookings.find_one({"rideId": None})["status"] == "requested"
+
+
+@pytest.mark.anyio
+async def test_dispatch_notifies_the_assigned_driver(db):
+    driver = make_driver(db, "nearest")
+    make_booking(db)
+
+    notifications, driver_notifications, taken = await dispatch_engine.run_cycle()
+
+    ride = db.sync.rides.find_one({})
+    assert ride["driverId"] == str(driver["_id"])
+    assert [user_id for user_id, _ in driver_notifications] == [driver["userId"]]
+    assert driver_notifications[0][1]["rideId"] == str(ride["_id"])
+    assert len(notifications) == 1 and len(taken) == 1
@@ -0,0 +1,71 @@
+from datetime import datetime
+import pytest
+from app.services.platform_stats import ensure_platform_stats, read_platform_stats, record_ride_status
+from tests.conftest import auth_headers, make_user
+
+
+@pytest.fixture
+def ride(db):
+    """An accepted ride of one passenger, with its driver and booking."""
+    now = datetime.utcnow()
+    driver_user_id = make_user(db, "driver", "driver")
+    driver_id = str(db.sync.drivers.insert_one({
+        "userId": driver_user_id,
+        "isAvailable": False,
+        "currentLocation": None,
+        "totalTrips": 0
+    }).inserted_id)
+    rider_id = make_user(db, "rider")
+    ride_id = str(db.sync.rides.insert_one({
+        "driverId": driver_id,
+        "passengers": [{"userId": rider_id, "status": "pending", "fare": 300.0}],
+        "isPooled": False,
+        "status": "accepted",
+        "totalFare": 300.0,
+        "startTime": None,
+        "endTime": None,
+        "createdAt": now
+    }).inserted_id)
+    db.sync.bookings.insert_one({"userId": rider_id, "rideId": ride_id, "status": "matched"})
+    return {"id": ride_id, "driverId": driver_id, "headers": auth_headers(driver_user_id, "driver")}
+
+
+def set_status(client, ride, status):
+    return client.put(f"/api/driver/ride/{ride['id']}/status", headers=ride["headers"], params={"status": status})
+
+
+@pytest.mark.anyio
+async def test_repeated_completion_is_counted_once(client, db, ride):
+    await ensure_platform_stats(db)
+
+    assert set_status(client, ride, "completed").status_code == 200
+    assert set_status(client, ride, "completed").status_code == 200
+
+    driver = db.sync.drivers.find_one({})
+    assert driver["totalTrips"] == 1
+    stats = await read_platform_stats(db)
+    assert stats["completedRides"] == 1
+    assert stats["totalRevenue"] == 300.0
+
+
+@pytest.mark.anyio
+async def test_finished_ride_cannot_change_status(client, db, ride):
+    await ensure_platform_stats(db)
+    assert set_status(client, ride, "completed").status_code == 200
+
+    assert set_status(client, ride, "cancelled").status_code == 400
+    assert set_status(client, ride, "in-progress").status_code == 400
+
+    assert db.sync.rides.find_one({})["status"] == "completed"
+    assert db.sync.bookings.find_one({})["status"] == "completed"
+    stats = await read_platform_stats(db)
+    assert (stats["completedRides"], stats["cancelledRides"], stats["totalRevenue"]) == (1, 0, 300.0)
+
+
+@pytest.mark.anyio
+async def test_revenue_leaves_with_a_ride_leaving_completed(db):
+    await record_ride_status(db, "in-progress", "completed", 120.0)
+    await record_ride_status(db, "completed", "cancelled", 120.0)
+
+    stats = await read_platform_stats(db)
+    assert (stats["completedRides"], stats["totalRevenue"]) == (0, 0)
@@ -1,6 +1,7 @@
 import { useState, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
 import api from '../../../services/api';
+import socketService from '../../../services/socket';
 import Button from '../../common/Button/Button';
 import { formatCurrency, formatDate } from '../../../utils/helpers';
 import type { RideRequest, Pagination } from '../../../types';
@@ -36,6 +37,23 @@ const RideRequests = () => {
     fetchRequests();
   }, []);
 
+  // New and taken requests are pushed, so the list never needs refetching
+  useEffect(() => {
+    socketService.onNewRideRequest((request) => {
+      setRequests((prev) =>
+        prev.some((r) => r.bookingId === request.bookingId) ? prev : [request, ...prev]
+      );
+    });
+    socketService.onRideRequestRemoved(({ bookingId }) => {
+      setRequests((prev) => prev.filter((r) => r.bookingId !== bookingId));
+    });
+
+    return () => {
+      socketService.offNewRideRequest();
+      socketService.offRideRequestRemoved();
+    };
+  }, []);
+
   const handleAccept = async (bookingId: string) => {
     try {
       await api.post(`/api/driver/ride/${bookingId}/accept`);
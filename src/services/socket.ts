@@ -1,10 +1,13 @@
 import { io, Socket } from 'socket.io-client';
 import { SOCKET_URL } from '../utils/constants';
+import { getToken } from '../utils/helpers';
 import type { 
   LocationUpdateEvent, 
   RideStatusEvent, 
   NewRideRequestEvent,
+  RideRequestRemovedEvent,
   RideAcceptedEvent,
+  RideAssignedEvent,
   RideStartedEvent,
   RideCompletedEvent,
   PoolMatchFoundEvent
@@ -22,6 +25,8 @@ class SocketService {
         transports: ['websocket', 'polling'],
         autoConnect: true,
         withCredentials: false,
+        // Evaluated on every (re)connect so a fresh token is used
+        auth: (cb) => cb({ token: getToken() }),
         reconnection: true,
         reconnectionAttempts: 5,
         reconnectionDelay: 1000,
@@ -78,9 +83,9 @@ class SocketService {
     }
   }
 
-  updateLocation(driverId: string, lat: number, lng: number, rideId?: string): void {
+  updateLocation(lat: number, lng: number, rideId?: string): void {
     if (this.socket?.connected) {
-      this.socket.emit('location_update', { driverId, lat, lng, rideId });
+      this.socket.emit('location_update', { lat, lng, rideId });
     }
   }
 
@@ -114,6 +119,14 @@ class SocketService {
     this.socket?.off('new_ride_request');
   }
 
+  onRideRequestRemoved(callback: (data: RideRequestRemovedEvent) => void): void {
+    this.socket?.on('ride_request_removed', callback);
+  }
+
+  offRideRequestRemoved(): void {
+    this.socket?.off('ride_request_removed');
+  }
+
   onRideAccepted(callback: (data: RideAcceptedEvent) => void): void {
     this.socket?.on('ride_accepted', callback);
   }
@@ -122,6 +135,14 @@ class SocketService {
     this.socket?.off('ride_accepted');
   }
 
+  onRideAssigned(callback: (data: RideAssignedEvent) => void): void {
+    this.socket?.on('ride_assigned', callback);
+  }
+
+  offRideAssigned(): void {
+    this.socket?.off('ride_assigned');
+  }
+
   onRideStarted(callback: (data: RideStartedEvent) => void): void {
     this.socket?.on('ride_started', callback);
   }
@@ -206,6 +206,7 @@ export interface Pagination {
   limit: number;
   total: number;
   pages: number;
+  nextCursor?: string | null;
 }
 
 // API Response types
@@ -246,7 +247,14 @@ export interface NewRideRequestEvent {
   userName: string;
   pickupLocation: LocationWithAddress;
   dropoffLocation: LocationWithAddress;
+  wantPooling: boolean;
   fare: number;
+  createdAt: string;
+}
+
+export interface RideRequestRemovedEvent {
+  bookingId: string;
+  reason: 'accepted' | 'cancelled' | 'pooled';
 }
 
 export interface RideAcceptedEvent {
@@ -258,6 +266,16 @@ export interface RideAcceptedEvent {
   eta: number;
 }
 
+export interface RideAssignedEvent {
+  rideId: string;
+  pickupDistance: number;
+  passengers: {
+    userId: string;
+    pickupLocation: LocationWithAddress;
+    dropoffLocation: LocationWithAddress;
+  }[];
+}
+
 export interface RideStartedEvent {
   rideId: string;
   startTime: string;